@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+from array import array
+import json
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _import_scipy_sparse():
+    try:
+        import scipy.sparse
+    except ImportError as e:
+        raise ImportError(
+            "scipy is required for scipy sparse matrices. Install it with: python3 -m pip install scipy"
+        ) from e
+    return scipy.sparse
+
+
+class AbundanceMatrix:
+    """
+    A sample by function abundance matrix in compressed sparse row form.
+    Rows and columns are integer coded: samples and functions hold the id of each row and column.
+    params:
+        samples: list
+            The row labels, e.g. was_generated_by ids.
+        functions: list
+            The column labels, e.g. gene_function_ids.
+        indptr: np.ndarray
+            Row i holds the values data[indptr[i]:indptr[i + 1]] in the columns indices[indptr[i]:indptr[i + 1]].
+        indices: np.ndarray
+            The column of each stored value, sorted within a row.
+        data: np.ndarray
+            The stored values.
+    """
+
+    def __init__(
+        self,
+        samples: list,
+        functions: list,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+    ):
+        self.samples = list(samples)
+        self.functions = list(functions)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.samples), len(self.functions)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def _rows(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.samples)), np.diff(self.indptr))
+
+    def get(self, sample: str, function: str):
+        """
+        The value of one cell, 0 when it is not stored.
+        """
+        row = self.samples.index(sample)
+        column = self.functions.index(function)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        position = start + np.searchsorted(self.indices[start:end], column)
+        if position < end and self.indices[position] == column:
+            return self.data[position]
+        return 0
+
+    def row_sums(self) -> np.ndarray:
+        """
+        The total of each sample.
+        """
+        return np.bincount(self._rows(), weights=self.data, minlength=len(self.samples))
+
+    def normalize(self, method: str = "relative"):
+        """
+        Normalize each sample, returning a new matrix. The sparsity pattern is unchanged.
+        params:
+            method: str
+                relative - divide by the sample total, so each sample sums to 1.
+                cpm      - counts per million of the sample total.
+                log1p    - natural log of 1 + value.
+                presence - 1 for every stored value.
+        """
+        if method in ("relative", "cpm"):
+            totals = np.repeat(self.row_sums(), np.diff(self.indptr))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                data = np.where(totals > 0, self.data / totals, 0.0)
+            if method == "cpm":
+                data = data * 1e6
+        elif method == "log1p":
+            data = np.log1p(self.data.astype(np.float64))
+        elif method == "presence":
+            data = np.ones(len(self.data), dtype=np.int8)
+        else:
+            raise ValueError(
+                "method must be one of the following: relative, cpm, log1p, presence"
+            )
+        return AbundanceMatrix(
+            self.samples, self.functions, self.indptr, self.indices, data
+        )
+
+    def select_functions(self, prefix: str = "", functions=None):
+        """
+        Keep only some columns, returning a new matrix.
+        params:
+            prefix: str
+                Keep the functions starting with this prefix, e.g. "KEGG.ORTHOLOGY:" or "PFAM:".
+            functions: iterable
+                Keep these functions.
+        """
+        wanted = set(functions) if functions is not None else None
+        keep = np.array(
+            [
+                f.startswith(prefix) and (wanted is None or f in wanted)
+                for f in self.functions
+            ],
+            dtype=bool,
+        )
+        remap = np.cumsum(keep) - 1
+        stored = keep[self.indices] if len(self.indices) else np.empty(0, dtype=bool)
+        counts = np.bincount(self._rows()[stored], minlength=len(self.samples))
+        indptr = np.zeros(len(self.samples) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return AbundanceMatrix(
+            self.samples,
+            [f for f, k in zip(self.functions, keep) if k],
+            indptr,
+            remap[self.indices[stored]].astype(self.indices.dtype),
+            self.data[stored],
+        )
+
+    def to_scipy(self):
+        """
+        The matrix as a scipy.sparse.csr_matrix. Requires scipy.
+        """
+        sparse = _import_scipy_sparse()
+        return sparse.csr_matrix(
+            (self.data, self.indices, self.indptr), shape=self.shape
+        )
+
+    def to_dataframe(self, sparse: bool = True) -> pd.DataFrame:
+        """
+        The matrix as a dataframe with samples as the index and functions as the columns.
+        params:
+            sparse: bool
+                True for sparse columns that only store the non zero values, False for a dense dataframe. Default is True.
+        """
+        rows = self._rows()
+        if not sparse:
+            dense = np.zeros(self.shape, dtype=self.data.dtype)
+            dense[rows, self.indices] = self.data
+            return pd.DataFrame(dense, index=self.samples, columns=self.functions)
+        order = np.argsort(self.indices, kind="stable")
+        starts = np.searchsorted(
+            self.indices[order], np.arange(len(self.functions) + 1)
+        )
+        columns = {}
+        for column, function in enumerate(self.functions):
+            positions = order[starts[column] : starts[column + 1]]
+            dense = np.zeros(len(self.samples), dtype=self.data.dtype)
+            dense[rows[positions]] = self.data[positions]
+            columns[function] = pd.arrays.SparseArray(
+                dense, fill_value=self.data.dtype.type(0)
+            )
+        return pd.DataFrame(columns, index=self.samples)
+
+    def save(self, path: str):
+        """
+        Save the matrix to a compressed .npz file.
+        """
+        np.savez_compressed(
+            path,
+            indptr=self.indptr,
+            indices=self.indices,
+            data=self.data,
+            samples=np.array(json.dumps(self.samples)),
+            functions=np.array(json.dumps(self.functions)),
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load a matrix saved with save.
+        """
+        with np.load(path) as saved:
+            return cls(
+                json.loads(str(saved["samples"])),
+                json.loads(str(saved["functions"])),
+                saved["indptr"],
+                saved["indices"],
+                saved["data"],
+            )
+
+
+class AbundanceMatrixBuilder:
+    """
+    Stream functional annotation records into a sparse sample by function matrix.
+    Each record only adds three numbers to compact buffers, so the records themselves never need to be kept in memory.
+    Values of repeated sample and function pairs are summed.
+    params:
+        annotation_prefix: str
+            Only count functions starting with this prefix, e.g. "KEGG.ORTHOLOGY:". Default is every function.
+        sample_field: str
+            The record field holding the row label. Default is "was_generated_by".
+        function_field: str
+            The record field holding the column label. Default is "gene_function_id".
+        value_field: str
+            The record field holding the value. Default is "count".
+    Example:
+        builder = AbundanceMatrixBuilder()
+        for page in FunctionalAnnotationAggSearch().collectioninstance.iter_pages(fields="was_generated_by,gene_function_id,count"):
+            builder.add_records(page)
+        matrix = builder.build()
+    """
+
+    def __init__(
+        self,
+        annotation_prefix: str = "",
+        sample_field: str = "was_generated_by",
+        function_field: str = "gene_function_id",
+        value_field: str = "count",
+    ):
+        self.annotation_prefix = annotation_prefix
+        self.sample_field = sample_field
+        self.function_field = function_field
+        self.value_field = value_field
+        self._samples = {}
+        self._functions = {}
+        self._rows = array("l")
+        self._columns = array("l")
+        self._values = array("d")
+
+    def add_records(self, records):
+        """
+        Add records, e.g. one page of results or an iterator over a whole crawl.
+        """
+        samples, functions = self._samples, self._functions
+        for record in records:
+            function = record.get(self.function_field)
+            sample = record.get(self.sample_field)
+            if function is None or sample is None:
+                continue
+            if self.annotation_prefix and not function.startswith(
+                self.annotation_prefix
+            ):
+                continue
+            self._rows.append(samples.setdefault(sample, len(samples)))
+            self._columns.append(functions.setdefault(function, len(functions)))
+            self._values.append(record.get(self.value_field, 1) or 0)
+        return self
+
+    def build(self) -> AbundanceMatrix:
+        """
+        Build the matrix from every record added so far.
+        """
+        rows = np.frombuffer(self._rows, dtype=np.dtype(self._rows.typecode))
+        columns = np.frombuffer(self._columns, dtype=np.dtype(self._columns.typecode))
+        values = np.frombuffer(self._values, dtype=np.float64)
+        order = np.lexsort((columns, rows))
+        rows, columns, values = rows[order], columns[order], values[order]
+        # sum the values of repeated cells
+        if len(rows):
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+            starts = np.flatnonzero(first)
+            values = np.add.reduceat(values, starts)
+            rows, columns = rows[starts], columns[starts]
+        if len(values) and np.all(values == np.floor(values)):
+            values = values.astype(
+                np.int32 if np.abs(values).max() < 2**31 else np.int64
+            )
+        indptr = np.zeros(len(self._samples) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self._samples)), out=indptr[1:])
+        return AbundanceMatrix(
+            list(self._samples),
+            list(self._functions),
+            indptr,
+            columns.astype(np.int32),
+            values,
+        )
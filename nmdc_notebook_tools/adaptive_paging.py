@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePaging:
+    """
+    Choose the page size of paginated crawls from the measured latency and payload size of the pages already fetched.
+    After every full page from the NMDC API the next page size is scaled towards target_seconds, by at most max_step per page,
+    capped so a page stays under max_page_bytes, and kept within min_page_size and max_page_size.
+    Small projections such as id-only crawls quickly grow to large pages, full documents stay at a size that returns in time.
+    The max_page_size passed to a crawl is its first page size.
+    Pages answered by a local mirror are not measured. Adaptive crawls bypass the response cache, because page sizes vary
+    between runs and a cached page token must not be sent with a page size it was not issued for.
+    params:
+        min_page_size: int
+            The smallest page size chosen. Default is 50.
+        max_page_size: int
+            The largest page size chosen. Default is 10000.
+        target_seconds: float
+            The page latency aimed for. Default is 1.0.
+        max_page_bytes: int
+            The largest response size aimed for. Default is 20 MB.
+        max_step: float
+            The largest factor the page size grows or shrinks by from one page to the next. Default is 4.
+        history: int
+            The number of crawls kept in the statistics. Default is 100.
+    Example:
+        CollectionSearch.set_adaptive_paging(AdaptivePaging(target_seconds=2.0))
+        DataObjectSearch().get_records(fields="id", all_pages=True)
+        CollectionSearch.adaptive_paging.stats()
+    """
+
+    def __init__(
+        self,
+        min_page_size: int = 50,
+        max_page_size: int = 10000,
+        target_seconds: float = 1.0,
+        max_page_bytes: int = 20 * 1024 * 1024,
+        max_step: float = 4.0,
+        history: int = 100,
+    ):
+        if min_page_size < 1 or max_page_size < min_page_size:
+            raise ValueError("page size bounds must satisfy 1 <= min <= max")
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.target_seconds = target_seconds
+        self.max_page_bytes = max_page_bytes
+        self.max_step = max_step
+        self._crawls = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def _clamp(self, page_size: float) -> int:
+        return int(max(self.min_page_size, min(self.max_page_size, page_size)))
+
+    def first_page_size(self, page_size: int) -> int:
+        """
+        The page size of the first page of a crawl.
+        """
+        return self._clamp(page_size)
+
+    def next_page_size(
+        self, page_size: int, records: int, seconds: float, nbytes: int
+    ) -> int:
+        """
+        The size of the next page, given the size, record count, latency and payload size of the last one.
+        Pages that were not full say nothing about larger pages and keep the size unchanged.
+        """
+        if records < page_size or seconds <= 0:
+            return page_size
+        factor = min(
+            max(self.target_seconds / seconds, 1 / self.max_step), self.max_step
+        )
+        next_size = page_size * factor
+        if self.max_page_bytes and nbytes:
+            next_size = min(next_size, self.max_page_bytes * records / nbytes)
+        return self._clamp(next_size)
+
+    def start(self, collection_name: str, fields: str, filter: str) -> dict:
+        """
+        Start the statistics of a crawl.
+        """
+        crawl = {
+            "collection_name": collection_name,
+            "fields": fields,
+            "filter": filter,
+            "started_at": time.time(),
+            "pages": 0,
+            "records": 0,
+            "bytes": 0,
+            "seconds": 0.0,
+            "page_sizes": [],
+        }
+        with self._lock:
+            self._crawls.append(crawl)
+        return crawl
+
+    def record(self, crawl: dict, page_size: int, records: int, seconds, nbytes):
+        """
+        Add a page to the statistics of a crawl.
+        """
+        with self._lock:
+            crawl["pages"] += 1
+            crawl["records"] += records
+            crawl["bytes"] += nbytes or 0
+            crawl["seconds"] += seconds or 0.0
+            crawl["page_sizes"].append(page_size)
+
+    def stats(self) -> list:
+        """
+        The statistics of the most recent crawls, oldest first: the page size chosen for every page, and the pages, records, bytes and seconds of the API.
+        """
+        with self._lock:
+            return [dict(c, page_sizes=list(c["page_sizes"])) for c in self._crawls]
@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools.lat_long_filters import LatLongFilters
+from nmdc_notebook_tools.functional_search import FunctionalSearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncNMDCSearch:
+    """
+    Base class for the asyncio search classes. Requests run on a bounded worker pool over the shared, pooled transport,
+    so connections are reused and at most max_concurrency requests are in flight across all async search instances.
+    Works inside an already running event loop, such as a Jupyter notebook - simply await the methods.
+    """
+
+    max_concurrency = 10
+    _executor = None
+    _semaphores = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    def __init__(self, search):
+        self._search = search
+
+    @property
+    def base_url(self):
+        return self._search.base_url
+
+    @base_url.setter
+    def base_url(self, base_url):
+        self._search.base_url = base_url
+
+    @classmethod
+    def set_max_concurrency(cls, max_concurrency: int):
+        """
+        Set the maximum number of concurrent requests made by all async search classes.
+        The shared transport pool size should be at least this large to avoid waiting on connections.
+        params:
+            max_concurrency: int
+                The maximum number of requests in flight at once.
+        """
+        with AsyncNMDCSearch._lock:
+            AsyncNMDCSearch.max_concurrency = max_concurrency
+            old_executor = AsyncNMDCSearch._executor
+            AsyncNMDCSearch._executor = None
+            AsyncNMDCSearch._semaphores = weakref.WeakKeyDictionary()
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with AsyncNMDCSearch._lock:
+            if AsyncNMDCSearch._executor is None:
+                AsyncNMDCSearch._executor = ThreadPoolExecutor(
+                    max_workers=AsyncNMDCSearch.max_concurrency,
+                    thread_name_prefix="nmdc-async",
+                )
+            return AsyncNMDCSearch._executor
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        # semaphores belong to one event loop, keep one per running loop
+        loop = asyncio.get_running_loop()
+        with AsyncNMDCSearch._lock:
+            semaphore = AsyncNMDCSearch._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(AsyncNMDCSearch.max_concurrency)
+                AsyncNMDCSearch._semaphores[loop] = semaphore
+            return semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Run a blocking search function on the worker pool. Cancelling the awaiting task
+        releases its slot immediately; a request that has not started yet is never sent.
+        """
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), functools.partial(func, *args, **kwargs)
+            )
+
+    async def _iterate(self, iterator):
+        """
+        Drive a blocking iterator from the event loop, one item per worker call.
+        """
+        sentinel = object()
+        try:
+            while True:
+                item = await self._run(next, iterator, sentinel)
+                if item is sentinel:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                await self._run(close)
+
+
+class AsyncCollectionSearch(AsyncNMDCSearch):
+    """
+    Asyncio counterpart of CollectionSearch. Each method has the same parameters as its CollectionSearch version and must be awaited.
+    Example:
+        biosamples = AsyncCollectionSearch("biosample_set")
+        results = await asyncio.gather(*[biosamples.get_record_by_attribute("name", name) for name in names])
+    """
+
+    def __init__(self, collection_name, search=None):
+        self.collection_name = collection_name
+        super().__init__(search or CollectionSearch(collection_name))
+
+    async def get_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        all_pages: bool = False,
+    ):
+        """
+        Get a collection of data from the NMDC API. See CollectionSearch.get_records.
+        """
+        return await self._run(
+            self._search.get_records, filter, max_page_size, fields, all_pages
+        )
+
+    async def get_record_by_filter(
+        self, filter: str, max_page_size=25, fields="", all_pages=False
+    ):
+        """
+        Get records from the NMDC API by a filter. See CollectionSearch.get_record_by_filter.
+        """
+        return await self._run(
+            self._search.get_record_by_filter,
+            filter,
+            max_page_size,
+            fields,
+            all_pages,
+        )
+
+    async def get_record_by_attribute(
+        self,
+        attribute_name,
+        attribute_value,
+        max_page_size=25,
+        fields="",
+        all_pages=False,
+        exact_match=False,
+        match="",
+        case_sensitive=True,
+    ):
+        """
+        Get records from the NMDC API by an attribute. See CollectionSearch.get_record_by_attribute.
+        """
+        return await self._run(
+            self._search.get_record_by_attribute,
+            attribute_name,
+            attribute_value,
+            max_page_size,
+            fields,
+            all_pages,
+            exact_match,
+            match,
+            case_sensitive,
+        )
+
+    async def get_record_by_id(
+        self,
+        collection_id: str,
+        max_page_size: int = 100,
+        fields: str = "",
+    ):
+        """
+        Get a record from the NMDC API by id. See CollectionSearch.get_record_by_id.
+        """
+        return await self._run(
+            self._search.get_record_by_id, collection_id, max_page_size, fields
+        )
+
+    async def get_records_by_ids(
+        self,
+        ids,
+        fields: str = "",
+        max_workers: int = 4,
+        max_url_length: int = 8000,
+    ):
+        """
+        Get many records by id with chunked $in queries. See CollectionSearch.get_records_by_ids.
+        """
+        return await self._run(
+            self._search.get_records_by_ids, ids, fields, max_workers, max_url_length
+        )
+
+    async def get_record_data_object_by_type(
+        self,
+        data_object_type: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        all_pages: bool = False,
+    ):
+        """
+        Get data objects by type as a dataframe. See CollectionSearch.get_record_data_object_by_type.
+        """
+        return await self._run(
+            self._search.get_record_data_object_by_type,
+            data_object_type,
+            max_page_size,
+            fields,
+            all_pages,
+        )
+
+    async def iter_pages(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        progress=None,
+    ):
+        """
+        Asynchronously iterate over every page of a collection query. See CollectionSearch.iter_pages.
+        Example:
+            async for page in search.iter_pages(fields="id"):
+                ...
+        """
+        async for page in self._iterate(
+            self._search.iter_pages(filter, max_page_size, fields, progress)
+        ):
+            yield page
+
+    async def iter_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        progress=None,
+    ):
+        """
+        Asynchronously iterate over every record of a collection query. See CollectionSearch.iter_records.
+        """
+        async for page in self.iter_pages(filter, max_page_size, fields, progress):
+            for record in page:
+                yield record
+
+
+class AsyncLatLongFilters(AsyncCollectionSearch):
+    """
+    Asyncio counterpart of LatLongFilters.
+    """
+
+    def __init__(self, collection_name):
+        super().__init__(collection_name, LatLongFilters(collection_name))
+
+    async def get_record_by_latitude(
+        self, comparison: str, latitude: float, page_size=25, fields="", all_pages=False
+    ):
+        """
+        Get records by latitude comparison. See LatLongFilters.get_record_by_latitude.
+        """
+        return await self._run(
+            self._search.get_record_by_latitude,
+            comparison,
+            latitude,
+            page_size,
+            fields,
+            all_pages,
+        )
+
+    async def get_record_by_longitude(
+        self,
+        comparison: str,
+        longitude: float,
+        page_size=25,
+        fields="",
+        all_pages=False,
+    ):
+        """
+        Get records by longitude comparison. See LatLongFilters.get_record_by_longitude.
+        """
+        return await self._run(
+            self._search.get_record_by_longitude,
+            comparison,
+            longitude,
+            page_size,
+            fields,
+            all_pages,
+        )
+
+    async def get_record_by_lat_long(
+        self,
+        lat_comparison: str,
+        long_comparison: str,
+        latitude: float,
+        longitude: float,
+        page_size=25,
+        fields="",
+        all_pages=False,
+    ):
+        """
+        Get records by latitude and longitude comparison. See LatLongFilters.get_record_by_lat_long.
+        """
+        return await self._run(
+            self._search.get_record_by_lat_long,
+            lat_comparison,
+            long_comparison,
+            latitude,
+            longitude,
+            page_size,
+            fields,
+            all_pages,
+        )
+
+    async def get_records_in_box(
+        self, min_lat, max_lat, min_lon, max_lon, fields="", max_page_size=1000
+    ):
+        """
+        Get records in a latitude/longitude box. See LatLongFilters.get_records_in_box.
+        """
+        return await self._run(
+            self._search.get_records_in_box,
+            min_lat,
+            max_lat,
+            min_lon,
+            max_lon,
+            fields,
+            max_page_size,
+        )
+
+    async def get_records_in_polygon(self, polygon, fields="", max_page_size=1000):
+        """
+        Get records in a polygon. See LatLongFilters.get_records_in_polygon.
+        """
+        return await self._run(
+            self._search.get_records_in_polygon, polygon, fields, max_page_size
+        )
+
+    async def get_records_in_radius(
+        self, latitude, longitude, radius_km, fields="", max_page_size=1000
+    ):
+        """
+        Get records within a distance of a point. See LatLongFilters.get_records_in_radius.
+        """
+        return await self._run(
+            self._search.get_records_in_radius,
+            latitude,
+            longitude,
+            radius_km,
+            fields,
+            max_page_size,
+        )
+
+    async def get_nearest_records(
+        self,
+        latitude,
+        longitude,
+        k=10,
+        fields="",
+        initial_radius_km=50.0,
+        max_page_size=1000,
+    ):
+        """
+        Get the k records nearest to a point. See LatLongFilters.get_nearest_records.
+        """
+        return await self._run(
+            self._search.get_nearest_records,
+            latitude,
+            longitude,
+            k,
+            fields,
+            initial_radius_km,
+            max_page_size,
+        )
+
+
+class AsyncFunctionalSearch(AsyncNMDCSearch):
+    """
+    Asyncio counterpart of FunctionalSearch.
+    """
+
+    def __init__(self):
+        super().__init__(FunctionalSearch())
+
+    @property
+    def base_url(self):
+        return self._search.collectioninstance.base_url
+
+    @base_url.setter
+    def base_url(self, base_url):
+        self._search.collectioninstance.base_url = base_url
+
+    async def get_functional_annotations(
+        self,
+        annotation: str,
+        annotation_type: str,
+        page_size=25,
+        fields="",
+        all_pages=False,
+    ):
+        """
+        Get functional annotation records by KEGG, COG, or PFAM id. See FunctionalSearch.get_functional_annotations.
+        """
+        return await self._run(
+            self._search.get_functional_annotations,
+            annotation,
+            annotation_type,
+            page_size,
+            fields,
+            all_pages,
+        )
+
+    async def get_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        all_pages: bool = False,
+    ):
+        """
+        Get functional annotation records by filter. See FunctionalSearch.get_records.
+        """
+        return await self._run(
+            self._search.get_records,
+            filter,
+            max_page_size,
+            fields,
+            all_pages,
+        )
+
+    async def get_functional_annotations_bulk(
+        self,
+        annotations,
+        annotation_type: str = "",
+        fields: str = "",
+        max_workers: int = 4,
+        max_page_size: int = 0,
+        max_url_length: int = 8000,
+    ):
+        """
+        Get the functional annotation records of many ids at once. See FunctionalSearch.get_functional_annotations_bulk.
+        """
+        return await self._run(
+            self._search.get_functional_annotations_bulk,
+            annotations,
+            annotation_type,
+            fields,
+            max_workers,
+            max_page_size,
+            max_url_length,
+        )
+
+    async def iter_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        progress=None,
+    ):
+        """
+        Asynchronously iterate over functional annotation records. See FunctionalSearch.iter_records.
+        """
+        iterator = self._search.collectioninstance.iter_pages(
+            filter, max_page_size, fields, progress
+        )
+        async for page in self._iterate(iterator):
+            for record in page:
+                yield record
+
+
+class AsyncCollectionHelpers(AsyncNMDCSearch):
+    """
+    Asyncio counterpart of CollectionHelpers.
+    """
+
+    def __init__(self):
+        super().__init__(CollectionHelpers())
+
+    async def get_record_name_from_id(self, doc_id: str):
+        """
+        Get the collection name an id belongs to. See CollectionHelpers.get_record_name_from_id.
+        """
+        return await self._run(self._search.get_record_name_from_id, doc_id)
+
+    async def get_record_names_from_ids(self, ids, max_workers: int = 8):
+        """
+        Determine the collection of many ids at once. See CollectionHelpers.get_record_names_from_ids.
+        """
+        return await self._run(self._search.get_record_names_from_ids, ids, max_workers)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of nmdc_notebook_tools against a local stand-in for the NMDC API.
+
+Run from the command line with: python -m nmdc_notebook_tools.benchmark --help
+"""
+from nmdc_notebook_tools.benchmark.server import MockNMDCServer
+from nmdc_notebook_tools.benchmark.fixtures import synthetic_collections
+from nmdc_notebook_tools.benchmark.suite import (
+    BENCHMARKS,
+    BenchmarkSuite,
+    check_thresholds,
+    compare_results,
+    load_results,
+    save_results,
+)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import sys
+import pandas as pd
+from nmdc_notebook_tools.benchmark.suite import (
+    BENCHMARKS,
+    BenchmarkSuite,
+    compare_results,
+    load_results,
+    save_results,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m nmdc_notebook_tools.benchmark",
+        description="Benchmark nmdc_notebook_tools against a local stand-in for the NMDC API.",
+    )
+    parser.add_argument("--biosamples", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--max-page-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--benchmark", action="append", choices=BENCHMARKS)
+    parser.add_argument("--baseline", help="JSON results to compare with, see --save")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    suite = BenchmarkSuite(
+        biosamples=args.biosamples,
+        delay=args.delay,
+        max_page_size=args.max_page_size,
+        repeat=args.repeat,
+        benchmarks=tuple(args.benchmark or BENCHMARKS),
+    )
+    results = suite.run()
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(results.round(3))
+    if args.save:
+        save_results(results, args.save)
+    if args.baseline and os.path.exists(args.baseline):
+        regressions = compare_results(
+            results, load_results(args.baseline), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENVIRONMENTS = [
+    ("ENVO:00000446", "terrestrial biome", "soil"),
+    ("ENVO:00000447", "marine biome", "sea water"),
+    ("ENVO:01000252", "freshwater lake biome", "lake water"),
+    ("ENVO:01000174", "forest biome", "forest soil"),
+    ("ENVO:00000873", "freshwater biome", "river water"),
+]
+DATA_OBJECT_TYPES = [
+    "Metagenome Raw Reads",
+    "Filtered Sequencing Reads",
+    "QC Statistics",
+    "Assembly Contigs",
+    "Annotation Amino Acid FASTA",
+]
+
+
+def _ids(typecode: str, count: int, suffix: str = "") -> list:
+    return [f"nmdc:{typecode}-11-{i:08d}{suffix}" for i in range(count)]
+
+
+def synthetic_collections(
+    biosamples: int = 1000,
+    studies: int = 10,
+    data_objects_per_workflow: int = 3,
+    annotations_per_workflow: int = 50,
+    seed: int = 0,
+) -> dict:
+    """
+    Generate NMDC-like documents for benchmarks. Every biosample belongs to a study and is the input of one data generation,
+    which informs one annotation workflow with data objects and functional annotation counts.
+    The documents have the nesting of real records (lat_lon, depth, env_broad_scale, list valued links) so dataframe conversion and merging do realistic work.
+    params:
+        biosamples: int
+            The number of biosamples. The other collections scale with it. Default is 1000.
+        studies: int
+            The number of studies. Default is 10.
+        data_objects_per_workflow: int
+            The number of data objects generated by each workflow. Default is 3.
+        annotations_per_workflow: int
+            The number of functional annotation counts of each workflow. Default is 50.
+        seed: int
+            The random seed, the same seed gives the same documents. Default is 0.
+    returns:
+        dict
+            The documents of study_set, biosample_set, data_generation_set, workflow_execution_set, data_object_set and functional_annotation_agg.
+    """
+    rng = random.Random(seed)
+    study_ids = _ids("sty", studies)
+    biosample_ids = _ids("bsm", biosamples)
+    data_generation_ids = _ids("dgns", biosamples)
+    workflow_ids = _ids("wfmgan", biosamples, ".1")
+    functions = (
+        [f"KEGG.ORTHOLOGY:K{i:05d}" for i in range(1, 2001)]
+        + [f"COG:COG{i:04d}" for i in range(1, 501)]
+        + [f"PFAM:PF{i:05d}" for i in range(1, 501)]
+    )
+
+    study_set = [
+        {
+            "id": study_id,
+            "name": f"synthetic study {i}",
+            "type": "nmdc:Study",
+            "study_category": "research_study",
+        }
+        for i, study_id in enumerate(study_ids)
+    ]
+    biosample_set = []
+    for i, biosample_id in enumerate(biosample_ids):
+        env_id, env_name, medium = ENVIRONMENTS[i % len(ENVIRONMENTS)]
+        biosample_set.append(
+            {
+                "id": biosample_id,
+                "name": f"{medium} sample {i}",
+                "type": "nmdc:Biosample",
+                "associated_studies": [study_ids[i % studies]],
+                "lat_lon": {
+                    "latitude": round(rng.uniform(-80, 80), 6),
+                    "longitude": round(rng.uniform(-180, 180), 6),
+                },
+                "depth": {"has_numeric_value": round(rng.uniform(0, 2), 2)},
+                "env_broad_scale": {
+                    "has_raw_value": f"{env_name} [{env_id}]",
+                    "term": {"id": env_id, "name": env_name},
+                },
+                "env_medium": {"has_raw_value": medium},
+                "collection_date": {
+                    "has_raw_value": f"20{10 + i % 14}-{1 + i % 12:02d}-{1 + i % 28:02d}"
+                },
+                "alternative_identifiers": [f"gold:Gb{i:07d}"],
+            }
+        )
+    data_generation_set = [
+        {
+            "id": data_generation_id,
+            "type": "nmdc:NucleotideSequencing",
+            "has_input": [biosample_ids[i]],
+            "associated_studies": [study_ids[i % studies]],
+            "analyte_category": "metagenome",
+        }
+        for i, data_generation_id in enumerate(data_generation_ids)
+    ]
+    workflow_execution_set = []
+    data_object_set = []
+    functional_annotation_agg = []
+    for i, workflow_id in enumerate(workflow_ids):
+        outputs = [
+            f"nmdc:dobj-11-{i * data_objects_per_workflow + j:08d}"
+            for j in range(data_objects_per_workflow)
+        ]
+        workflow_execution_set.append(
+            {
+                "id": workflow_id,
+                "type": "nmdc:MetagenomeAnnotation",
+                "was_informed_by": data_generation_ids[i],
+                "has_output": outputs,
+            }
+        )
+        for j, data_object_id in enumerate(outputs):
+            data_object_set.append(
+                {
+                    "id": data_object_id,
+                    "name": f"{workflow_id}_{j}.gz",
+                    "type": "nmdc:DataObject",
+                    "data_object_type": DATA_OBJECT_TYPES[j % len(DATA_OBJECT_TYPES)],
+                    "was_generated_by": workflow_id,
+                    "file_size_bytes": rng.randint(10**3, 10**10),
+                    "md5_checksum": f"{rng.getrandbits(128):032x}",
+                }
+            )
+        for function in rng.sample(functions, annotations_per_workflow):
+            functional_annotation_agg.append(
+                {
+                    "was_generated_by": workflow_id,
+                    "gene_function_id": function,
+                    "count": rng.randint(1, 5000),
+                    "type": "nmdc:FunctionalAnnotationAggMember",
+                }
+            )
+    return {
+        "study_set": study_set,
+        "biosample_set": biosample_set,
+        "data_generation_set": data_generation_set,
+        "workflow_execution_set": workflow_execution_set,
+        "data_object_set": data_object_set,
+        "functional_annotation_agg": functional_annotation_agg,
+    }
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _lookup(record, path):
+    value = record
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _matches(record, filter):
+    """
+    Whether a record matches a MongoDB filter. Supports $or, $and, $eq, $in, $regex with $options, $gt, $lt, $gte and $lte.
+    """
+    for path, condition in filter.items():
+        if path == "$or":
+            if not any(_matches(record, f) for f in condition):
+                return False
+            continue
+        if path == "$and":
+            if not all(_matches(record, f) for f in condition):
+                return False
+            continue
+        value = _lookup(record, path)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, target in condition.items():
+            if op == "$eq":
+                ok = target in values
+            elif op == "$in":
+                ok = any(v in target for v in values)
+            elif op == "$regex":
+                flags = re.I if "i" in condition.get("$options", "") else 0
+                ok = any(
+                    isinstance(v, str) and re.search(target, v, flags) for v in values
+                )
+            elif op == "$options":
+                continue
+            elif op in ("$gt", "$lt", "$gte", "$lte"):
+                compare = {
+                    "$gt": lambda a, b: a > b,
+                    "$lt": lambda a, b: a < b,
+                    "$gte": lambda a, b: a >= b,
+                    "$lte": lambda a, b: a <= b,
+                }[op]
+                ok = any(v is not None and compare(v, target) for v in values)
+            else:
+                raise ValueError(f"Unsupported operator {op}")
+            if not ok:
+                return False
+    return True
+
+
+def _project(record: dict, fields: list) -> dict:
+    """
+    Project a record to fields, like the NMDC API. A dotted field keeps only that key of its subdocument.
+    """
+    paths = {}
+    for field in fields:
+        head, _, rest = field.partition(".")
+        paths.setdefault(head, []).append(rest)
+    projected = {}
+    for key, value in record.items():
+        if key not in paths:
+            continue
+        if "" in paths[key]:
+            projected[key] = value
+        elif isinstance(value, dict):
+            projected[key] = _project(value, paths[key])
+    return projected
+
+
+class MockNMDCServer:
+    """
+    Local stand-in for the NMDC API, serving in-memory collections over HTTP on a free port.
+    Implements /nmdcschema/{collection} with filter, projection, max_page_size and next_page_token pagination,
+    /nmdcschema/{collection}/{id} and /nmdcschema/ids/{id}/collection-name.
+    params:
+        collections: dict
+            The documents of each collection, e.g. {"biosample_set": [...]}. Collections can be changed while the server runs.
+        delay: float
+            Seconds added to every response, to simulate network latency. Default is 0.
+        cache_queries: bool
+            True to remember the matches of each filter and index documents by id, so large collections are served quickly.
+            Only use it when the collections do not change while the server runs. Default is False.
+    Example:
+        server = MockNMDCServer(synthetic_collections(biosamples=10000), delay=0.02)
+        NMDCSearch.default_base_url = server.base_url
+        ...
+        server.close()
+    """
+
+    def __init__(self, collections: dict, delay: float = 0.0, cache_queries=False):
+        self.collections = collections
+        self.delay = delay
+        self.cache_queries = cache_queries
+        self.requests = []
+        # the number of upcoming requests answered with 429 and a Retry-After of retry_after
+        self.throttle = 0
+        self.retry_after = "0"
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._matched = {}
+        self._ids = None
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with api._lock:
+                    api.requests.append(self.path)
+                    api.in_flight += 1
+                    api.max_in_flight = max(api.max_in_flight, api.in_flight)
+                    throttled = api.throttle > 0
+                    if throttled:
+                        api.throttle -= 1
+                time.sleep(api.delay)
+                if throttled:
+                    status, body = 429, {"detail": "too many requests"}
+                else:
+                    status, body = api.handle(self.path)
+                with api._lock:
+                    api.in_flight -= 1
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                if throttled:
+                    self.send_header("Retry-After", api.retry_after)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _find(self, doc_id: str):
+        """
+        The collection name and document of an id, or (None, None).
+        """
+        if self.cache_queries:
+            with self._lock:
+                if self._ids is None:
+                    self._ids = {
+                        r.get("id"): (name, r)
+                        for name, records in self.collections.items()
+                        for r in records
+                    }
+            return self._ids.get(doc_id, (None, None))
+        for name, records in self.collections.items():
+            for record in records:
+                if record.get("id") == doc_id:
+                    return name, record
+        return None, None
+
+    def _match(self, collection_name: str, filter: str) -> list:
+        if not self.cache_queries:
+            query = json.loads(filter) if filter else {}
+            return [r for r in self.collections[collection_name] if _matches(r, query)]
+        key = (collection_name, filter)
+        matched = self._matched.get(key)
+        if matched is None:
+            query = json.loads(filter) if filter else {}
+            matched = [
+                r for r in self.collections[collection_name] if _matches(r, query)
+            ]
+            self._matched[key] = matched
+        return matched
+
+    def handle(self, path: str):
+        """
+        Answer a request path with a status code and a JSON body.
+        """
+        parsed = urllib.parse.urlparse(path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        parts = parsed.path.strip("/").split("/")
+        if parts[:2] == ["nmdcschema", "ids"]:
+            doc_id = urllib.parse.unquote(parts[2])
+            name, _ = self._find(doc_id)
+            if name is None:
+                return 404, {"detail": "not found"}
+            return 200, {"id": doc_id, "collection_name": name}
+        if len(parts) < 2 or parts[1] not in self.collections:
+            return 404, {"detail": "not found"}
+        fields = [f for f in query.get("projection", "").split(",") if f]
+
+        def project(record):
+            if not fields:
+                return record
+            return _project(record, fields + ["id"])
+
+        if len(parts) == 3:
+            doc_id = urllib.parse.unquote(parts[2])
+            name, record = self._find(doc_id)
+            if name != parts[1]:
+                return 404, {"detail": "not found"}
+            return 200, project(record)
+        matched = self._match(parts[1], query.get("filter", ""))
+        page_size = int(query.get("max_page_size", 20))
+        start = int(query.get("page_token", 0))
+        page = {"resources": [project(r) for r in matched[start : start + page_size]]}
+        if start + page_size < len(matched):
+            page["next_page_token"] = str(start + page_size)
+        return 200, page
+
+    def close(self):
+        """
+        Stop the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.data_processing import DataProcessing
+from nmdc_notebook_tools.scheduler import RequestScheduler
+from nmdc_notebook_tools.transport import Transport
+from nmdc_notebook_tools.benchmark.server import MockNMDCServer
+from nmdc_notebook_tools.benchmark.fixtures import synthetic_collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+BENCHMARKS = (
+    "get_records_all_pages",
+    "get_record_by_id",
+    "convert_to_df",
+    "merge_df",
+    "build_filter",
+)
+# result columns where a larger value is better, the others are better when smaller
+HIGHER_IS_BETTER = ("throughput",)
+COMPARED_COLUMNS = ("throughput", "p95_ms", "peak_memory_mb")
+
+
+class BenchmarkSuite:
+    """
+    Benchmark the search and data processing functions against a local MockNMDCServer with synthetic documents.
+    Each benchmark is timed over several iterations, then run once more under tracemalloc to measure its peak memory,
+    so memory tracing does not slow down the timed iterations.
+    The suite uses its own transport without rate limit, the response cache and mirror are disabled while it runs,
+    and the id cache is cleared before every iteration.
+    params:
+        biosamples: int
+            The number of synthetic biosamples, see synthetic_collections. Default is 2000.
+        delay: float
+            Seconds of simulated network latency per request. Default is 0.005.
+        max_page_size: int
+            The page size of get_records. Default is 500.
+        id_lookups: int
+            The number of get_record_by_id calls per iteration. Default is 100.
+        filters: int
+            The number of build_filter calls per iteration. Default is 1000.
+        repeat: int
+            The number of timed iterations of each benchmark. Default is 5.
+        benchmarks: tuple
+            The benchmarks to run, a subset of BENCHMARKS. Default is all of them.
+    Example:
+        results = BenchmarkSuite(biosamples=10000, delay=0.02).run()
+        regressions = compare_results(results, load_results("benchmark_baseline.json"))
+    """
+
+    def __init__(
+        self,
+        biosamples: int = 2000,
+        delay: float = 0.005,
+        max_page_size: int = 500,
+        id_lookups: int = 100,
+        filters: int = 1000,
+        repeat: int = 5,
+        benchmarks: tuple = BENCHMARKS,
+    ):
+        unknown = [b for b in benchmarks if b not in BENCHMARKS]
+        if unknown:
+            raise ValueError(
+                f"benchmarks must be one of the following: {', '.join(BENCHMARKS)}"
+            )
+        self.biosamples = biosamples
+        self.delay = delay
+        self.max_page_size = max_page_size
+        self.id_lookups = id_lookups
+        self.filters = filters
+        self.repeat = repeat
+        self.benchmarks = benchmarks
+        self.collections = None
+
+    def run(self) -> pd.DataFrame:
+        """
+        Run the benchmarks.
+        returns:
+            pd.DataFrame
+                One row per benchmark, indexed by name, with the columns iterations, items, seconds, throughput (items per second),
+                p50_ms, p95_ms and p99_ms (per operation latency) and peak_memory_mb.
+        """
+        if self.collections is None:
+            self.collections = synthetic_collections(biosamples=self.biosamples)
+        saved = (
+            NMDCSearch.default_base_url,
+            NMDCSearch._transport,
+            CollectionSearch.response_cache,
+            CollectionSearch.mirror,
+            CollectionSearch.offline,
+            CollectionSearch.adaptive_paging,
+        )
+        # a plain transport without rate limit, never a cassette or other transport the caller installed
+        transport = Transport(scheduler=RequestScheduler(rate=None))
+        server = MockNMDCServer(self.collections, self.delay, cache_queries=True)
+        try:
+            NMDCSearch.default_base_url = server.base_url
+            NMDCSearch._transport = transport
+            CollectionSearch.response_cache = None
+            CollectionSearch.mirror = None
+            CollectionSearch.offline = False
+            CollectionSearch.adaptive_paging = None
+            rows = [self._run_benchmark(name) for name in self.benchmarks]
+        finally:
+            (
+                NMDCSearch.default_base_url,
+                NMDCSearch._transport,
+                CollectionSearch.response_cache,
+                CollectionSearch.mirror,
+                CollectionSearch.offline,
+                CollectionSearch.adaptive_paging,
+            ) = saved
+            transport.close()
+            server.close()
+        return pd.DataFrame(rows).set_index("benchmark")
+
+    def _run_benchmark(self, name: str) -> dict:
+        iteration = getattr(self, f"_{name}")()
+        items = 0
+        latencies = []
+        seconds = 0.0
+        for _ in range(self.repeat):
+            NMDCSearch.id_cache.clear()
+            start = time.perf_counter()
+            count, operation_latencies = iteration()
+            elapsed = time.perf_counter() - start
+            seconds += elapsed
+            items += count
+            latencies.extend(operation_latencies or [elapsed])
+        NMDCSearch.id_cache.clear()
+        tracemalloc.start()
+        try:
+            iteration()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        logger.info("Benchmark %s: %.0f items/s", name, items / seconds)
+        return {
+            "benchmark": name,
+            "iterations": self.repeat,
+            "items": items,
+            "seconds": seconds,
+            "throughput": items / seconds if seconds else float("inf"),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "peak_memory_mb": peak / 1024**2,
+        }
+
+    # each benchmark prepares its inputs and returns one iteration,
+    # which returns the number of items processed and optionally the latency of each operation
+
+    def _get_records_all_pages(self):
+        def iteration():
+            records = BiosampleSearch().get_records(
+                max_page_size=self.max_page_size, all_pages=True
+            )
+            return len(records), None
+
+        return iteration
+
+    def _get_record_by_id(self):
+        ids = [r["id"] for r in self.collections["biosample_set"]]
+        ids = random.Random(0).sample(ids, min(self.id_lookups, len(ids)))
+
+        def iteration():
+            search = BiosampleSearch()
+            latencies = []
+            for doc_id in ids:
+                start = time.perf_counter()
+                search.get_record_by_id(doc_id)
+                latencies.append(time.perf_counter() - start)
+            return len(ids), latencies
+
+        return iteration
+
+    def _convert_to_df(self):
+        records = self.collections["biosample_set"]
+
+        def iteration():
+            df = DataProcessing().convert_to_df(records)
+            return len(df), None
+
+        return iteration
+
+    def _merge_df(self):
+        data_processing = DataProcessing()
+        biosamples = data_processing.convert_to_df(self.collections["biosample_set"])
+        data_generations = data_processing.convert_to_df(
+            self.collections["data_generation_set"]
+        )
+
+        def iteration():
+            data_processing.merge_df(biosamples, data_generations, "id", "has_input")
+            return len(biosamples), None
+
+        return iteration
+
+    def _build_filter(self):
+        attributes = [
+            {
+                "name": f"soil sample {i}",
+                "env_broad_scale.has_raw_value": "terrestrial biome [ENVO:00000446]",
+                "geo_loc_name": f"USA: Site {i} (plot.{i})",
+            }
+            for i in range(self.filters)
+        ]
+
+        def iteration():
+            data_processing = DataProcessing()
+            latencies = []
+            for attribute in attributes:
+                start = time.perf_counter()
+                data_processing.build_filter(attribute)
+                latencies.append(time.perf_counter() - start)
+            return len(attributes), latencies
+
+        return iteration
+
+
+def save_results(results: pd.DataFrame, path: str):
+    """
+    Save benchmark results as JSON, e.g. as the baseline of a release.
+    """
+    with open(path, "w") as f:
+        json.dump(results.to_dict(orient="index"), f, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> pd.DataFrame:
+    """
+    Load benchmark results saved with save_results.
+    """
+    with open(path) as f:
+        return pd.DataFrame.from_dict(json.load(f), orient="index")
+
+
+def check_thresholds(results: pd.DataFrame, thresholds: dict) -> list:
+    """
+    Check benchmark results against absolute limits.
+    params:
+        results: pd.DataFrame
+            The results of BenchmarkSuite.run.
+        thresholds: dict
+            Limits per benchmark. throughput is a minimum, every other column a maximum.
+            Example: {"get_records_all_pages": {"throughput": 5000, "peak_memory_mb": 200}}
+    returns:
+        list
+            A description of every violated threshold, empty if all are met.
+    """
+    violations = []
+    for name, limits in thresholds.items():
+        if name not in results.index:
+            continue
+        for column, limit in limits.items():
+            value = results.loc[name, column]
+            if column in HIGHER_IS_BETTER:
+                failed = value < limit
+            else:
+                failed = value > limit
+            if failed:
+                violations.append(f"{name} {column} is {value:.4g}, limit {limit:.4g}")
+    return violations
+
+
+def compare_results(
+    results: pd.DataFrame, baseline: pd.DataFrame, tolerance: float = 0.25
+) -> list:
+    """
+    Find regressions against baseline results, e.g. of the last release.
+    params:
+        results: pd.DataFrame
+            The results of BenchmarkSuite.run.
+        baseline: pd.DataFrame
+            The results to compare with, see load_results.
+        tolerance: float
+            The allowed relative change before a result counts as a regression. Default is 0.25.
+    returns:
+        list
+            A description of every regression in throughput, p95 latency or peak memory, empty if there are none.
+    """
+    thresholds = {}
+    for name in results.index.intersection(baseline.index):
+        thresholds[name] = {
+            column: (
+                baseline.loc[name, column] * (1 - tolerance)
+                if column in HIGHER_IS_BETTER
+                else baseline.loc[name, column] * (1 + tolerance)
+            )
+            for column in COMPARED_COLUMNS
+        }
+    return check_thresholds(results, thresholds)
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+import threading
+import time
+import urllib.parse
+import requests
+from requests.structures import CaseInsensitiveDict
+from nmdc_notebook_tools import filters
+from nmdc_notebook_tools.response_cache import ResponseCache
+from nmdc_notebook_tools.transport import Transport
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "append")
+MATCHING = ("strict", "permissive")
+
+
+class CassetteMissError(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode for a request that is not in the cassette.
+    """
+
+
+def _parse(url: str):
+    """
+    Split a url into its path and its non-empty query parameters, with the filter and projection normalized.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    path = urllib.parse.unquote(parsed.path).rstrip("/")
+    params = {
+        k: v
+        for k, v in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if v
+    }
+    if "filter" in params:
+        params["filter"] = filters.normalize_filter(params["filter"])
+    if "projection" in params:
+        params["projection"] = ResponseCache.normalize_fields(params["projection"])
+    return path, {k: v for k, v in params.items() if v}
+
+
+def strict_key(url: str) -> str:
+    """
+    The key of a request in strict matching: the path and every query parameter, ignoring the host, parameter order,
+    url encoding, the key order and whitespace of the filter JSON (see filters.normalize_filter) and the field order of the projection.
+    """
+    path, params = _parse(url)
+    return f"{path}?{urllib.parse.urlencode(sorted(params.items()))}"
+
+
+def permissive_key(url: str) -> tuple:
+    """
+    The key of a request in permissive matching: the path, the normalized filter and the page token.
+    The page size and the projection are ignored.
+    """
+    path, params = _parse(url)
+    return path, params.get("filter", ""), params.get("page_token", "")
+
+
+def _projection(url: str) -> set:
+    _, params = _parse(url)
+    return {f for f in params.get("projection", "").split(",") if f}
+
+
+def _covers(recorded: set, field: str) -> bool:
+    """
+    Whether a recorded projection includes a field, either itself or through a parent, e.g. lat_lon covers lat_lon.latitude.
+    """
+    parts = field.split(".")
+    return any(".".join(parts[:i]) in recorded for i in range(1, len(parts) + 1))
+
+
+def _project(document: dict, fields) -> dict:
+    """
+    Trim a document to fields like the NMDC API projection. A dotted field keeps only that key of its subdocument.
+    """
+    paths = {}
+    for field in fields:
+        head, _, rest = field.partition(".")
+        paths.setdefault(head, []).append(rest)
+    projected = {}
+    for key, value in document.items():
+        if key not in paths:
+            continue
+        if "" in paths[key]:
+            projected[key] = value
+        elif isinstance(value, dict):
+            projected[key] = _project(value, paths[key])
+    return projected
+
+
+class CassetteTransport(Transport):
+    """
+    Transport that records NMDC API requests and responses to a cassette file, or replays them without network access.
+    A replayed notebook gets exactly the recorded data, so runs are deterministic, and it runs without network latency or rate limits.
+    The cassette is a gzip compressed JSON lines file with one request and response per line.
+    params:
+        path: str
+            The cassette file, e.g. "analysis.jsonl.gz".
+        mode: str
+            "record" to send every request to the NMDC API and write a new cassette,
+            "replay" to answer every request from the cassette and never touch the network,
+            "append" to replay recorded requests and record new ones. Default is "replay".
+        match: str
+            "strict" to replay only requests with the same path and query parameters, compared after normalizing
+            the filter JSON and the projection, see strict_key.
+            "permissive" to fall back to requests with the same path, normalized filter and page token when there is no strict match,
+            so changed page sizes, adaptive paging and narrower projections still replay. Responses are trimmed to the requested projection,
+            including dotted fields such as lat_lon.latitude.
+            Default is "strict".
+        kwargs:
+            Passed to Transport, used for the requests sent to the NMDC API.
+    Example:
+        NMDCSearch.use_cassette("analysis.jsonl.gz", mode="record")
+        ...  # run the notebook once with network access
+        NMDCSearch.use_cassette("analysis.jsonl.gz", mode="replay")
+    """
+
+    def __init__(
+        self, path: str, mode: str = "replay", match: str = "strict", **kwargs
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of the following: {', '.join(MODES)}")
+        if match not in MATCHING:
+            raise ValueError(
+                f"match must be one of the following: {', '.join(MATCHING)}"
+            )
+        super().__init__(**kwargs)
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self.stats = {"replayed": 0, "recorded": 0, "missed": 0}
+        self._strict = {}
+        self._permissive = {}
+        self._file = None
+        self._lock = threading.Lock()
+        if mode == "record":
+            # start a new cassette, entries are appended as they are recorded
+            with gzip.open(path, "wb"):
+                pass
+        elif os.path.exists(path):
+            self._load()
+        elif mode == "replay":
+            raise FileNotFoundError(f"Cassette {path} does not exist, record it first")
+
+    def _load(self):
+        count = 0
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+                        count += 1
+            except EOFError:
+                # the cassette is still being recorded, everything flushed so far is complete
+                pass
+        logger.info("Loaded %s recorded responses from %s", count, self.path)
+
+    def _add(self, entry: dict):
+        url = entry["url"]
+        self._strict[strict_key(url)] = entry
+        self._permissive.setdefault(permissive_key(url), []).append(entry)
+
+    def _find(self, url: str):
+        """
+        The recorded entry for a url and the fields to trim its body to, or (None, None).
+        """
+        entry = self._strict.get(strict_key(url))
+        if entry is not None or self.match == "strict":
+            return entry, None
+        fields = _projection(url)
+        # the most recent recording whose projection covers the requested fields
+        for entry in reversed(self._permissive.get(permissive_key(url), [])):
+            recorded = _projection(entry["url"])
+            if not recorded or (
+                fields and all(_covers(recorded, field) for field in fields)
+            ):
+                return entry, fields
+        return None, None
+
+    def _record(self, url: str, response: requests.models.Response):
+        entry = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() in ("content-type", "retry-after")
+            },
+            "body": response.text,
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+            self._file.write(line)
+            # a sync flush keeps every recorded response readable if the process dies
+            self._file.flush()
+            self._add(entry)
+            self.stats["recorded"] += 1
+
+    @staticmethod
+    def _response(url: str, entry: dict, fields) -> requests.models.Response:
+        body = entry["body"]
+        if fields and entry["status"] == 200:
+            document = json.loads(body)
+            keep = fields | {"id"}
+            if isinstance(document.get("resources"), list):
+                document["resources"] = [
+                    _project(r, keep) for r in document["resources"]
+                ]
+            else:
+                document = _project(document, keep)
+            body = json.dumps(document)
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = body.encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+    def get(self, url: str, stats: dict = None) -> requests.models.Response:
+        """
+        Answer a GET request from the cassette, or send it to the NMDC API and record it, depending on the mode.
+        params:
+            url: str
+                The full url to request.
+            stats: dict
+                Optional dictionary that receives the status code, the response size in bytes and the number of retries.
+                The source of replayed responses is set to "cassette".
+        """
+        if self.mode != "record":
+            entry, fields = self._find(url)
+            if entry is not None:
+                response = self._response(url, entry, fields)
+                with self._lock:
+                    self.stats["replayed"] += 1
+                if stats is not None:
+                    stats["source"] = "cassette"
+                    stats["status"] = response.status_code
+                    stats["bytes"] = len(response.content)
+                    stats["retries"] = 0
+                return response
+            if self.mode == "replay":
+                with self._lock:
+                    self.stats["missed"] += 1
+                raise CassetteMissError(
+                    f"No recorded response for {url} in cassette {self.path}"
+                )
+        response = super().get(url, stats)
+        self._record(url, response)
+        return response
+
+    def close(self):
+        """
+        Finish the cassette file and close all pooled connections. Recording continues in a new gzip member if requests are sent afterwards.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        super().close()
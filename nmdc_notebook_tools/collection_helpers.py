@@ -1,10 +1,39 @@
 # -*- coding: utf-8 -*-
 from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools import instrumentation
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
 import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
+# NMDC ids carry a typecode that determines the schema class, and so the collection, of the record.
+# Example: nmdc:bsm-11-002vgm56 is a Biosample in biosample_set.
+TYPECODE_COLLECTIONS = {
+    "bsm": "biosample_set",
+    "sty": "study_set",
+    "dobj": "data_object_set",
+    "dgns": "data_generation_set",
+    "dgms": "data_generation_set",
+    "omprc": "data_generation_set",
+    "frsite": "field_research_site_set",
+    "procsm": "processed_sample_set",
+    "extrp": "material_processing_set",
+    "libprp": "material_processing_set",
+    "poolp": "material_processing_set",
+    "subspr": "material_processing_set",
+    "mixpro": "material_processing_set",
+    "filtpr": "material_processing_set",
+    "inst": "instrument_set",
+    "manif": "manifest_set",
+}
+# every workflow execution typecode starts with wf, e.g. wfmgan, wfrqc, wfmag
+WORKFLOW_TYPECODE_PREFIX = "wf"
+TYPECODE_PATTERN = re.compile(r"^nmdc:([a-z]+)-")
+
 
 class CollectionHelpers(NMDCSearch):
     """
@@ -12,28 +41,141 @@ class CollectionHelpers(NMDCSearch):
     These functions may not be specific to a particular collection.
     """
 
+    # typecodes learned from the API for ids not covered by TYPECODE_COLLECTIONS
+    _learned_typecodes = {}
+    _learned_lock = threading.Lock()
+
     def __init__(self):
         super().__init__()
 
+    @staticmethod
+    def get_typecode(doc_id: str):
+        """
+        Get the typecode of an NMDC id, or None if the id has no typecode.
+        Example: get_typecode("nmdc:bsm-11-002vgm56") returns "bsm".
+        """
+        match = TYPECODE_PATTERN.match(doc_id) if isinstance(doc_id, str) else None
+        return match.group(1) if match else None
+
+    def resolve_collection_name(self, doc_id: str):
+        """
+        Determine the collection an id belongs to from its typecode, without calling the NMDC API.
+        Returns None if the typecode is not known.
+        params:
+            doc_id: str
+                The id of the document.
+        """
+        return self._collection_for_typecode(self.get_typecode(doc_id))
+
+    def _collection_for_typecode(self, typecode):
+        if typecode is None:
+            return None
+        collection_name = TYPECODE_COLLECTIONS.get(typecode)
+        if collection_name is None and typecode.startswith(WORKFLOW_TYPECODE_PREFIX):
+            collection_name = "workflow_execution_set"
+        if collection_name is None:
+            collection_name = self._learned_typecodes.get(typecode)
+        return collection_name
+
     def get_record_name_from_id(self, doc_id: str):
         """
         Used when you have an id but not the collection name.
         Determine the schema class by which the id belongs to.
+        The collection is resolved from the id's typecode when possible, otherwise the NMDC API is asked.
         params:
             doc_id: str
                 The id of the document.
         """
-        url = f"{self.base_url}/nmdcschema/ids/{doc_id}/collection-name"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            logger.error("API request failed", exc_info=True)
-            raise RuntimeError("Failed to get record from NMDC API") from e
-        else:
-            logging.debug(
-                f"API request response: {response.json()}\n API Status Code: {response.status_code}"
-            )
-
-        collection_name = response.json()["collection_name"]
-        return collection_name
+        collection_name = self.resolve_collection_name(doc_id)
+        if collection_name is not None:
+            return collection_name
+        return self._fetch_record_name_from_id(doc_id)
+
+    def _fetch_record_name_from_id(self, doc_id: str):
+        """
+        Ask the NMDC API which collection an id belongs to. Answers are memoized in the shared id cache.
+        """
+        with instrumentation.measure("collection_name") as event:
+            key = self.id_cache.collection_name_key(doc_id, self.base_url)
+            collection_name = self.id_cache.get(key)
+            if collection_name is not None:
+                event["source"] = "id_cache"
+                event["collection_name"] = collection_name
+                return collection_name
+            url = f"{self.base_url}/nmdcschema/ids/{doc_id}/collection-name"
+            try:
+                response = self._get(url, event)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.error("API request failed", exc_info=True)
+                raise RuntimeError("Failed to get record from NMDC API") from e
+
+            collection_name = response.json()["collection_name"]
+            event["collection_name"] = collection_name
+            self.id_cache.set(key, collection_name)
+            return collection_name
+
+    def get_record_names_from_ids(self, ids, max_workers: int = 8):
+        """
+        Determine the collection of many ids at once. Ids are resolved from their typecodes without network access where possible.
+        For unknown typecodes, one id per typecode is looked up concurrently through the NMDC API and the answer is reused for every id with that typecode.
+        Ids without a typecode are looked up individually.
+        params:
+            ids: list or pd.Series
+                The ids of the documents.
+            max_workers: int
+                The maximum number of concurrent API lookups. Default is 8.
+        returns:
+            A list of collection names, or a pd.Series with the same index if a pd.Series was given.
+        """
+        series = (
+            ids if isinstance(ids, pd.Series) else pd.Series(list(ids), dtype=object)
+        )
+        typecodes = series.str.extract(TYPECODE_PATTERN, expand=False)
+        known = {
+            typecode: self._collection_for_typecode(typecode)
+            for typecode in typecodes.dropna().unique()
+        }
+        unknown = [typecode for typecode, name in known.items() if name is None]
+        if unknown:
+            candidates = {
+                typecode: series[typecodes == typecode].drop_duplicates().tolist()
+                for typecode in unknown
+            }
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                learned = executor.map(
+                    lambda typecode: (
+                        typecode,
+                        self._learn_typecode(typecode, candidates[typecode]),
+                    ),
+                    unknown,
+                )
+                known.update(learned)
+        # object dtype, so untyped names can be filled in even when no id has a typecode
+        names = typecodes.map(known).astype(object)
+        untyped = series[typecodes.isna()].drop_duplicates().tolist()
+        if untyped:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                fetched = dict(
+                    zip(untyped, executor.map(self._fetch_record_name_from_id, untyped))
+                )
+            names[typecodes.isna()] = series[typecodes.isna()].map(fetched)
+        if isinstance(ids, pd.Series):
+            return names
+        return names.tolist()
+
+    def _learn_typecode(self, typecode: str, doc_ids: list):
+        """
+        Look up the collection of the first id with this typecode that the NMDC API knows, and remember it for the typecode.
+        """
+        error = None
+        for doc_id in doc_ids:
+            try:
+                collection_name = self._fetch_record_name_from_id(doc_id)
+            except RuntimeError as e:
+                error = e
+                continue
+            with self._learned_lock:
+                CollectionHelpers._learned_typecodes[typecode] = collection_name
+            return collection_name
+        raise error
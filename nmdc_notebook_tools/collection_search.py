@@ -2,7 +2,17 @@
 import requests
 from nmdc_notebook_tools.data_processing import DataProcessing
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import time
 from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools import filters
+from nmdc_notebook_tools import scheduler
+from nmdc_notebook_tools import instrumentation
+from nmdc_notebook_tools.response_cache import ResponseCache
+from nmdc_notebook_tools.mirror import CollectionMirror
+from nmdc_notebook_tools.lazy_records import LazyResultSet
+from nmdc_notebook_tools.adaptive_paging import AdaptivePaging
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,10 +23,69 @@ class CollectionSearch(NMDCSearch):
     Class to interact with the NMDC API to get collections of data. Must know the collection name to query.
     """
 
+    response_cache = None
+    mirror = None
+    offline = False
+    adaptive_paging = None
+    # the room left in chunked request urls for the page token of later pages
+    max_page_token_length = 64
+
     def __init__(self, collection_name):
         self.collection_name = collection_name
         super().__init__()
 
+    @classmethod
+    def set_response_cache(cls, cache: ResponseCache = None):
+        """
+        Enable the on-disk response cache for every collection search in the process. Pass None to disable it.
+        Crawls with adaptive paging do not use the cache, see AdaptivePaging.
+        params:
+            cache: ResponseCache
+                The cache to read pages from and store pages in.
+        Example:
+            CollectionSearch.set_response_cache(ResponseCache(ttls={"study_set": 7 * 86400}))
+        """
+        CollectionSearch.response_cache = cache
+
+    @classmethod
+    def set_mirror(cls, mirror: CollectionMirror = None, offline: bool = False):
+        """
+        Answer queries from local collection snapshots for every collection search in the process. Pass None to go back to the NMDC API.
+        get_records, get_record_by_filter, get_record_by_attribute, get_record_by_id and the latitude/longitude filters all run against the snapshot.
+        params:
+            mirror: CollectionMirror
+                The local snapshots to query.
+            offline: bool
+                True to raise an error for collections that are not mirrored instead of calling the NMDC API. Default is False.
+        """
+        CollectionSearch.mirror = mirror
+        CollectionSearch.offline = offline
+
+    @classmethod
+    def set_adaptive_paging(cls, adaptive_paging: AdaptivePaging = None):
+        """
+        Let every paginated crawl in the process choose its page sizes from measured latency and payload size. Pass None to use fixed page sizes.
+        Applies to all_pages=True, iter_pages and iter_records. The max_page_size of a crawl becomes its first page size.
+        params:
+            adaptive_paging: AdaptivePaging
+                The page size bounds and targets.
+        Example:
+            CollectionSearch.set_adaptive_paging(AdaptivePaging(min_page_size=100, max_page_size=5000))
+        """
+        CollectionSearch.adaptive_paging = adaptive_paging
+
+    def _local_collection(self, collection_name: str):
+        """
+        Get the local snapshot of a collection, or None if queries should go to the NMDC API.
+        """
+        if self.mirror is not None and self.mirror.has(collection_name):
+            return self.mirror.load(collection_name)
+        if self.offline:
+            raise RuntimeError(
+                f"Collection {collection_name} is not mirrored locally and offline mode is enabled"
+            )
+        return None
+
     def get_records(
         self,
         filter: str = "",
@@ -34,54 +103,312 @@ class CollectionSearch(NMDCSearch):
             fields: str
                 The fields to return. Default is all fields.
         """
-        filter = urllib.parse.quote_plus(filter)
-        url = f"{self.base_url}/nmdcschema/{self.collection_name}?filter={filter}&max_page_size={max_page_size}&projection={fields}"
+        if all_pages:
+            return self._get_all_pages(filter, max_page_size, fields)
+        return self._fetch_page(filter, max_page_size, fields)["resources"]
+
+    def get_lazy_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "id",
+        all_pages: bool = False,
+        max_workers: int = 4,
+    ) -> LazyResultSet:
+        """
+        Get records with a minimal projection, fetching any other field only when it is first read.
+        Reading a field that was not projected fetches it for every record of the result at once, projected to just that field.
+        params:
+            filter: str
+                The filter to apply to the query. Default is an empty string.
+            max_page_size: int
+                The maximum number of items to return per page. Default is 100.
+            fields: str
+                The fields to fetch up front. id is always fetched. Default is "id".
+            all_pages: bool
+                True to return all pages. False to return the first page. Default is False.
+            max_workers: int
+                The maximum number of concurrent requests when fetching a field. Default is 4.
+        Example:
+            samples = BiosampleSearch().get_lazy_records(filter, fields="id,name", all_pages=True)
+            depths = [sample["depth"] for sample in samples]  # one batched fetch of depth
+        """
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        if "id" not in names:
+            names.insert(0, "id")
+        fields = ",".join(names)
+        records = self.get_records(filter, max_page_size, fields, all_pages)
+        return LazyResultSet(self, records, fields, max_workers)
+
+    def iter_pages(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        progress=None,
+    ):
+        """
+        Iterate over every page of a collection query, fetching pages lazily. Only one page (plus the next one being prefetched) is held in memory at a time.
+        Breaking out of the loop stops the crawl without requesting the remaining pages.
+        params:
+            filter: str
+                The filter to apply to the query. Default is an empty string.
+            max_page_size: int
+                The maximum number of items to return per page. Default is 100.
+            fields: str
+                The fields to return. Default is all fields.
+            progress: callable
+                Optional function called after each page as progress(pages_fetched, records_fetched).
+        yields:
+            list
+                The records of one page.
+        """
+        pages_fetched = 0
+        records_fetched = 0
+        for page in self._iter_pages(filter, max_page_size, fields):
+            records = page["resources"]
+            pages_fetched += 1
+            records_fetched += len(records)
+            if progress is not None:
+                progress(pages_fetched, records_fetched)
+            yield records
+
+    def iter_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        progress=None,
+    ):
+        """
+        Iterate over every record of a collection query, fetching pages lazily. Memory use is proportional to the page size, not the collection size.
+        Breaking out of the loop stops the crawl without requesting the remaining pages.
+        params:
+            filter: str
+                The filter to apply to the query. Default is an empty string.
+            max_page_size: int
+                The maximum number of items to return per page. Default is 100.
+            fields: str
+                The fields to return. Default is all fields.
+            progress: callable
+                Optional function called after each page as progress(pages_fetched, records_fetched).
+        Example:
+            for record in BiosampleSearch().iter_records(fields="id,lat_lon"):
+                ...
+        """
+        for records in self.iter_pages(filter, max_page_size, fields, progress):
+            yield from records
+
+    def _page_url(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        page_token: str = "",
+        collection_name: str = "",
+    ) -> str:
+        """
+        Build the url for one page of a collection query. The filter is url encoded here.
+        """
+        collection_name = collection_name or self.collection_name
+        url = f"{self.base_url}/nmdcschema/{collection_name}?filter={urllib.parse.quote_plus(filter)}&max_page_size={max_page_size}&projection={fields}"
+        if page_token:
+            url = f"{url}&page_token={page_token}"
+        return url
+
+    def _fetch_page(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        page_token: str = "",
+        collection_name: str = "",
+        stats: dict = None,
+        use_cache: bool = True,
+    ) -> dict:
+        """
+        Get one page of a collection query. The response body is decoded exactly once.
+        When a stats dictionary is given, the source of the page (mirror, cache or api) and the status, size and retries of the response are stored in it.
+        With use_cache False the response cache is neither read nor written.
+        Every page is reported to the instrumentation hooks.
+        """
+        collection_name = collection_name or self.collection_name
+        stats = {} if stats is None else stats
+        with instrumentation.measure(
+            "page",
+            collection_name=collection_name,
+            filter=filter,
+            fields=fields,
+            pages=1,
+        ) as event:
+            try:
+                page = self._load_page(
+                    filter,
+                    max_page_size,
+                    fields,
+                    page_token,
+                    collection_name,
+                    stats,
+                    use_cache,
+                )
+            finally:
+                event.update(stats)
+            event["records"] = len(page.get("resources", []))
+        return page
+
+    def _load_page(
+        self,
+        filter: str,
+        max_page_size: int,
+        fields: str,
+        page_token: str,
+        collection_name: str,
+        stats: dict,
+        use_cache: bool = True,
+    ) -> dict:
+        """
+        Get one page from the local mirror, the response cache or the NMDC API, in that order.
+        """
+        local_collection = self._local_collection(collection_name)
+        if local_collection is not None:
+            stats["source"] = "mirror"
+            return local_collection.page(filter, max_page_size, fields, page_token)
+        cache = self.response_cache if use_cache else None
+        if cache is not None:
+            page = cache.get(
+                collection_name,
+                filter,
+                max_page_size,
+                fields,
+                page_token,
+                self.base_url,
+            )
+            if page is not None:
+                stats["source"] = "cache"
+                return page
+        url = self._page_url(filter, max_page_size, fields, page_token, collection_name)
+        stats["source"] = "api"
         try:
-            response = requests.get(url)
+            response = self._get(url, stats)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             logger.error("API request failed", exc_info=True)
             raise RuntimeError("Failed to get collection from NMDC API") from e
-        else:
-            logging.debug(
-                f"API request response: {response.json()}\n API Status Code: {response.status_code}"
+        page = response.json()
+        if cache is not None:
+            cache.set(
+                collection_name,
+                page,
+                filter,
+                max_page_size,
+                fields,
+                page_token,
+                self.base_url,
             )
+        return page
 
-        results = response.json()["resources"]
-        # otherwise, get all pages
-        if all_pages:
-            results = self._get_all_pages(response, filter, max_page_size, fields)[
-                "resources"
-            ]
+    def _iter_pages(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        collection_name: str = "",
+    ):
+        """
+        Yield every page of a collection query. As soon as a page arrives the request for the
+        next page is sent, so the download of page N+1 overlaps the processing of page N.
+        """
+        adaptive_paging = self.adaptive_paging
+        crawl = None
+        # cached pages are keyed on their page size, which an adaptive crawl chooses anew every run,
+        # so a cached next_page_token could be sent with a page size it was not issued for
+        use_cache = adaptive_paging is None
+        if adaptive_paging is not None:
+            crawl = adaptive_paging.start(
+                collection_name or self.collection_name, fields, filter
+            )
+            max_page_size = adaptive_paging.first_page_size(max_page_size)
+        executor = ThreadPoolExecutor(max_workers=1)
+        # the first page is as urgent as the caller, the rest of the crawl is bulk
+        future = executor.submit(
+            scheduler.in_lane(scheduler.current_lane(), self._fetch_page_measured),
+            filter,
+            max_page_size,
+            fields,
+            "",
+            collection_name,
+            use_cache,
+        )
+        try:
+            while future is not None:
+                page, seconds, stats = future.result()
+                next_page_token = page.get("next_page_token")
+                future = None
+                if crawl is not None:
+                    records = len(page.get("resources", []))
+                    measured = stats.get("source") == "api"
+                    adaptive_paging.record(
+                        crawl,
+                        max_page_size,
+                        records,
+                        seconds if measured else 0.0,
+                        stats.get("bytes", 0),
+                    )
+                    if measured:
+                        max_page_size = adaptive_paging.next_page_size(
+                            max_page_size, records, seconds, stats.get("bytes", 0)
+                        )
+                if next_page_token:
+                    future = executor.submit(
+                        scheduler.in_lane(scheduler.BULK, self._fetch_page_measured),
+                        filter,
+                        max_page_size,
+                        fields,
+                        next_page_token,
+                        collection_name,
+                        use_cache,
+                    )
+                yield page
+        finally:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
 
-        return results
+    def _fetch_page_measured(
+        self,
+        filter: str,
+        max_page_size: int,
+        fields: str,
+        page_token: str,
+        collection_name: str,
+        use_cache: bool = True,
+    ):
+        """
+        Fetch a page and return it with its latency in seconds and its fetch statistics.
+        For pages from the NMDC API the latency is the HTTP round trip, without rate limit queueing and Retry-After pauses,
+        so throttling does not shrink the pages of adaptive crawls.
+        """
+        stats = {}
+        start = time.perf_counter()
+        page = self._fetch_page(
+            filter, max_page_size, fields, page_token, collection_name, stats, use_cache
+        )
+        seconds = stats.get("round_trip_seconds", time.perf_counter() - start)
+        return page, seconds, stats
 
     def _get_all_pages(
         self,
-        response: requests.models.Response,
         filter: str = "",
         max_page_size: int = 100,
         fields: str = "",
-    ):
-        results = response.json()
-
-        while True:
-            if response.json().get("next_page_token"):
-                next_page_token = response.json()["next_page_token"]
-            else:
-                break
-            url = f"{self.base_url}/nmdcschema/{self.collection_name}?filter={filter}&max_page_size={max_page_size}&projection={fields}&page_token={next_page_token}"
-            try:
-                response = requests.get(url)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                logger.error("API request failed", exc_info=True)
-                raise RuntimeError("Failed to get collection from NMDC API") from e
-            else:
-                logging.debug(
-                    f"API request response: {response.json()}\n API Status Code: {response.status_code}"
-                )
-            results = {"resources": results["resources"] + response.json()["resources"]}
+        collection_name: str = "",
+    ) -> list:
+        """
+        Get the records from every page of a collection query as a single list.
+        """
+        results = []
+        for page in self._iter_pages(filter, max_page_size, fields, collection_name):
+            results.extend(page["resources"])
         return results
 
     def get_record_by_filter(
@@ -113,6 +440,8 @@ class CollectionSearch(NMDCSearch):
         fields="",
         all_pages=False,
         exact_match=False,
+        match="",
+        case_sensitive=True,
     ):
         """
         Get a record from the NMDC API by its name. Records can be filtered based on their attributes found https://microbiomedata.github.io/nmdc-schema/.
@@ -130,11 +459,18 @@ class CollectionSearch(NMDCSearch):
             exact_match: bool
                 This var is used to determine if the inputted attribute value is an exact match or a partial match. Default is False, meaning the user does not need to input an exact match.
                 Under the hood this is used to determine if the inputted attribute value should be wrapped in a regex expression.
+            match: str
+                How the value is matched, overriding exact_match. One of exact, prefix, contains or regex, see filters.MATCH_MODES.
+                Partial matches are escaped, use regex to pass a regular expression. A case sensitive prefix match can be served from an index.
+            case_sensitive: bool
+                False to ignore case. Default is True.
         """
-        if exact_match:
-            filter = f'{{"{attribute_name}":"{attribute_value}"}}'
-        else:
-            filter = f'{{"{attribute_name}":{{"$regex":"{attribute_value}"}}}}'
+        match = match or ("exact" if exact_match else "contains")
+        filter = filters.to_json(
+            filters.compile_filter(
+                {attribute_name: attribute_value}, match, case_sensitive
+            )
+        )
         results = self.get_records(filter, max_page_size, fields, all_pages)
         return results
 
@@ -145,7 +481,7 @@ class CollectionSearch(NMDCSearch):
         fields: str = "",
     ):
         """
-        Get a collection of data from the NMDC API by id.
+        Get a collection of data from the NMDC API by id. Lookups are memoized in the shared id cache, see NMDCSearch.configure_id_cache.
         params:
             collection_id: str
                 The id of the collection.
@@ -154,23 +490,209 @@ class CollectionSearch(NMDCSearch):
             fields: str
                 The fields to return. Default is all fields.
         """
-        url = f"{self.base_url}/nmdcschema/{self.collection_name}/{collection_id}?max_page_size={max_page_size}&projection={fields}"
-        # get the reponse
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            logger.error("API request failed", exc_info=True)
-            raise RuntimeError("Failed to get collection by id from NMDC API") from e
-        else:
-            logging.debug(
-                f"API request response: {response.json()}\n API Status Code: {response.status_code}"
+        with instrumentation.measure(
+            "record_by_id", collection_name=self.collection_name, fields=fields
+        ) as event:
+            local_collection = self._local_collection(self.collection_name)
+            if local_collection is not None:
+                event["source"] = "mirror"
+                results = local_collection.get(collection_id, fields)
+                if results is None:
+                    raise RuntimeError(
+                        f"Record {collection_id} not found in the local {self.collection_name} snapshot"
+                    )
+                event["records"] = 1
+                return results
+            key = self.id_cache.record_key(
+                self.collection_name, collection_id, fields, self.base_url
             )
+            results = self.id_cache.get(key)
+            if results is not None:
+                event["source"] = "id_cache"
+                event["records"] = 1
+                return results
+            url = f"{self.base_url}/nmdcschema/{self.collection_name}/{collection_id}?max_page_size={max_page_size}&projection={fields}"
+            # get the reponse
+            try:
+                response = self._get(url, event)
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.error("API request failed", exc_info=True)
+                raise RuntimeError(
+                    "Failed to get collection by id from NMDC API"
+                ) from e
+
+            # this endpoint returns the document itself
+            results = response.json()
+            event["records"] = 1
+            self.id_cache.set(key, results)
+            return results
 
-        results = response.json()["resources"]
+    def get_records_by_ids(
+        self,
+        ids,
+        fields: str = "",
+        max_workers: int = 4,
+        max_url_length: int = 8000,
+    ):
+        """
+        Get many records by id with a few chunked {"id": {"$in": [...]}} queries instead of one request per id.
+        Duplicate ids are removed, ids already in the shared id cache are not requested again, and the chunks are requested concurrently.
+        params:
+            ids: iterable
+                The ids of the records to get.
+            fields: str
+                The fields to return. Default is all fields. The id field is always returned.
+            max_workers: int
+                The maximum number of chunks requested at once. Default is 4.
+            max_url_length: int
+                The maximum length of a request url. Ids are chunked to stay under it. Default is 8000.
+        returns:
+            tuple
+                A dictionary of records keyed by id, in the order the ids were given, and a list of the ids that were not found.
+        Example:
+            records, missing = BiosampleSearch().get_records_by_ids(["nmdc:bsm-11-002vgm56", "nmdc:bsm-11-006pnx90"])
+        """
+        ids = list(dict.fromkeys(ids))
+        if fields and "id" not in fields.split(","):
+            fields = f"id,{fields}"
+        found = {}
+        to_fetch = []
+        for doc_id in ids:
+            record = self.id_cache.get(
+                self.id_cache.record_key(
+                    self.collection_name, doc_id, fields, self.base_url
+                )
+            )
+            if record is not None:
+                found[doc_id] = record
+            else:
+                to_fetch.append(doc_id)
+        for records in self._map_in_chunks(
+            "id", to_fetch, fields, max_workers, max_url_length
+        ):
+            self.id_cache.prewarm(records, self.collection_name, fields, self.base_url)
+            for record in records:
+                found[record["id"]] = record
+        missing = [doc_id for doc_id in ids if doc_id not in found]
+        return {doc_id: found[doc_id] for doc_id in ids if doc_id in found}, missing
 
+    def get_records_by_attribute_values(
+        self,
+        attribute_name: str,
+        values,
+        fields: str = "",
+        max_workers: int = 4,
+        max_url_length: int = 8000,
+        max_page_size: int = 0,
+    ) -> list:
+        """
+        Get every record whose attribute matches any of many values, using a few chunked {attribute_name: {"$in": [...]}} queries.
+        The chunks are requested concurrently and every page of each chunk is followed.
+        params:
+            attribute_name: str
+                The attribute to match, e.g. "associated_studies" or "has_input".
+            values: iterable
+                The values to match. Duplicates are removed.
+            fields: str
+                The fields to return. Default is all fields.
+            max_workers: int
+                The maximum number of chunks requested at once. Default is 4.
+            max_url_length: int
+                The maximum length of a request url. Values are chunked to stay under it. Default is 8000.
+            max_page_size: int
+                The page size of each chunk. Default is the chunk size, or 100 for smaller chunks.
+                Use a larger page size when a value matches many records, e.g. the biosamples of a study.
+        Example:
+            biosamples = BiosampleSearch().get_records_by_attribute_values("associated_studies", study_ids)
+        """
+        values = list(dict.fromkeys(values))
+        results = []
+        seen = set()
+        for records in self._map_in_chunks(
+            attribute_name, values, fields, max_workers, max_url_length, max_page_size
+        ):
+            for record in records:
+                # a record matching values in several chunks is returned once
+                record_id = record.get("id")
+                if record_id is not None:
+                    if record_id in seen:
+                        continue
+                    seen.add(record_id)
+                results.append(record)
         return results
 
+    def _chunk_in_filters(
+        self,
+        attribute_name: str,
+        values: list,
+        fields: str = "",
+        max_url_length=8000,
+    ):
+        """
+        Split values into {attribute_name: {"$in": [...]}} filters whose request urls stay under max_url_length.
+        Yields (filter, number of values) pairs.
+        """
+        # the longest url a chunk can produce is a later page url, with room for any page size and page token
+        base_length = len(
+            self._page_url("", 10**9, fields, "x" * self.max_page_token_length)
+        )
+        chunk = []
+        chunk_length = base_length + len(
+            urllib.parse.quote_plus(json.dumps({attribute_name: {"$in": []}}))
+        )
+        separator_length = len(urllib.parse.quote_plus(", "))
+        length = chunk_length
+        for value in values:
+            value_length = len(urllib.parse.quote_plus(json.dumps(value)))
+            if chunk:
+                value_length += separator_length
+            if chunk and length + value_length > max_url_length:
+                yield json.dumps({attribute_name: {"$in": chunk}}), len(chunk)
+                chunk = []
+                length = chunk_length
+                value_length -= separator_length
+            chunk.append(value)
+            length += value_length
+        if chunk:
+            yield json.dumps({attribute_name: {"$in": chunk}}), len(chunk)
+
+    def _map_in_chunks(
+        self,
+        attribute_name: str,
+        values: list,
+        fields: str = "",
+        max_workers: int = 4,
+        max_url_length: int = 8000,
+        max_page_size: int = 0,
+    ):
+        """
+        Run the chunked $in queries for values concurrently, following every page of each chunk.
+        Yields the list of records of each chunk as it completes.
+        The page size defaults to the chunk size, or 100 for smaller chunks.
+        """
+        chunks = list(
+            self._chunk_in_filters(attribute_name, values, fields, max_url_length)
+        )
+        if not chunks:
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    scheduler.in_lane(scheduler.BULK, self._get_all_pages),
+                    filter,
+                    max_page_size or max(size, 100),
+                    fields,
+                )
+                for filter, size in chunks
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
     def get_record_data_object_by_type(
         self,
         data_object_type: str = "",
@@ -190,31 +712,21 @@ class CollectionSearch(NMDCSearch):
             pages: bool
                 True to return all pages. False to return the first page. Default is False.
         """
-        results = []
         dp = DataProcessing()
         # create the filter based on data object type
-        filter = f'{{"data_object_type":{{"$regex": "{data_object_type}"}}}}'
-        filter = urllib.parse.quote_plus(filter)
+        filter = filters.to_json(
+            filters.compile_filter({"data_object_type": data_object_type})
+        )
         # if fields is empty, return all fields
         if not fields:
             fields = "id,name,description,alternative_identifiers,file_size_bytes,md5_checksum,data_object_type,url,type"
-        url = f"{self.base_url}/nmdcschema/data_object_set?filter={filter}&max_page_size={max_page_size}&projection={fields}"
-        # get the reponse
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            logger.error("API request failed", exc_info=True)
-            raise RuntimeError("Failed to get data object from NMDC API") from e
-        else:
-            logging.debug(
-                f"API request response: {response.json()}\n API Status Code: {response.status_code}"
-            )
-        results = response.json()["resources"]
-        # otherwise, get all pages
         if all_pages:
             results = self._get_all_pages(
-                response, "data_object_set", filter, max_page_size, fields
+                filter, max_page_size, fields, "data_object_set"
+            )
+        else:
+            results = self._fetch_page(
+                filter, max_page_size, fields, collection_name="data_object_set"
             )["resources"]
         return dp.convert_to_df(results)
 
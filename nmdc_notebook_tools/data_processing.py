@@ -1,29 +1,50 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
+from nmdc_notebook_tools import filters
+from nmdc_notebook_tools.dataframe_builder import DataFrameBuilder
+from nmdc_notebook_tools.sqlite_join import SQLiteJoin
 import logging
 
 logger = logging.getLogger(__name__)
 
+MERGE_BACKENDS = ("pandas", "sqlite")
+# the join types supported by each merge backend
+MERGE_HOWS = {
+    "pandas": ("inner", "left", "right", "outer"),
+    "sqlite": ("inner", "left"),
+}
+
 
 class DataProcessing:
     def __init__(self):
         pass
 
-    def _string_mongo_list(self, data: list) -> str:
-        """
-        Convert elements in a list to use double quotes instead of single quotes.
-        This is required for mongo queries.
-        """
-        return str(data).replace("'", '"')
-
-    def convert_to_df(self, data: list) -> pd.DataFrame:
+    def convert_to_df(
+        self,
+        data,
+        fields: str = "",
+        flatten: bool = False,
+        optimize_dtypes: bool = False,
+        chunk_size: int = 10000,
+    ) -> pd.DataFrame:
         """
         Convert a list of dictionaries to a pandas dataframe.
         params:
             data: list
-                A list of dictionaries.
+                A list of dictionaries, or any iterable of dictionaries such as CollectionSearch.iter_records.
+            fields: str
+                The projection the records were fetched with, used as the schema of the dataframe. Default is all fields.
+            flatten: bool
+                True to flatten nested dictionaries into dotted columns, e.g. lat_lon.latitude. Default is False.
+            optimize_dtypes: bool
+                True to use compact dtypes, such as categoricals for repetitive strings. Default is False.
+            chunk_size: int
+                The number of records converted at a time when flattening or optimizing. Default is 10000.
         """
-        return pd.DataFrame(data)
+        if not (fields or flatten or optimize_dtypes):
+            return pd.DataFrame(data if isinstance(data, list) else list(data))
+        builder = DataFrameBuilder(fields, flatten, optimize_dtypes, chunk_size)
+        return builder.add_records(data).build()
 
     def rename_columns(self, df: pd.DataFrame, new_col_names: list) -> pd.DataFrame:
         """
@@ -41,7 +62,12 @@ class DataProcessing:
         return df
 
     def merge_dataframes(
-        self, column: str, df1: pd.DataFrame, df2: pd.DataFrame
+        self,
+        column: str,
+        df1: pd.DataFrame,
+        df2: pd.DataFrame,
+        backend: str = "pandas",
+        output_path: str = "",
     ) -> pd.DataFrame:
         """
         Merge two dataframes.
@@ -52,9 +78,18 @@ class DataProcessing:
                 The first dataframe to merge.
             df2: pd.DataFrame
                 The second dataframe to merge.
+            backend: str
+                "pandas" to merge in memory, or "sqlite" to merge larger than memory inputs on disk. See merge_df. Default is "pandas".
+            output_path: str
+                With the sqlite backend, a .csv or .jsonl file to write the result to instead. The path is returned.
         returns:
             pd.DataFrame
         """
+        self._check_merge_arguments("inner", backend)
+        if backend == "sqlite":
+            return self._merge_out_of_core(
+                df1, df2, column, column, "inner", output_path
+            )
         return pd.merge(df1, df2, on=column, how="inner")
 
     def merge_df(
@@ -63,6 +98,10 @@ class DataProcessing:
         df2,
         key1: str,
         key2: str,
+        how: str = "inner",
+        backend: str = "pandas",
+        output_path: str = "",
+        chunk_size: int = 50000,
     ):
         """
         Define a merging function to join results
@@ -70,43 +109,154 @@ class DataProcessing:
         params:
             df1 and df2 are the two dataframes that need to be merged.
             key1 is the column name in df1 that will be used to match with `key2` in `df2`.
+            how is the type of join: "inner", "left", "right" or "outer". Default is "inner". The sqlite backend supports "inner" and "left".
+            backend is "pandas" to merge in memory, or "sqlite" to merge inputs larger than memory through an on-disk SQLite database.
+                With the sqlite backend df1 and df2 can also be iterables of dataframes, pages or records, e.g. CollectionSearch.iter_records.
+                To get a result larger than memory, use output_path or iter_merge_df.
+            output_path is, with the sqlite backend, a .csv or .jsonl file to write the result to instead. The path is returned.
+            chunk_size is, with the sqlite backend, the number of rows inserted or joined at a time.
 
-        This function automatically identifies columns that need to be exploded because they contain list-like elements, as drop_duplicates can't handle list elements.
+        Only the join keys are exploded when they contain lists (e.g. has_input/has_output), so multiple list columns never multiply into each other.
+        Other list columns are kept intact, and duplicated rows are dropped using a hash of each row, which also works for list values.
         """
-
-        def identify_and_explode(df):
-            for col in df.columns:
-                if any(isinstance(item, list) for item in df[col]):
-                    df = df.explode(col)
-            return df
-
-        df1 = identify_and_explode(df1)
-        df2 = identify_and_explode(df2)
+        self._check_merge_arguments(how, backend)
+        if backend == "sqlite":
+            return self._merge_out_of_core(
+                df1, df2, key1, key2, how, output_path, chunk_size
+            )
+        df1 = self._explode_list_column(df1, key1)
+        df2 = self._explode_list_column(df2, key2)
 
         # Merge dataframes
-        merged_df = pd.merge(df1, df2, left_on=key1, right_on=key2)
+        merged_df = pd.merge(df1, df2, left_on=key1, right_on=key2, how=how)
         # Drop any duplicated rows
-        merged_df.drop_duplicates(keep="first", inplace=True)
-        return merged_df
+        return self.drop_duplicate_rows(merged_df)
 
-    def build_filter(self, attributes, exact_match=False):
+    def iter_merge_df(
+        self,
+        df1,
+        df2,
+        key1: str,
+        key2: str,
+        how: str = "inner",
+        chunk_size: int = 50000,
+    ):
         """
-        Create a MongoDB filter using $regex for each attribute in the input dictionary. For nested attributes, use dot notation.
+        Merge two inputs like merge_df with the sqlite backend, and yield the result lazily as dataframe chunks,
+        so neither the inputs nor the result have to fit in memory.
+        params:
+            df1 and df2 are dataframes, or iterables of dataframes, pages or records, e.g. CollectionSearch.iter_records.
+            key1 is the column name in df1 that will be used to match with `key2` in `df2`.
+            how is the type of join: "inner" or "left". Default is "inner".
+            chunk_size is the number of rows inserted or yielded at a time. Default is 50000.
+        Example:
+            for chunk in DataProcessing().iter_merge_df(workflows, data_objects, "has_output", "id"):
+                ...
+        """
+        # checked before the generator starts, not at the first chunk
+        self._check_merge_arguments(how, "sqlite")
+
+        def chunks():
+            with SQLiteJoin(chunk_size=chunk_size) as join:
+                join.load("left", df1, key1)
+                join.load("right", df2, key2)
+                yield from join.join(key1, key2, how)
+
+        return chunks()
+
+    @staticmethod
+    def _check_merge_arguments(how: str, backend: str):
+        if backend not in MERGE_BACKENDS:
+            raise ValueError(
+                f"backend must be one of the following: {', '.join(MERGE_BACKENDS)}"
+            )
+        if how not in MERGE_HOWS[backend]:
+            raise ValueError(
+                f"how must be one of the following: {', '.join(MERGE_HOWS[backend])}"
+            )
+
+    def _merge_out_of_core(
+        self, df1, df2, key1, key2, how="inner", output_path="", chunk_size=50000
+    ):
+        """
+        Merge two inputs through an on-disk SQLite database, in bounded memory until the result is collected.
+        Returns the output path if one is given, otherwise the result as one dataframe.
+        """
+        with SQLiteJoin(chunk_size=chunk_size) as join:
+            join.load("left", df1, key1)
+            join.load("right", df2, key2)
+            chunks = join.join(key1, key2, how)
+            if output_path:
+                return join.write(chunks, output_path)
+            return pd.concat(chunks, ignore_index=True)
+
+    def list_columns(self, df: pd.DataFrame) -> list:
+        """
+        Find the columns of a dataframe that contain list values. Only columns with an object dtype are inspected.
+        params:
+            df: pd.DataFrame
+                The dataframe to inspect.
+        """
+        return [
+            column
+            for column in df.columns
+            if df[column].dtype == object
+            and df[column].map(type, na_action="ignore").eq(list).any()
+        ]
+
+    def _explode_list_column(self, df: pd.DataFrame, column: str) -> pd.DataFrame:
+        """
+        Explode a single column if it contains lists, leaving every other column untouched.
+        """
+        if column in self.list_columns(df[[column]]):
+            return df.explode(column, ignore_index=True)
+        return df
+
+    def drop_duplicate_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Drop duplicated rows, keeping the first. Rows are compared by a hash of their values,
+        so columns holding lists or dictionaries are supported.
+        params:
+            df: pd.DataFrame
+                The dataframe to deduplicate.
+        """
+        if df.empty:
+            return df
+        # lists and dictionaries can't be hashed directly, hash their text form instead
+        nested = [
+            column
+            for column in df.columns
+            if df[column].dtype == object
+            and df[column]
+            .map(lambda v: isinstance(v, (list, dict)), na_action="ignore")
+            .any()
+        ]
+        hashable = df.assign(**{column: df[column].map(repr) for column in nested})
+        signatures = pd.util.hash_pandas_object(hashable, index=False)
+        return df[~signatures.duplicated(keep="first").to_numpy()]
+
+    def build_filter(
+        self, attributes, exact_match=False, match="", case_sensitive=True
+    ):
+        """
+        Create a MongoDB filter matching each attribute in the input dictionary. For nested attributes, use dot notation.
+        Values are escaped, so quotes and regular expression metacharacters in them are matched literally.
 
         Parameters:
-            attributes (dict): Dictionary of attribute names and their corresponding values to match using regex.
+            attributes (dict): Dictionary of attribute names and their corresponding values to match.
                 Example: {"name": "example", "description": "example", "geo_loc_name": "example"}
             exact_match: bool
                 This var is used to determine if the inputted attribute value is an exact match or a partial match. Default is False, meaning the user does not need to input an exact match.
                 Under the hood this is used to determine if the inputted attribute value should be wrapped in a regex expression.
+            match: str
+                How values are matched, overriding exact_match. One of exact, prefix, contains or regex, see filters.MATCH_MODES.
+                Prefer prefix over contains when possible, the server can answer case sensitive prefix matches from an index.
+            case_sensitive: bool
+                False to ignore case. Default is True.
         Returns:
-        dict: A MongoDB filter dictionary.
-        """
-        filter_dict = {}
-        if exact_match:
-            for attribute_name, attribute_value in attributes.items():
-                filter_dict[attribute_name] = attribute_value
-        else:
-            for attribute_name, attribute_value in attributes.items():
-                filter_dict[attribute_name] = {"$regex": attribute_value}
-        return self._string_mongo_list(filter_dict)
+        str: A MongoDB filter as JSON.
+        """
+        match = match or ("exact" if exact_match else "contains")
+        return filters.to_json(
+            filters.compile_filter(attributes, match, case_sensitive)
+        )
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DataFrameBuilder:
+    """
+    Build a pandas dataframe from records incrementally, page by page or from a record iterator.
+    Records are converted in chunks with compact dtypes, and the chunks are concatenated once when the dataframe is built.
+    params:
+        fields: str
+            The projection the records were fetched with. When given, it is used as the schema: only these fields
+            (and their nested sub fields) become columns, in this order, even if a chunk has no value for them. Default is all fields.
+        flatten: bool
+            True to flatten nested dictionaries into dotted columns, e.g. lat_lon becomes lat_lon.latitude and lat_lon.longitude. Default is True.
+        optimize_dtypes: bool
+            True to use compact dtypes: categoricals for repetitive strings, downcast integers, and the nullable boolean type
+            for booleans with missing values. Floats stay floats and are only downcast to float32 when no precision is lost. Default is True.
+        chunk_size: int
+            The number of records converted at a time. Default is 10000.
+        categorical_threshold: float
+            String columns whose ratio of unique values to rows is at most this become categoricals.
+            The ratio is taken over all records when the dataframe is built, not per chunk. Default is 0.5.
+    Example:
+        builder = DataFrameBuilder(fields="id,type,lat_lon")
+        for page in BiosampleSearch().iter_pages(fields="id,type,lat_lon"):
+            builder.add_records(page)
+        df = builder.build()
+    """
+
+    def __init__(
+        self,
+        fields: str = "",
+        flatten: bool = True,
+        optimize_dtypes: bool = True,
+        chunk_size: int = 10000,
+        categorical_threshold: float = 0.5,
+    ):
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()]
+        self.flatten = flatten
+        self.optimize_dtypes = optimize_dtypes
+        self.chunk_size = chunk_size
+        self.categorical_threshold = categorical_threshold
+        self._buffer = []
+        self._chunks = []
+
+    def add_records(self, records):
+        """
+        Add records, e.g. one page of results or an iterator over a whole crawl.
+        params:
+            records: iterable
+                The records to add.
+        """
+        for record in records:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.chunk_size:
+                self._flush()
+        return self
+
+    def add_pages(self, pages):
+        """
+        Add every page of an iterator over pages, such as CollectionSearch.iter_pages.
+        params:
+            pages: iterable
+                The pages to add. Each page is a list of records.
+        """
+        for page in pages:
+            self.add_records(page)
+        return self
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        records, self._buffer = self._buffer, []
+        if self.flatten:
+            chunk = pd.json_normalize(records)
+        else:
+            chunk = pd.DataFrame(records)
+        chunk = self._apply_schema(chunk)
+        if self.optimize_dtypes:
+            # categoricals are decided in build, from the cardinality of all chunks
+            chunk = self._compact(chunk, categoricals=False)
+        self._chunks.append(chunk)
+
+    def _apply_schema(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Order and restrict the columns of a chunk according to the projection.
+        """
+        if not self.fields:
+            return chunk
+        columns = []
+        for field in self.fields:
+            nested = sorted(c for c in chunk.columns if c.startswith(f"{field}."))
+            if field in chunk.columns or not nested:
+                columns.append(field)
+            columns.extend(nested)
+        return chunk.reindex(columns=columns)
+
+    def _compact(self, chunk: pd.DataFrame, categoricals: bool = True) -> pd.DataFrame:
+        for column in chunk.columns:
+            chunk[column] = self._compact_column(chunk[column], categoricals)
+        return chunk
+
+    def _compact_column(
+        self, values: pd.Series, categoricals: bool = True
+    ) -> pd.Series:
+        non_null = values.dropna()
+        if non_null.empty:
+            return values
+        if pd.api.types.is_bool_dtype(values):
+            return values
+        if pd.api.types.is_integer_dtype(values):
+            return pd.to_numeric(values, downcast="integer")
+        if pd.api.types.is_float_dtype(values):
+            # whole numbers stay floats, e.g. a longitude or pH that happens to be integral on this page
+            as_float32 = values.astype("float32")
+            if (as_float32.astype("float64") == values)[values.notna()].all():
+                return as_float32
+            return values
+        kinds = non_null.map(type)
+        if (kinds == bool).all():
+            return values.astype("boolean")
+        if categoricals and (kinds == str).all():
+            if non_null.nunique() <= self.categorical_threshold * len(values):
+                return values.astype("category")
+        return values
+
+    def build(self) -> pd.DataFrame:
+        """
+        Build the dataframe from every record added so far.
+        """
+        self._flush()
+        if not self._chunks:
+            return pd.DataFrame(columns=self.fields or None)
+        df = pd.concat(self._chunks, ignore_index=True, sort=False)
+        if self.optimize_dtypes:
+            # numeric columns of different widths or with missing chunks are widened by concat,
+            # and categoricals are decided from the cardinality of the whole column
+            df = self._compact(df)
+        return df
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# how a value is matched against an attribute:
+#   exact    - the attribute equals the value.
+#   prefix   - the attribute starts with the value. Case sensitive prefixes are served from indexes by the server.
+#   contains - the attribute contains the value anywhere. Requires a scan of the attribute.
+#   regex    - the value is used as a regular expression as is.
+MATCH_MODES = ("exact", "prefix", "contains", "regex")
+COMPARISONS = ("eq", "gt", "lt", "gte", "lte")
+# operators whose list operand is a set, so its order does not matter
+SET_OPERATORS = ("$in", "$nin", "$all")
+# operators whose operand is a list of query documents
+LOGICAL_OPERATORS = ("$and", "$or", "$nor")
+
+
+def compile_condition(value, match: str = "contains", case_sensitive: bool = True):
+    """
+    Compile the condition matching a value, e.g. {"$regex": "^abc"} for a prefix match on "abc".
+    Regular expression metacharacters in the value are escaped unless match is "regex".
+    Values that are not strings are always matched exactly.
+    params:
+        value:
+            The value to match.
+        match: str
+            One of exact, prefix, contains or regex. Default is contains.
+        case_sensitive: bool
+            False to ignore case. A case insensitive match cannot use an index. Default is True.
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(
+            f"match must be one of the following: {', '.join(MATCH_MODES)}"
+        )
+    if not isinstance(value, str):
+        return value
+    if match == "exact":
+        if case_sensitive:
+            return value
+        pattern = f"^{re.escape(value)}$"
+    elif match == "prefix":
+        pattern = f"^{re.escape(value)}"
+    elif match == "contains":
+        pattern = re.escape(value)
+    else:
+        pattern = value
+    condition = {"$regex": pattern}
+    if not case_sensitive:
+        condition["$options"] = "i"
+    return condition
+
+
+def compile_filter(
+    attributes: dict, match: str = "contains", case_sensitive: bool = True
+) -> dict:
+    """
+    Compile a filter matching every attribute of a dictionary. For nested attributes, use dot notation.
+    params:
+        attributes: dict
+            The attribute names and the values to match. Example: {"name": "example", "ecosystem_category": "Terrestrial"}
+        match: str
+            One of exact, prefix, contains or regex. Default is contains.
+        case_sensitive: bool
+            False to ignore case. Default is True.
+    """
+    return {
+        attribute_name: compile_condition(attribute_value, match, case_sensitive)
+        for attribute_name, attribute_value in attributes.items()
+    }
+
+
+def compile_comparison(attribute_name: str, comparison: str, value) -> dict:
+    """
+    Compile a comparison filter, e.g. {"lat_lon.latitude": {"$gt": 45.0}} for ("lat_lon.latitude", "gt", 45.0).
+    params:
+        comparison: str
+            One of eq, gt, lt, gte or lte.
+    """
+    if comparison not in COMPARISONS:
+        raise ValueError(
+            f"Invalid comparison input: {comparison}\n Valid inputs: {list(COMPARISONS)}"
+        )
+    return {attribute_name: {f"${comparison}": value}}
+
+
+def to_json(filter: dict) -> str:
+    """
+    Serialize a filter for the filter parameter of the NMDC API.
+    """
+    return json.dumps(filter)
+
+
+def _is_operator_document(value) -> bool:
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and all(k.startswith("$") for k in value)
+    )
+
+
+def _sorted(document: dict) -> dict:
+    return {key: document[key] for key in sorted(document)}
+
+
+def _canonical_query(query: dict) -> dict:
+    """
+    The canonical form of a query document, a map of field names and logical operators to conditions.
+    """
+    result = {}
+    for key, operand in query.items():
+        if key in LOGICAL_OPERATORS and isinstance(operand, list):
+            operand = [
+                _canonical_query(c) if isinstance(c, dict) else c for c in operand
+            ]
+            # a single clause is the clause itself
+            if (
+                key == "$and"
+                and len(operand) == 1
+                and isinstance(operand[0], dict)
+                and not set(operand[0]) & set(query)
+            ):
+                result.update(operand[0])
+                continue
+        elif not key.startswith("$"):
+            operand = _canonical_condition(operand)
+        result[key] = operand
+    return _sorted(result)
+
+
+def _canonical_condition(value):
+    """
+    The canonical form of the condition on a field. Only operator documents are rewritten,
+    embedded documents are literal values that MongoDB compares in key order, so they are kept as they are.
+    """
+    if not _is_operator_document(value):
+        return value
+    result = {}
+    for key, operand in value.items():
+        if key in SET_OPERATORS and isinstance(operand, list):
+            unique = {json.dumps(v): v for v in operand}
+            operand = [unique[k] for k in sorted(unique)]
+        elif key == "$not":
+            operand = _canonical_condition(operand)
+        elif key == "$elemMatch" and isinstance(operand, dict):
+            if _is_operator_document(operand):
+                operand = _canonical_condition(operand)
+            else:
+                operand = _canonical_query(operand)
+        result[key] = operand
+    # {"field": {"$eq": value}} is the same as {"field": value}, unless the value is itself a document
+    if list(result) == ["$eq"] and not isinstance(result["$eq"], dict):
+        return result["$eq"]
+    return _sorted(result)
+
+
+def normalize_filter(filter) -> str:
+    """
+    The canonical form of a filter, so that equivalent filters compare equal and share cache keys.
+    The keys of query and operator documents are sorted, {"$eq": value} is collapsed to value, single clause $and is unwrapped,
+    and the operands of $in, $nin and $all are deduplicated and sorted.
+    Embedded documents matched as values keep their key order, because MongoDB compares them field by field in order.
+    params:
+        filter: str or dict
+            The filter. Strings that are not valid JSON are only stripped.
+    """
+    if isinstance(filter, dict):
+        parsed = filter
+    else:
+        if not filter or not filter.strip():
+            return ""
+        try:
+            parsed = json.loads(filter)
+        except ValueError:
+            return filter.strip()
+    if not parsed:
+        return ""
+    if isinstance(parsed, dict):
+        parsed = _canonical_query(parsed)
+    return json.dumps(parsed, separators=(",", ":"))
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
-from nmdc_notebook_tools.functional_search import FunctionalSearch
+from nmdc_notebook_tools.functional_search import (
+    FunctionalSearch,
+    ANNOTATION_PREFIXES,
+)
+from nmdc_notebook_tools.abundance_matrix import AbundanceMatrixBuilder
+from nmdc_notebook_tools import filters
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,3 +17,81 @@ class FunctionalAnnotationAggSearch(FunctionalSearch):
 
     def __init__(self):
         super().__init__()
+
+    def get_abundance_matrix(
+        self,
+        was_generated_by=None,
+        annotations=None,
+        annotation_type: str = "",
+        filter: str = "",
+        max_page_size: int = 2000,
+        max_workers: int = 4,
+    ):
+        """
+        Build a sparse sample by function matrix of annotation counts, streaming the records straight into it.
+        Rows are the workflow executions the annotations were generated by, columns are gene_function_ids.
+        params:
+            was_generated_by: iterable
+                Optional workflow execution ids to restrict the rows to, queried with chunked $in filters.
+            annotations: iterable
+                Optional KEGG, COG, or PFAM ids to restrict the columns to, queried with chunked $in filters.
+                Ignored when was_generated_by is given, the columns are then filtered locally.
+            annotation_type: str
+                KEGG, COG, or PFAM to only count that type of annotation. Default is every type.
+            filter: str
+                Optional filter used when neither was_generated_by nor annotations are given. Default is the whole collection.
+            max_page_size: int
+                The number of records requested per page. Default is 2000.
+            max_workers: int
+                The maximum number of chunks requested at once. Default is 4.
+        returns:
+            AbundanceMatrix
+        Example:
+            matrix = FunctionalAnnotationAggSearch().get_abundance_matrix(workflow_ids, annotation_type="KEGG")
+            matrix.normalize("relative").save("kegg.npz")
+        """
+        if annotation_type and annotation_type not in ANNOTATION_PREFIXES:
+            raise ValueError(
+                "annotation_type must be one of the following: KEGG, COG, PFAM"
+            )
+        prefix = ANNOTATION_PREFIXES.get(annotation_type, "")
+        fields = "was_generated_by,gene_function_id,count"
+        builder = AbundanceMatrixBuilder(annotation_prefix=prefix)
+        search = self.collectioninstance
+        if was_generated_by is not None:
+            pages = search._map_in_chunks(
+                "was_generated_by",
+                list(dict.fromkeys(was_generated_by)),
+                fields,
+                max_workers,
+                max_page_size=max_page_size,
+            )
+        elif annotations is not None:
+            pages = [
+                self.iter_functional_annotations(
+                    annotations, annotation_type, fields, max_workers, max_page_size
+                )
+            ]
+        else:
+            if not filter and prefix:
+                # let the server use the gene_function_id index instead of filtering locally
+                filter = filters.to_json(
+                    {"gene_function_id": filters.compile_condition(prefix, "prefix")}
+                )
+            pages = search.iter_pages(filter, max_page_size, fields)
+        for page in pages:
+            builder.add_records(page)
+        matrix = builder.build()
+        if annotations is not None and was_generated_by is not None:
+            matrix = matrix.select_functions(
+                functions={
+                    self.format_annotation_id(a, annotation_type) for a in annotations
+                }
+            )
+        logger.info(
+            "Built a %s x %s abundance matrix with %s values (%s bytes)",
+            *matrix.shape,
+            matrix.nnz,
+            matrix.nbytes,
+        )
+        return matrix
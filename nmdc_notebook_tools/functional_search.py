@@ -1,6 +1,24 @@
 # -*- coding: utf-8 -*-
 
 from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools import filters
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the gene_function_id prefix of each annotation type
+ANNOTATION_PREFIXES = {
+    "KEGG": "KEGG.ORTHOLOGY:",
+    "COG": "COG:",
+    "PFAM": "PFAM:",
+}
+# bare ids whose type can be recognized, e.g. K00001, COG0001 and PF00001
+ANNOTATION_PATTERNS = {
+    "KEGG": re.compile(r"^K\d{5}$"),
+    "COG": re.compile(r"^COG\d{4}$"),
+    "PFAM": re.compile(r"^PF\d{5}$"),
+}
 
 
 class FunctionalSearch:
@@ -39,14 +57,11 @@ class FunctionalSearch:
         """
         if annotation_type not in ["KEGG", "COG", "PFAM"]:
             raise ValueError("id_type must be one of the following: KEGG, COG, PFAM")
-        if annotation_type == "KEGG":
-            formatted_annotation_type = f"KEGG.ORTHOLOGY:{annotation}"
-        elif annotation_type == "COG":
-            formatted_annotation_type = f"COG:{annotation}"
-        elif annotation_type == "PFAM":
-            formatted_annotation_type = f"PFAM:{annotation}"
+        formatted_annotation_type = (
+            f"{ANNOTATION_PREFIXES[annotation_type]}{annotation}"
+        )
 
-        filter = f'{{"gene_function_id": "{formatted_annotation_type}"}}'
+        filter = filters.to_json({"gene_function_id": formatted_annotation_type})
 
         result = self.collectioninstance.get_record_by_filter(
             filter, page_size, fields, all_pages
@@ -70,4 +85,129 @@ class FunctionalSearch:
             fields: str
                 The fields to return. Default is all fields.
         """
-        self.collectioninstance.get_records(filter, max_page_size, fields, all_pages)
+        return self.collectioninstance.get_records(
+            filter, max_page_size, fields, all_pages
+        )
+
+    @staticmethod
+    def format_annotation_id(annotation: str, annotation_type: str = "") -> str:
+        """
+        Format a KEGG, COG, or PFAM id as a gene_function_id.
+        params:
+            annotation: str
+                The id, bare or already prefixed. Example: "K00001", "COG0001", "PF00001" or "KEGG.ORTHOLOGY:K00001".
+            annotation_type: str
+                KEGG, COG, or PFAM. Default is to detect the type from the id.
+        """
+        annotation = annotation.strip()
+        for prefix in ANNOTATION_PREFIXES.values():
+            if annotation.startswith(prefix):
+                return annotation
+        if not annotation_type:
+            for candidate, pattern in ANNOTATION_PATTERNS.items():
+                if pattern.match(annotation):
+                    annotation_type = candidate
+                    break
+            else:
+                raise ValueError(
+                    f"Could not detect the annotation type of {annotation}, pass annotation_type: KEGG, COG, PFAM"
+                )
+        if annotation_type not in ANNOTATION_PREFIXES:
+            raise ValueError(
+                "annotation_type must be one of the following: KEGG, COG, PFAM"
+            )
+        return f"{ANNOTATION_PREFIXES[annotation_type]}{annotation}"
+
+    def iter_functional_annotations(
+        self,
+        annotations,
+        annotation_type: str = "",
+        fields: str = "",
+        max_workers: int = 4,
+        max_page_size: int = 0,
+        max_url_length: int = 8000,
+    ):
+        """
+        Stream the functional annotation records of many KEGG, COG, or PFAM ids at once.
+        The ids are grouped into a few chunked {"gene_function_id": {"$in": [...]}} queries that run concurrently with every page followed,
+        and the records of each chunk are yielded as soon as it completes, so the order of records is not the order of the ids.
+        params:
+            annotations: iterable
+                The ids, bare or prefixed. Types may be mixed when annotation_type is not given.
+            annotation_type: str
+                KEGG, COG, or PFAM to treat every bare id as that type. Default is to detect the type of each id.
+            fields: str
+                The fields to return. Default is all fields.
+            max_workers: int
+                The maximum number of chunks requested at once. Default is 4.
+            max_page_size: int
+                The number of records requested per page. Default is the number of ids in the chunk, at least 100.
+            max_url_length: int
+                The maximum length of a request url. Ids are chunked to stay under it. Default is 8000.
+        Example:
+            for record in FunctionalSearch().iter_functional_annotations(["K00001", "COG0001", "PF00001"]):
+                ...
+        """
+        gene_function_ids = list(
+            dict.fromkeys(
+                self.format_annotation_id(annotation, annotation_type)
+                for annotation in annotations
+            )
+        )
+        for records in self.collectioninstance._map_in_chunks(
+            "gene_function_id",
+            gene_function_ids,
+            fields,
+            max_workers,
+            max_url_length,
+            max_page_size,
+        ):
+            yield from records
+
+    def get_functional_annotations_bulk(
+        self,
+        annotations,
+        annotation_type: str = "",
+        fields: str = "",
+        max_workers: int = 4,
+        max_page_size: int = 0,
+        max_url_length: int = 8000,
+    ) -> list:
+        """
+        Get the functional annotation records of many KEGG, COG, or PFAM ids at once. See iter_functional_annotations.
+        Example:
+            records = FunctionalSearch().get_functional_annotations_bulk(pathway_kos, "KEGG", fields="was_generated_by,gene_function_id,count")
+        """
+        return list(
+            self.iter_functional_annotations(
+                annotations,
+                annotation_type,
+                fields,
+                max_workers,
+                max_page_size,
+                max_url_length,
+            )
+        )
+
+    def iter_records(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        progress=None,
+    ):
+        """
+        Iterate over every functional annotation record matching a filter, fetching pages lazily.
+        params:
+            filter: str
+                The filter to apply to the query. Default is an empty string.
+            max_page_size: int
+                The maximum number of items to return per page. Default is 100.
+            fields: str
+                The fields to return. Default is all fields.
+            progress: callable
+                Optional function called after each page as progress(pages_fetched, records_fetched).
+        """
+        return self.collectioninstance.iter_records(
+            filter, max_page_size, fields, progress
+        )
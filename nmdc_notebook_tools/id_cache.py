@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IdCache:
+    """
+    Bounded, thread-safe in-memory LRU cache for id keyed lookups, such as records by id and the collection name of an id.
+    Cached records are shared between callers and should be treated as read-only.
+    Keys include the base url of the NMDC API, so documents of different deployments with the same id are kept apart.
+    params:
+        capacity: int
+            The maximum number of entries kept. Least recently used entries are dropped first. Default is 10000.
+        ttl: float
+            Optional number of seconds an entry stays valid. Default is None, meaning entries do not expire.
+    """
+
+    def __init__(self, capacity: int = 10000, ttl: float = None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def record_key(
+        collection_name: str, doc_id: str, fields: str = "", base_url: str = ""
+    ) -> tuple:
+        """
+        The cache key of a record fetched by id with a given projection from the NMDC API at base_url.
+        """
+        fields = ",".join(sorted({f.strip() for f in fields.split(",") if f.strip()}))
+        return ("record", base_url.rstrip("/"), collection_name, doc_id, fields)
+
+    @staticmethod
+    def collection_name_key(doc_id: str, base_url: str = "") -> tuple:
+        """
+        The cache key of the collection name an id belongs to in the NMDC API at base_url.
+        """
+        return ("collection_name", base_url.rstrip("/"), doc_id)
+
+    def get(self, key: tuple):
+        """
+        Get a cached value, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: tuple, value):
+        """
+        Store a value in the cache.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def prewarm(
+        self,
+        records: list,
+        collection_name: str,
+        fields: str = "",
+        base_url: str = "",
+    ):
+        """
+        Add records that were already fetched, for example by a bulk query, so that later id lookups are answered from memory.
+        params:
+            records: list
+                The records to add. Each record must have an id.
+            collection_name: str
+                The collection the records belong to.
+            fields: str
+                The projection the records were fetched with. Default is all fields.
+            base_url: str
+                The root of the NMDC API the records were fetched from.
+        """
+        for record in records:
+            doc_id = record.get("id")
+            if doc_id is None:
+                continue
+            self.set(self.record_key(collection_name, doc_id, fields, base_url), record)
+            self.set(self.collection_name_key(doc_id, base_url), collection_name)
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss statistics and the current number of entries.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+        }
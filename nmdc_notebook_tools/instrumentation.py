@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+from nmdc_notebook_tools import scheduler
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the fields of every event, in the column order of Profiler.to_df
+EVENT_FIELDS = (
+    "timestamp",
+    "operation",
+    "collection_name",
+    "source",
+    "seconds",
+    "bytes",
+    "records",
+    "pages",
+    "retries",
+    "status",
+    "error",
+    "lane",
+    "filter",
+    "fields",
+)
+
+# replaced, never mutated, so emit can read it without a lock
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+    """
+    Call a function with every event from now on. Events are dictionaries with the keys in EVENT_FIELDS,
+    emitted after each page, id lookup and collection name lookup, from the thread that made the request.
+    The source of an event is where the result came from: api, cache (the response cache), id_cache, mirror or cassette.
+    params:
+        hook: callable
+            Called as hook(event). Exceptions raised by a hook are logged and ignored.
+    Example:
+        instrumentation.add_hook(lambda event: print(event["operation"], event["seconds"]))
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook):
+    """
+    Stop calling a function added with add_hook.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h != hook)
+
+
+def log_event(event: dict):
+    """
+    A hook that logs every event at debug level.
+    Example:
+        instrumentation.add_hook(instrumentation.log_event)
+    """
+    logger.debug(
+        "%s %s from %s: %s records, %s bytes, %s retries in %.3fs%s",
+        event["operation"],
+        event["collection_name"],
+        event["source"],
+        event["records"],
+        event["bytes"],
+        event["retries"],
+        event["seconds"],
+        f" ({event['error']})" if event["error"] else "",
+    )
+
+
+def emit(operation: str, **fields):
+    """
+    Send an event to every hook. Does nothing when no hook is registered.
+    """
+    hooks = _hooks
+    if not hooks:
+        return
+    event = {
+        "timestamp": time.time(),
+        "operation": operation,
+        "collection_name": "",
+        "source": "api",
+        "seconds": 0.0,
+        "bytes": 0,
+        "records": 0,
+        "pages": 0,
+        "retries": 0,
+        "status": None,
+        "error": "",
+        "lane": scheduler.current_lane(),
+        "filter": "",
+        "fields": "",
+    }
+    event.update((k, v) for k, v in fields.items() if k in event)
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception:
+            logger.warning("Instrumentation hook %r failed", hook, exc_info=True)
+
+
+@contextmanager
+def measure(operation: str, **fields):
+    """
+    Time a block and emit one event for it. The block can fill in the event through the yielded dictionary.
+    Exceptions are recorded in the error field and raised again. Without hooks nothing is measured.
+    Example:
+        with instrumentation.measure("page", collection_name="biosample_set") as event:
+            event["records"] = len(records)
+    """
+    if not _hooks:
+        yield {}
+        return
+    event = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield event
+    except Exception as e:
+        event["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        event["seconds"] = time.perf_counter() - start
+        emit(operation, **event)
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Profiler:
+    """
+    Collect the events of every request made while it is active, e.g. in one notebook cell, to find the queries that dominate wall-clock time.
+    Requests from every thread are collected, including the worker threads of concurrent searches.
+    Example:
+        with Profiler() as profiler:
+            BiosampleSearch().get_records(all_pages=True)
+        profiler.summary()
+        profiler.to_prometheus("/var/lib/node_exporter/nmdc.prom")
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        with self._lock:
+            self.events.append(event)
+
+    def start(self):
+        """
+        Start collecting events.
+        """
+        add_hook(self)
+        return self
+
+    def stop(self):
+        """
+        Stop collecting events.
+        """
+        remove_hook(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        The collected events as a DataFrame with one row per event.
+        """
+        with self._lock:
+            events = list(self.events)
+        return pd.DataFrame(events, columns=list(EVENT_FIELDS))
+
+    def summary(self, by=("operation", "collection_name")) -> pd.DataFrame:
+        """
+        Aggregate the events per group, sorted by total time, slowest first.
+        params:
+            by: tuple
+                The event fields to group by. Default is operation and collection name.
+                Example: ("collection_name", "filter") to rank individual queries.
+        returns:
+            pd.DataFrame
+                With the columns requests, cache_hits, seconds, p50_seconds, p95_seconds, max_seconds, bytes, records, pages, retries and errors.
+        """
+        df = self.to_df()
+        df["cache_hit"] = df["source"] != "api"
+        df["failed"] = df["error"] != ""
+        summary = df.groupby(list(by)).agg(
+            requests=("operation", "size"),
+            cache_hits=("cache_hit", "sum"),
+            seconds=("seconds", "sum"),
+            p50_seconds=("seconds", lambda s: s.quantile(0.5)),
+            p95_seconds=("seconds", lambda s: s.quantile(0.95)),
+            max_seconds=("seconds", "max"),
+            bytes=("bytes", "sum"),
+            records=("records", "sum"),
+            pages=("pages", "sum"),
+            retries=("retries", "sum"),
+            errors=("failed", "sum"),
+        )
+        return summary.sort_values("seconds", ascending=False)
+
+    def to_prometheus(self, path: str = "") -> str:
+        """
+        Export the collected events in the Prometheus text format, per operation, collection and source.
+        params:
+            path: str
+                Optional file to write, e.g. for the node exporter textfile collector. The file is replaced atomically.
+        returns:
+            str
+                The metrics text.
+        """
+        summary = self.summary(by=("operation", "collection_name", "source"))
+        metrics = [
+            ("nmdc_requests_total", "counter", "requests", "Requests made."),
+            (
+                "nmdc_request_seconds_total",
+                "counter",
+                "seconds",
+                "Seconds spent in requests.",
+            ),
+            ("nmdc_response_bytes_total", "counter", "bytes", "Response bytes read."),
+            ("nmdc_records_total", "counter", "records", "Records returned."),
+            ("nmdc_pages_total", "counter", "pages", "Pages returned."),
+            ("nmdc_retries_total", "counter", "retries", "Retried requests."),
+            ("nmdc_errors_total", "counter", "errors", "Failed requests."),
+            (
+                "nmdc_request_seconds_p95",
+                "gauge",
+                "p95_seconds",
+                "95th percentile request latency in seconds.",
+            ),
+        ]
+        lines = []
+        for name, kind, column, description in metrics:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (operation, collection_name, source), row in summary.iterrows():
+                labels = f'operation="{_label(operation)}",collection="{_label(collection_name)}",source="{_label(source)}"'
+                lines.append(f"{name}{{{labels}}} {float(row[column])!r}")
+        text = "\n".join(lines) + "\n"
+        if path:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        return text
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools import spatial
+from nmdc_notebook_tools import filters
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,7 +48,9 @@ class LatLongFilters(CollectionSearch):
             raise ValueError(
                 f"Invalid comparison input: {comparison}\n Valid inputs: {allowed_comparisons}"
             )
-        filter = f'{{"lat_lon.latitude": {{"${comparison}": {latitude}}}}}'
+        filter = filters.to_json(
+            filters.compile_comparison("lat_lon.latitude", comparison, latitude)
+        )
 
         result = self.get_records(filter, page_size, fields, all_pages)
         return result
@@ -86,7 +91,9 @@ class LatLongFilters(CollectionSearch):
             raise ValueError(
                 f"Invalid comparison input: {comparison}\n Valid inputs: {allowed_comparisons}"
             )
-        filter = f'{{"lat_lon.longitude": {{"${comparison}": {longitude}}}}}'
+        filter = filters.to_json(
+            filters.compile_comparison("lat_lon.longitude", comparison, longitude)
+        )
         result = self.get_records(filter, page_size, fields, all_pages)
         return result
 
@@ -144,6 +151,203 @@ class LatLongFilters(CollectionSearch):
             raise ValueError(
                 f"Invalid comparison input: {long_comparison}\n Valid inputs: {allowed_comparisons}"
             )
-        filter = f'{{"lat_lon.latitude": {{"${lat_comparison}": {latitude}}}, "lat_lon.longitude": {{"${long_comparison}": {longitude}}}}}'
+        filter = filters.to_json(
+            dict(
+                filters.compile_comparison(
+                    "lat_lon.latitude", lat_comparison, latitude
+                ),
+                **filters.compile_comparison(
+                    "lat_lon.longitude", long_comparison, longitude
+                ),
+            )
+        )
         results = self.get_records(filter, page_size, fields, all_pages)
         return results
+
+    def _spatial_fields(self, fields: str) -> str:
+        if not fields:
+            return fields
+        names = fields.split(",")
+        return fields if "lat_lon" in names else ",".join(names + ["lat_lon"])
+
+    def _box_filter(self, min_lat, max_lat, min_lon, max_lon) -> str:
+        latitude = {"lat_lon.latitude": {"$gte": min_lat, "$lte": max_lat}}
+        if min_lon <= max_lon:
+            return filters.to_json(
+                dict(
+                    latitude,
+                    **{"lat_lon.longitude": {"$gte": min_lon, "$lte": max_lon}},
+                )
+            )
+        # the box crosses the antimeridian, it is the union of its two halves
+        return filters.to_json(
+            dict(
+                latitude,
+                **{
+                    "$or": [
+                        {"lat_lon.longitude": {"$gte": min_lon}},
+                        {"lat_lon.longitude": {"$lte": max_lon}},
+                    ]
+                },
+            )
+        )
+
+    def get_records_in_box(
+        self,
+        min_lat: float,
+        max_lat: float,
+        min_lon: float,
+        max_lon: float,
+        fields: str = "",
+        max_page_size: int = 1000,
+    ):
+        """
+        Get every record whose lat_lon lies in a box.
+        params:
+            min_lat: float
+                The southern edge of the box.
+            max_lat: float
+                The northern edge of the box.
+            min_lon: float
+                The western edge of the box.
+            max_lon: float
+                The eastern edge of the box. When min_lon is greater than max_lon the box crosses the antimeridian.
+            fields: str
+                The fields to return. Default is all fields. lat_lon is always returned.
+            max_page_size: int
+                The number of records requested per page. Default is 1000.
+        """
+        return self.get_records(
+            self._box_filter(min_lat, max_lat, min_lon, max_lon),
+            max_page_size,
+            self._spatial_fields(fields),
+            all_pages=True,
+        )
+
+    def get_records_in_polygon(
+        self, polygon: list, fields: str = "", max_page_size: int = 1000
+    ):
+        """
+        Get every record whose lat_lon lies in a polygon. The bounding box of the polygon is queried from the API
+        and the records are then tested against the polygon locally.
+        params:
+            polygon: list
+                The vertices as (latitude, longitude) pairs. The polygon must not cross the antimeridian.
+            fields: str
+                The fields to return. Default is all fields. lat_lon is always returned.
+            max_page_size: int
+                The number of records requested per page. Default is 1000.
+        """
+        vertices = np.asarray(polygon, dtype=float)
+        records = self.get_records_in_box(
+            vertices[:, 0].min(),
+            vertices[:, 0].max(),
+            vertices[:, 1].min(),
+            vertices[:, 1].max(),
+            fields,
+            max_page_size,
+        )
+        latitudes, longitudes = spatial.coordinates(records)
+        inside = spatial.in_polygon(latitudes, longitudes, polygon)
+        return [r for r, i in zip(records, inside) if i]
+
+    def get_records_in_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        fields: str = "",
+        max_page_size: int = 1000,
+    ):
+        """
+        Get every record within a great circle distance of a point, nearest first. Each record gets an added distance_km.
+        The bounding box of the circle is queried from the API and the distances are computed locally.
+        params:
+            latitude: float
+                The latitude of the center.
+            longitude: float
+                The longitude of the center.
+            radius_km: float
+                The radius in kilometers.
+            fields: str
+                The fields to return. Default is all fields. lat_lon is always returned.
+            max_page_size: int
+                The number of records requested per page. Default is 1000.
+        Example:
+            BiosampleSearch().get_records_in_radius(46.37, -119.27, 50, fields="id,name")
+        """
+        records = self.get_records_in_box(
+            *spatial.radius_box(latitude, longitude, radius_km),
+            fields,
+            max_page_size,
+        )
+        latitudes, longitudes = spatial.coordinates(records)
+        distances = spatial.haversine(latitude, longitude, latitudes, longitudes)
+        order = np.argsort(distances, kind="stable")
+        return [
+            dict(records[i], distance_km=float(distances[i]))
+            for i in order
+            if distances[i] <= radius_km
+        ]
+
+    def get_nearest_records(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 10,
+        fields: str = "",
+        initial_radius_km: float = 50.0,
+        max_page_size: int = 1000,
+    ):
+        """
+        Get the k records nearest to a point, nearest first. Each record gets an added distance_km.
+        The search radius starts at initial_radius_km and doubles until k records are found or the whole globe is covered.
+        params:
+            latitude: float
+                The latitude of the point.
+            longitude: float
+                The longitude of the point.
+            k: int
+                The number of records to return. Default is 10.
+            fields: str
+                The fields to return. Default is all fields. lat_lon is always returned.
+            initial_radius_km: float
+                The first search radius. Default is 50.
+            max_page_size: int
+                The number of records requested per page. Default is 1000.
+        """
+        half_circumference = np.pi * spatial.EARTH_RADIUS_KM
+        radius_km = initial_radius_km
+        while True:
+            records = self.get_records_in_radius(
+                latitude, longitude, radius_km, fields, max_page_size
+            )
+            if len(records) >= k or radius_km >= half_circumference:
+                return records[:k]
+            radius_km = min(radius_km * 2, half_circumference)
+
+    def build_spatial_index(
+        self,
+        filter: str = "",
+        fields: str = "",
+        cell_size: float = 1.0,
+        max_page_size: int = 1000,
+    ) -> spatial.SpatialIndex:
+        """
+        Fetch every record with a lat_lon once and index it locally, for repeated geographic queries without the network.
+        params:
+            filter: str
+                Optional filter restricting the indexed records. Default is every record with a lat_lon.
+            fields: str
+                The fields to keep. Default is all fields. lat_lon is always returned.
+            cell_size: float
+                The size of a grid cell in degrees. Default is 1.0.
+            max_page_size: int
+                The number of records requested per page. Default is 1000.
+        """
+        if not filter:
+            filter = filters.to_json({"lat_lon.latitude": {"$gte": -90}})
+        records = self.get_records(
+            filter, max_page_size, self._spatial_fields(fields), all_pages=True
+        )
+        return spatial.SpatialIndex(records, cell_size)
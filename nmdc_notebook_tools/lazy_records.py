@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from collections.abc import Mapping
+import threading
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LazyResultSet:
+    """
+    Records fetched with a minimal projection, whose other fields are fetched on demand.
+    The first access to a field that was not projected fetches that field for every record of the set at once,
+    with chunked {"id": {"$in": [...]}} queries projected to the id and the field. Fetched fields are kept, so each field is requested once.
+    Usually created with CollectionSearch.get_lazy_records.
+    params:
+        search: CollectionSearch
+            The search the records came from.
+        records: list
+            The records. Every record must have an id.
+        fields: str
+            The projection the records were fetched with.
+        max_workers: int
+            The maximum number of chunks requested at once when fetching a field. Default is 4.
+    """
+
+    def __init__(self, search, records: list, fields: str, max_workers: int = 4):
+        self._search = search
+        self._records = {record["id"]: dict(record) for record in records}
+        self._ids = list(self._records)
+        # a dotted projection such as lat_lon.latitude fetched only part of lat_lon, so lat_lon is still fetched on demand
+        self._loaded = {f.strip() for f in fields.split(",") if f and "." not in f}
+        self._loaded.add("id")
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        for doc_id in self._ids:
+            yield LazyRecord(self, doc_id)
+
+    def __getitem__(self, index: int):
+        return LazyRecord(self, self._ids[index])
+
+    @property
+    def loaded_fields(self) -> set:
+        """
+        The top level fields already fetched for every record.
+        """
+        return set(self._loaded)
+
+    def prefetch(self, *fields):
+        """
+        Fetch several fields for every record in as few requests as possible.
+        params:
+            fields: str
+                The fields to fetch. Dotted paths fetch their top level field.
+        """
+        with self._lock:
+            missing = []
+            for field in fields:
+                field = field.split(".")[0]
+                if field not in self._loaded and field not in missing:
+                    missing.append(field)
+            if not missing:
+                return self
+            projection = ",".join(["id"] + missing)
+            for records in self._search._map_in_chunks(
+                "id", self._ids, projection, self.max_workers
+            ):
+                for record in records:
+                    target = self._records.get(record.get("id"))
+                    if target is not None:
+                        target.update(record)
+            self._loaded.update(missing)
+            logger.debug("Fetched %s for %s records", projection, len(self._ids))
+        return self
+
+    def _value(self, doc_id: str, key: str):
+        self.prefetch(key)
+        return self._records[doc_id][key]
+
+    def to_records(self, fields: str = "") -> list:
+        """
+        The records as plain dictionaries.
+        params:
+            fields: str
+                Fields to fetch first. Default is only the fields already fetched.
+        """
+        if fields:
+            self.prefetch(*fields.split(","))
+        return [dict(self._records[doc_id]) for doc_id in self._ids]
+
+    def to_df(self, fields: str = "") -> pd.DataFrame:
+        """
+        The records as a dataframe. See to_records.
+        """
+        return pd.DataFrame(self.to_records(fields))
+
+
+class LazyRecord(Mapping):
+    """
+    One record of a LazyResultSet. Reading a field that was not fetched yet fetches it for the whole result set.
+    Iterating over a record only lists the fields fetched so far.
+    """
+
+    def __init__(self, result_set: LazyResultSet, doc_id: str):
+        self._result_set = result_set
+        self._id = doc_id
+
+    def __getitem__(self, key: str):
+        return self._result_set._value(self._id, key)
+
+    def __iter__(self):
+        return iter(self._result_set._records[self._id])
+
+    def __len__(self):
+        return len(self._result_set._records[self._id])
+
+    def __repr__(self):
+        return f"LazyRecord({self._result_set._records[self._id]!r})"
+
+    def to_dict(self) -> dict:
+        """
+        The fields fetched so far as a plain dictionary.
+        """
+        return dict(self._result_set._records[self._id])
@@ -0,0 +1,583 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+import numpy as np
+import pandas as pd
+from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+from nmdc_notebook_tools.study_search import StudySearch
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.material_processing_search import MaterialProcessingSearch
+from nmdc_notebook_tools.data_generation_search import DataGenerationSearch
+from nmdc_notebook_tools.workflow_execution_search import WorkflowExecutionSearch
+from nmdc_notebook_tools.data_object_search import DataObjectSearch
+import logging
+
+logger = logging.getLogger(__name__)
+
+# the fields linking each collection to the previous hop
+LINK_FIELDS = {
+    "study_set": [],
+    "biosample_set": ["associated_studies"],
+    "material_processing_set": ["has_input", "has_output"],
+    "data_generation_set": ["has_input", "has_output", "associated_studies"],
+    "workflow_execution_set": ["was_informed_by", "has_input", "has_output"],
+    "data_object_set": ["was_generated_by"],
+}
+DEFAULT_FIELDS = {
+    "study_set": "id,name,type",
+    "biosample_set": "id,name,type,associated_studies",
+    "material_processing_set": "id,name,type,has_input,has_output",
+    "data_generation_set": "id,name,type,has_input,has_output,associated_studies",
+    "workflow_execution_set": "id,name,type,was_informed_by,has_input,has_output",
+    "data_object_set": "id,name,type,data_object_type,url,file_size_bytes,md5_checksum,was_generated_by",
+}
+# link fields pointing downstream, from a process to what it produced; every other link points upstream
+DOWNSTREAM_RELATIONS = {"has_output"}
+INDEX_COLLECTIONS = [
+    "biosample_set",
+    "material_processing_set",
+    "data_generation_set",
+    "workflow_execution_set",
+    "data_object_set",
+]
+
+
+class LineageResult:
+    """
+    The result of a lineage traversal.
+    params:
+        edges: pd.DataFrame
+            One row per link between two records, with the columns source, relation and target.
+            source is the record holding the link field named by relation, target is the id it points to.
+            Example: a biosample row has source=<biosample id>, relation="associated_studies", target=<study id>.
+        nodes: dict
+            The records found, as one dataframe per collection name.
+    """
+
+    def __init__(self, edges: pd.DataFrame, nodes: dict):
+        self.edges = edges
+        self.nodes = nodes
+
+    def data_objects(self) -> pd.DataFrame:
+        """
+        The data objects found by the traversal.
+        """
+        return self.nodes.get("data_object_set", pd.DataFrame())
+
+
+class LineageTraversal:
+    """
+    Walk NMDC provenance from studies to biosamples, through material processing to data generations, workflow executions and data objects.
+    Each hop is expanded with batched $in queries over the whole frontier, requested in pages of max_page_size records,
+    so a hop costs a handful of requests instead of one per record.
+    Hops that do not depend on each other, the raw data objects of the data generations and the workflow executions, run concurrently.
+    params:
+        fields: dict
+            Optional projections per collection name, overriding DEFAULT_FIELDS. The link fields are always requested.
+        max_workers: int
+            The maximum number of concurrent requests per hop. Default is 4.
+        max_material_processing_depth: int
+            The maximum number of chained material processing steps followed from a biosample. Default is 10.
+        max_page_size: int
+            The number of records requested per page of a hop. Default is 2000.
+    Example:
+        lineage = LineageTraversal().from_studies(["nmdc:sty-11-aygzgv51"])
+        lineage.data_objects()
+    """
+
+    def __init__(
+        self,
+        fields: dict = None,
+        max_workers: int = 4,
+        max_material_processing_depth: int = 10,
+        max_page_size: int = 2000,
+    ):
+        self.fields = dict(DEFAULT_FIELDS, **(fields or {}))
+        self.max_workers = max_workers
+        self.max_material_processing_depth = max_material_processing_depth
+        self.max_page_size = max_page_size
+        self.searches = {
+            "study_set": StudySearch(),
+            "biosample_set": BiosampleSearch(),
+            "material_processing_set": MaterialProcessingSearch(),
+            "data_generation_set": DataGenerationSearch(),
+            "workflow_execution_set": WorkflowExecutionSearch(),
+            "data_object_set": DataObjectSearch(),
+        }
+
+    def _fields(self, collection_name: str) -> str:
+        fields = [f for f in self.fields[collection_name].split(",") if f]
+        for field in ["id"] + LINK_FIELDS[collection_name]:
+            if field not in fields:
+                fields.append(field)
+        return ",".join(fields)
+
+    def _expand(self, collection_name: str, attribute_name: str, values) -> list:
+        """
+        Get every record of a collection whose attribute points at any of the values.
+        A value can match many records, e.g. the biosamples of a study, so the chunks are requested in large pages.
+        """
+        values = list(values)
+        if not values:
+            return []
+        return self.searches[collection_name].get_records_by_attribute_values(
+            attribute_name,
+            values,
+            self._fields(collection_name),
+            self.max_workers,
+            max_page_size=self.max_page_size,
+        )
+
+    def _by_ids(self, collection_name: str, ids) -> list:
+        ids = list(ids)
+        if not ids:
+            return []
+        return self._expand(collection_name, "id", ids)
+
+    @staticmethod
+    def _links(records: list, relation: str) -> set:
+        targets = set()
+        for record in records:
+            value = record.get(relation)
+            if isinstance(value, list):
+                targets.update(value)
+            elif value is not None:
+                targets.add(value)
+        return targets
+
+    def from_studies(self, study_ids) -> LineageResult:
+        """
+        Find everything derived from one or more studies.
+        params:
+            study_ids: iterable
+                The ids of the studies.
+        """
+        study_ids = list(dict.fromkeys(study_ids))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            studies = executor.submit(self._by_ids, "study_set", study_ids)
+            biosamples = executor.submit(
+                self._expand, "biosample_set", "associated_studies", study_ids
+            )
+            nodes = {"study_set": studies.result()}
+            return self._from_biosample_records(biosamples.result(), nodes)
+
+    def from_biosamples(self, biosample_ids) -> LineageResult:
+        """
+        Find everything derived from one or more biosamples.
+        params:
+            biosample_ids: iterable
+                The ids of the biosamples.
+        """
+        biosamples = self._by_ids("biosample_set", dict.fromkeys(biosample_ids))
+        return self._from_biosample_records(biosamples, {})
+
+    def _from_biosample_records(self, biosamples: list, nodes: dict) -> LineageResult:
+        nodes["biosample_set"] = biosamples
+        # follow material processing chains from biosamples to processed samples
+        samples = {record["id"] for record in biosamples}
+        frontier = set(samples)
+        processing = {}
+        for _ in range(self.max_material_processing_depth):
+            records = [
+                r
+                for r in self._expand("material_processing_set", "has_input", frontier)
+                if r["id"] not in processing
+            ]
+            if not records:
+                break
+            processing.update((r["id"], r) for r in records)
+            frontier = self._links(records, "has_output") - samples
+            samples.update(frontier)
+        nodes["material_processing_set"] = list(processing.values())
+
+        data_generations = self._expand("data_generation_set", "has_input", samples)
+        nodes["data_generation_set"] = data_generations
+        data_generation_ids = {r["id"] for r in data_generations}
+        # raw data objects and workflow executions only depend on the data generations
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            raw_data_objects = executor.submit(
+                self._by_ids,
+                "data_object_set",
+                self._links(data_generations, "has_output"),
+            )
+            workflow_executions = executor.submit(
+                self._expand,
+                "workflow_execution_set",
+                "was_informed_by",
+                data_generation_ids,
+            )
+            raw_data_objects = raw_data_objects.result()
+            workflow_executions = workflow_executions.result()
+        nodes["workflow_execution_set"] = workflow_executions
+        seen = {r["id"] for r in raw_data_objects}
+        processed_data_objects = self._by_ids(
+            "data_object_set",
+            self._links(workflow_executions, "has_output") - seen,
+        )
+        nodes["data_object_set"] = raw_data_objects + processed_data_objects
+        return LineageResult(self._edges(nodes), self._frames(nodes))
+
+    def _edges(self, nodes: dict) -> pd.DataFrame:
+        rows = []
+        for collection_name, records in nodes.items():
+            for relation in LINK_FIELDS[collection_name]:
+                for record in records:
+                    value = record.get(relation)
+                    for target in value if isinstance(value, list) else [value]:
+                        if target is not None:
+                            rows.append((record["id"], relation, target))
+        return pd.DataFrame(rows, columns=["source", "relation", "target"])
+
+    def _frames(self, nodes: dict) -> dict:
+        return {
+            collection_name: pd.DataFrame(records)
+            for collection_name, records in nodes.items()
+        }
+
+
+class LineageIndex:
+    """
+    A local, persisted index of the provenance links between NMDC records, for answering lineage questions without the network.
+    Ids are encoded as integers and the links are kept as compressed sparse row arrays in both directions,
+    so the neighbours of a record are a slice of an array and whole lineages are a few array lookups.
+    Links always point downstream, from a study or input to what was derived from it.
+    Build it once with build, save it, and keep it current with refresh, which only fetches records added since.
+    params:
+        collections: list
+            The collections whose links are indexed. Default is INDEX_COLLECTIONS.
+    Example:
+        index = LineageIndex().build()
+        index.save("lineage.npz")
+        index = LineageIndex.load("lineage.npz")
+        index.downstream("nmdc:bsm-11-002vgm56", collection_name="data_object_set")
+    """
+
+    def __init__(self, collections: list = None):
+        self.collections = list(collections or INDEX_COLLECTIONS)
+        self.relations = sorted(
+            {r for c in self.collections for r in LINK_FIELDS.get(c, [])}
+        )
+        self.collection_names = []
+        self.metadata = {}
+        self._helpers = CollectionHelpers()
+        self._ids = []
+        self._index = {}
+        self._node_collection = np.empty(0, dtype=np.int16)
+        self._indexed = np.empty(0, dtype=bool)
+        # one row per link: upstream node, downstream node, relation and the record that holds the link
+        self._src = np.empty(0, dtype=np.int32)
+        self._dst = np.empty(0, dtype=np.int32)
+        self._rel = np.empty(0, dtype=np.int8)
+        self._owner = np.empty(0, dtype=np.int32)
+        self._compile()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _collection_code(self, collection_name) -> int:
+        if collection_name is None:
+            return -1
+        if collection_name not in self.collection_names:
+            self.collection_names.append(collection_name)
+        return self.collection_names.index(collection_name)
+
+    def _node(self, doc_id: str, collection_name=None) -> int:
+        node = self._index.get(doc_id)
+        if node is None:
+            node = len(self._ids)
+            self._ids.append(doc_id)
+            self._index[doc_id] = node
+            if collection_name is None:
+                collection_name = self._helpers.resolve_collection_name(doc_id)
+            self._node_collection.append(self._collection_code(collection_name))
+            self._indexed.append(False)
+        elif collection_name is not None and self._node_collection[node] == -1:
+            self._node_collection[node] = self._collection_code(collection_name)
+        return node
+
+    def _add_records(self, collection_name: str, records: list):
+        # node attributes are plain lists while records are added, and arrays again once compiled
+        if isinstance(self._node_collection, np.ndarray):
+            self._node_collection = self._node_collection.tolist()
+            self._indexed = self._indexed.tolist()
+        src, dst, rel, owner = [], [], [], []
+        for record in records:
+            node = self._node(record["id"], collection_name)
+            self._indexed[node] = True
+            for relation in LINK_FIELDS.get(collection_name, []):
+                value = record.get(relation)
+                for target in value if isinstance(value, list) else [value]:
+                    if target is None:
+                        continue
+                    other = self._node(target)
+                    if relation in DOWNSTREAM_RELATIONS:
+                        src.append(node)
+                        dst.append(other)
+                    else:
+                        src.append(other)
+                        dst.append(node)
+                    rel.append(self.relations.index(relation))
+                    owner.append(node)
+        self._src = np.concatenate([self._src, np.array(src, dtype=np.int32)])
+        self._dst = np.concatenate([self._dst, np.array(dst, dtype=np.int32)])
+        self._rel = np.concatenate([self._rel, np.array(rel, dtype=np.int8)])
+        self._owner = np.concatenate([self._owner, np.array(owner, dtype=np.int32)])
+
+    @staticmethod
+    def _csr(rows: np.ndarray, columns: np.ndarray, relations: np.ndarray, n: int):
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr, columns[order], relations[order]
+
+    def _compile(self):
+        """
+        Rebuild the lookup arrays in both directions from the link list.
+        """
+        n = len(self._ids)
+        self._node_collection = np.asarray(self._node_collection, dtype=np.int16)
+        self._indexed = np.asarray(self._indexed, dtype=bool)
+        self._down = self._csr(self._src, self._dst, self._rel, n)
+        self._up = self._csr(self._dst, self._src, self._rel, n)
+
+    def _fields(self, collection_name: str) -> str:
+        return ",".join(["id"] + LINK_FIELDS.get(collection_name, []))
+
+    def build(self, max_page_size: int = 2000, progress=None):
+        """
+        Index every record of the collections. Only the ids and link fields are requested.
+        When a mirror is enabled with CollectionSearch.set_mirror, the index is built from the local snapshots.
+        params:
+            max_page_size: int
+                The number of records requested per page. Default is 2000.
+            progress: callable
+                Optional function called after each page as progress(collection_name, records_indexed).
+        """
+        start = time.time()
+        for collection_name in self.collections:
+            search = CollectionSearch(collection_name)
+            count = 0
+            for page in search.iter_pages(
+                "", max_page_size, self._fields(collection_name)
+            ):
+                self._add_records(collection_name, page)
+                count += len(page)
+                if progress is not None:
+                    progress(collection_name, count)
+        self._compile()
+        self.metadata = {"built_at": start, "refreshes": []}
+        logger.info(
+            "Indexed %s records and %s links in %.1fs",
+            len(self._ids),
+            len(self._src),
+            time.time() - start,
+        )
+        return self
+
+    def refresh(self, max_page_size: int = 2000, max_workers: int = 4) -> dict:
+        """
+        Bring the index up to date. Only the ids of each collection are listed; records that are new are fetched
+        with chunked $in queries and the links of records that no longer exist are dropped.
+        Links changed in place on an existing record are not detected, use build for a full rebuild.
+        params:
+            max_page_size: int
+                The number of ids requested per page while listing. Default is 2000.
+            max_workers: int
+                The maximum number of concurrent record requests. Default is 4.
+        returns:
+            dict
+                The number of records added and removed per collection.
+        """
+        start = time.time()
+        stats = {}
+        removed_nodes = []
+        for collection_name in self.collections:
+            search = CollectionSearch(collection_name)
+            code = self._collection_code(collection_name)
+            indexed = np.asarray(self._indexed, dtype=bool)
+            node_collection = np.asarray(self._node_collection, dtype=np.int16)
+            local = {
+                self._ids[node]
+                for node in np.flatnonzero(indexed & (node_collection == code))
+            }
+            remote = [
+                record["id"] for record in search.iter_records("", max_page_size, "id")
+            ]
+            added = [doc_id for doc_id in remote if doc_id not in local]
+            removed = local.difference(remote)
+            if added:
+                self._add_records(
+                    collection_name,
+                    search.get_records_by_attribute_values(
+                        "id", added, self._fields(collection_name), max_workers
+                    ),
+                )
+            removed_nodes.extend(self._index[doc_id] for doc_id in removed)
+            stats[collection_name] = {"added": len(added), "removed": len(removed)}
+        self._compile()
+        if removed_nodes:
+            self._remove(np.array(removed_nodes, dtype=np.int32))
+            self._compile()
+        stats = {"refreshed_at": start, "seconds": time.time() - start, **stats}
+        self.metadata.setdefault("refreshes", []).append(stats)
+        self.metadata["refreshes"] = self.metadata["refreshes"][-20:]
+        return stats
+
+    def _remove(self, nodes: np.ndarray):
+        """
+        Drop the links held by removed records, then every node no longer linked or indexed.
+        """
+        keep_links = ~np.isin(self._owner, nodes)
+        self._src, self._dst, self._rel, self._owner = (
+            a[keep_links] for a in (self._src, self._dst, self._rel, self._owner)
+        )
+        self._indexed[nodes] = False
+        keep = self._indexed.copy()
+        keep[self._src] = True
+        keep[self._dst] = True
+        remap = np.cumsum(keep) - 1
+        self._src, self._dst, self._owner = (
+            remap[a].astype(np.int32) for a in (self._src, self._dst, self._owner)
+        )
+        self._ids = [doc_id for doc_id, k in zip(self._ids, keep) if k]
+        self._index = {doc_id: node for node, doc_id in enumerate(self._ids)}
+        self._node_collection = self._node_collection[keep]
+        self._indexed = self._indexed[keep]
+
+    def save(self, path: str):
+        """
+        Save the index to a compressed .npz file.
+        """
+        np.savez_compressed(
+            path,
+            ids=np.array(self._ids, dtype=str),
+            node_collection=self._node_collection,
+            indexed=self._indexed,
+            src=self._src,
+            dst=self._dst,
+            rel=self._rel,
+            owner=self._owner,
+            collections=np.array(self.collections, dtype=str),
+            collection_names=np.array(self.collection_names, dtype=str),
+            relations=np.array(self.relations, dtype=str),
+            metadata=np.array(json.dumps(self.metadata)),
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Load an index saved with save.
+        """
+        with np.load(path) as data:
+            index = cls(list(data["collections"]))
+            index.collection_names = [str(c) for c in data["collection_names"]]
+            index.relations = [str(r) for r in data["relations"]]
+            index.metadata = json.loads(str(data["metadata"]))
+            index._ids = [str(i) for i in data["ids"]]
+            index._node_collection = data["node_collection"]
+            index._indexed = data["indexed"]
+            index._src = data["src"]
+            index._dst = data["dst"]
+            index._rel = data["rel"]
+            index._owner = data["owner"]
+        index.collections = [str(c) for c in index.collections]
+        index._index = {doc_id: node for node, doc_id in enumerate(index._ids)}
+        index._compile()
+        return index
+
+    def collection_name(self, doc_id: str):
+        """
+        The collection of an indexed id, or None if it is not known.
+        """
+        node = self._index.get(doc_id)
+        if node is None or self._node_collection[node] < 0:
+            return None
+        return self.collection_names[self._node_collection[node]]
+
+    def neighbors(self, doc_id: str, direction: str = "downstream") -> list:
+        """
+        The records directly linked to a record, as (id, relation) tuples.
+        params:
+            doc_id: str
+                The id of the record.
+            direction: str
+                "downstream" for what was derived from the record, "upstream" for what it was derived from. Default is "downstream".
+        """
+        node = self._index.get(doc_id)
+        if node is None:
+            return []
+        indptr, indices, relations = self._graph(direction)
+        start, end = indptr[node], indptr[node + 1]
+        return [
+            (self._ids[other], self.relations[relation])
+            for other, relation in zip(indices[start:end], relations[start:end])
+        ]
+
+    def _graph(self, direction: str):
+        if direction == "downstream":
+            return self._down
+        if direction == "upstream":
+            return self._up
+        raise ValueError("direction must be one of the following: downstream, upstream")
+
+    def _walk(self, doc_id: str, direction: str, collection_name=None) -> list:
+        node = self._index.get(doc_id)
+        if node is None:
+            return []
+        indptr, indices, _ = self._graph(direction)
+        visited = np.zeros(len(self._ids), dtype=bool)
+        visited[node] = True
+        frontier = [node]
+        found = []
+        while frontier:
+            following = []
+            for current in frontier:
+                for other in indices[indptr[current] : indptr[current + 1]]:
+                    if not visited[other]:
+                        visited[other] = True
+                        following.append(other)
+            found.extend(following)
+            frontier = following
+        if collection_name is not None:
+            if collection_name not in self.collection_names:
+                return []
+            code = self.collection_names.index(collection_name)
+            found = [n for n in found if self._node_collection[n] == code]
+        return [self._ids[n] for n in found]
+
+    def downstream(self, doc_id: str, collection_name: str = None) -> list:
+        """
+        Every record derived from a record, e.g. the data objects of a biosample.
+        params:
+            doc_id: str
+                The id of the record.
+            collection_name: str
+                Optional collection to restrict the result to, e.g. "data_object_set".
+        """
+        return self._walk(doc_id, "downstream", collection_name)
+
+    def upstream(self, doc_id: str, collection_name: str = None) -> list:
+        """
+        Every record a record was derived from, e.g. the biosample that produced a data object.
+        params:
+            doc_id: str
+                The id of the record.
+            collection_name: str
+                Optional collection to restrict the result to, e.g. "biosample_set".
+        """
+        return self._walk(doc_id, "upstream", collection_name)
+
+    def edges(self) -> pd.DataFrame:
+        """
+        Every indexed link, with the columns source, relation and target, pointing downstream.
+        """
+        ids = np.array(self._ids, dtype=object)
+        return pd.DataFrame(
+            {
+                "source": ids[self._src],
+                "relation": np.array(self.relations, dtype=object)[self._rel],
+                "target": ids[self._dst],
+            }
+        )
@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+from nmdc_notebook_tools import scheduler
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required for local collection mirrors. Install it with: python3 -m pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+class LocalCollection:
+    """
+    In-memory query engine over a local snapshot of a collection. Supports MongoDB filters with the
+    $eq, $ne, $gt, $lt, $gte, $lte, $in, $nin, $regex, $exists, $and and $or operators on dotted field paths.
+    Comparisons run vectorized over a flattened dataframe of the documents.
+    params:
+        documents: list
+            The documents of the collection.
+    """
+
+    def __init__(self, documents: list):
+        self.documents = documents
+        self.frame = pd.json_normalize(documents) if documents else pd.DataFrame()
+        self.frame.index = pd.RangeIndex(len(documents))
+        self._columns = {}
+        self._positions = {
+            document["id"]: position
+            for position, document in enumerate(documents)
+            if "id" in document
+        }
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _lookup(self, document, parts):
+        """
+        Get the value at a dotted path, descending into arrays of sub documents like MongoDB does.
+        """
+        value = document
+        for i, part in enumerate(parts):
+            if isinstance(value, list):
+                values = [self._lookup(item, parts[i:]) for item in value]
+                flattened = []
+                for item in values:
+                    if isinstance(item, list):
+                        flattened.extend(item)
+                    elif item is not None:
+                        flattened.append(item)
+                return flattened or None
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        return value
+
+    def _column(self, path: str) -> pd.Series:
+        column = self._columns.get(path)
+        if column is None:
+            if path in self.frame.columns:
+                column = self.frame[path]
+            else:
+                parts = path.split(".")
+                column = pd.Series(
+                    [self._lookup(document, parts) for document in self.documents],
+                    index=self.frame.index,
+                    dtype=object,
+                )
+            self._columns[path] = column
+        return column
+
+    def match(self, filter: dict) -> np.ndarray:
+        """
+        Get a boolean mask of the documents matching a MongoDB filter.
+        """
+        mask = np.ones(len(self.documents), dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self.match(sub_filter)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.documents), dtype=bool)
+                for sub_filter in condition:
+                    any_mask |= self.match(sub_filter)
+                mask &= any_mask
+            elif key.startswith("$"):
+                raise ValueError(f"Unsupported query operator: {key}")
+            else:
+                mask &= self._match_field(key, condition)
+        return mask
+
+    def _match_field(self, path: str, condition) -> np.ndarray:
+        if not isinstance(condition, dict) or not any(
+            k.startswith("$") for k in condition
+        ):
+            condition = {"$eq": condition}
+        column = self._column(path)
+        has_lists = (
+            column.dtype == object and column.map(lambda v: isinstance(v, list)).any()
+        )
+        values = column.explode() if has_lists else column
+        options = condition.get("$options", "")
+        mask = np.ones(len(self.documents), dtype=bool)
+        for op, target in condition.items():
+            if op == "$options":
+                continue
+            if op == "$exists":
+                matched = column.notna().to_numpy()
+                mask &= matched if target else ~matched
+                continue
+            if op in ("$ne", "$nin"):
+                positive = {"$ne": "$eq", "$nin": "$in"}[op]
+                mask &= ~self._any(self._compare(positive, target, values, options))
+                continue
+            mask &= self._any(self._compare(op, target, values, options))
+        return mask
+
+    def _any(self, matched: pd.Series) -> np.ndarray:
+        """
+        Reduce element matches to document matches, a document matches if any element of an array matches.
+        """
+        matched = matched.fillna(False).astype(bool)
+        if not matched.index.is_unique:
+            matched = matched.groupby(level=0).any()
+        return matched.reindex(self.frame.index, fill_value=False).to_numpy()
+
+    def _compare(self, op, target, values: pd.Series, options="") -> pd.Series:
+        if op == "$regex":
+            if values.dtype != object and not pd.api.types.is_string_dtype(values):
+                return pd.Series(False, index=values.index)
+            flags = re.IGNORECASE if "i" in options else 0
+            strings = values.where(values.map(lambda v: isinstance(v, str)))
+            return strings.str.contains(target, flags=flags, regex=True, na=False)
+        if op == "$in":
+            try:
+                return values.isin(target)
+            except TypeError:
+                return values.map(lambda v: any(v == t for t in target))
+        comparisons = {
+            "$eq": lambda a, b: a == b,
+            "$gt": lambda a, b: a > b,
+            "$lt": lambda a, b: a < b,
+            "$gte": lambda a, b: a >= b,
+            "$lte": lambda a, b: a <= b,
+        }
+        if op not in comparisons:
+            raise ValueError(f"Unsupported query operator: {op}")
+        if isinstance(target, (int, float)) and not isinstance(target, bool):
+            values = pd.to_numeric(values, errors="coerce")
+        elif isinstance(target, str):
+            values = values.where(values.map(lambda v: isinstance(v, str)))
+        elif op == "$eq":
+            return values.map(lambda v: v == target)
+        return comparisons[op](values, target)
+
+    @staticmethod
+    def project(document: dict, fields: str) -> dict:
+        """
+        Keep only the requested top level fields of a document.
+        """
+        if not fields:
+            return document
+        keep = [f.strip().split(".")[0] for f in fields.split(",") if f.strip()]
+        return {k: document[k] for k in keep if k in document}
+
+    def page(
+        self,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        page_token: str = "",
+    ) -> dict:
+        """
+        Answer a collection query with a page shaped like the NMDC API response. Page tokens are offsets into the matches.
+        """
+        filter = json.loads(filter) if filter and filter.strip() else {}
+        positions = np.flatnonzero(self.match(filter))
+        start = int(page_token) if page_token else 0
+        end = start + max_page_size
+        page = {
+            "resources": [
+                self.project(self.documents[i], fields) for i in positions[start:end]
+            ]
+        }
+        if end < len(positions):
+            page["next_page_token"] = str(end)
+        return page
+
+    def get(self, doc_id: str, fields: str = ""):
+        """
+        Get a document by id, or None if it is not in the snapshot.
+        """
+        position = self._positions.get(doc_id)
+        if position is None:
+            return None
+        return self.project(self.documents[position], fields)
+
+
+class CollectionMirror:
+    """
+    Local snapshots of NMDC collections stored as Parquet files in a directory.
+    Once mirrored, CollectionSearch and its subclasses can answer queries from the snapshot without network access, see CollectionSearch.set_mirror.
+    Requires pyarrow.
+    params:
+        directory: str
+            The directory to store the snapshots in.
+    Example:
+        mirror = CollectionMirror("nmdc_mirror")
+        mirror.download("biosample_set")
+        CollectionSearch.set_mirror(mirror, offline=True)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def path(self, collection_name: str) -> str:
+        """
+        The Parquet file of a collection snapshot.
+        """
+        return os.path.join(self.directory, f"{collection_name}.parquet")
+
+    def _metadata_path(self, collection_name: str) -> str:
+        return os.path.join(self.directory, f"{collection_name}.json")
+
+    def has(self, collection_name: str) -> bool:
+        """
+        Check if a collection has been mirrored.
+        """
+        return os.path.exists(self.path(collection_name))
+
+    def collections(self) -> list:
+        """
+        List the mirrored collections.
+        """
+        return sorted(
+            name[: -len(".parquet")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".parquet")
+        )
+
+    def metadata(self, collection_name: str) -> dict:
+        """
+        Get the metadata recorded for a collection snapshot, such as when it was downloaded and how many records it has.
+        """
+        with open(self._metadata_path(collection_name)) as f:
+            return json.load(f)
+
+    def _write(self, collection_name: str, batches, metadata: dict) -> int:
+        """
+        Write batches of documents to a new snapshot, replacing the old one atomically.
+        """
+        pa = _import_pyarrow()
+        path = self.path(collection_name)
+        tmp_path = f"{path}.tmp"
+        schema = pa.schema([("id", pa.string()), ("document", pa.string())])
+        count = 0
+        with pa.parquet.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for documents in batches:
+                if not documents:
+                    continue
+                writer.write_table(
+                    pa.table(
+                        {
+                            "id": [d.get("id") for d in documents],
+                            "document": [
+                                json.dumps(d, separators=(",", ":")) for d in documents
+                            ],
+                        },
+                        schema=schema,
+                    )
+                )
+                count += len(documents)
+        metadata = dict(metadata, collection_name=collection_name, records=count)
+        with open(f"{self._metadata_path(collection_name)}.tmp", "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_path, path)
+        os.replace(
+            f"{self._metadata_path(collection_name)}.tmp",
+            self._metadata_path(collection_name),
+        )
+        with self._lock:
+            self._loaded.pop(collection_name, None)
+        return count
+
+    def _api_search(self, collection_name: str):
+        """
+        A search that always queries the NMDC API, even when a mirror or a response cache is enabled,
+        so downloads and syncs see the current records and are not copied into the cache.
+        """
+        # imported here, collection_search imports this module
+        from nmdc_notebook_tools.collection_search import CollectionSearch
+
+        search = CollectionSearch(collection_name)
+        search.mirror = None
+        search.offline = False
+        search.response_cache = None
+        return search
+
+    def download(
+        self,
+        collection_name: str,
+        filter: str = "",
+        max_page_size: int = 1000,
+        progress=None,
+    ) -> int:
+        """
+        Download a collection into a local snapshot. Pages are streamed to disk, so memory stays proportional to the page size.
+        params:
+            collection_name: str
+                The collection to download.
+            filter: str
+                Optional filter to mirror only part of the collection. Default is the whole collection.
+            max_page_size: int
+                The number of records requested per page. Default is 1000.
+            progress: callable
+                Optional function called after each page as progress(pages_fetched, records_fetched).
+        returns:
+            int
+                The number of records written.
+        """
+        search = self._api_search(collection_name)
+        start = time.time()
+        with scheduler.lane(scheduler.BULK):
+            count = self._write(
+                collection_name,
+                search.iter_pages(filter, max_page_size, "", progress),
+                {"filter": filter, "downloaded_at": start},
+            )
+        logger.info(
+            "Mirrored %s records of %s in %.1fs",
+            count,
+            collection_name,
+            time.time() - start,
+        )
+        return count
+
+    def iter_documents(self, collection_name: str, batch_size: int = 10000):
+        """
+        Iterate over the documents of a snapshot in batches, without loading the whole snapshot.
+        """
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(self.path(collection_name))
+        for batch in parquet_file.iter_batches(
+            batch_size=batch_size, columns=["document"]
+        ):
+            yield [json.loads(d) for d in batch.column("document").to_pylist()]
+
+    def read_documents(self, collection_name: str) -> list:
+        """
+        Read every document of a snapshot.
+        """
+        documents = []
+        for batch in self.iter_documents(collection_name):
+            documents.extend(batch)
+        return documents
+
+    def sync(
+        self,
+        collection_name: str,
+        key: str = "id",
+        change_field: str = "",
+        max_page_size: int = 2000,
+        max_workers: int = 4,
+    ) -> dict:
+        """
+        Bring a snapshot up to date by fetching only records that are new or changed since the last download or sync.
+        Only the key (and change field) of every remote record is listed, then the full documents are fetched with chunked $in queries.
+        Records that no longer exist remotely are dropped. The merged snapshot replaces the old one atomically.
+        params:
+            collection_name: str
+                The mirrored collection to sync.
+            key: str
+                The field identifying records. Default is "id". For collections without ids, a grouping field can be used,
+                e.g. "was_generated_by" for functional_annotation_agg, in which case whole groups are added or removed.
+            change_field: str
+                Optional field that changes whenever a record changes. Records whose value differs from the snapshot are fetched again.
+                Only meaningful when key is unique per record.
+            max_page_size: int
+                The number of keys requested per page while listing. Default is 2000.
+            max_workers: int
+                The maximum number of concurrent record requests. Default is 4.
+        returns:
+            dict
+                The sync statistics, which are also stored in the snapshot metadata.
+        """
+        if not self.has(collection_name):
+            raise ValueError(
+                f"Collection {collection_name} is not mirrored, download it first"
+            )
+        start = time.time()
+        metadata = self.metadata(collection_name)
+        filter = metadata.get("filter", "")
+        search = self._api_search(collection_name)
+
+        def change_value(document):
+            return json.dumps(document.get(change_field), sort_keys=True)
+
+        local = {}
+        for documents in self.iter_documents(collection_name):
+            for document in documents:
+                local[document.get(key)] = (
+                    change_value(document) if change_field else None
+                )
+        fields = f"{key},{change_field}" if change_field else key
+        remote = {}
+        with scheduler.lane(scheduler.BULK):
+            for record in search.iter_records(filter, max_page_size, fields):
+                remote[record.get(key)] = change_value(record) if change_field else None
+        added = [k for k in remote if k not in local]
+        removed = {k for k in local if k not in remote}
+        updated = [k for k in remote if k in local and remote[k] != local[k]]
+        stale = removed.union(updated)
+
+        fetched = []
+        for records in search._map_in_chunks(
+            key, added + updated, "", max_workers=max_workers
+        ):
+            fetched.extend(records)
+
+        def merged():
+            for documents in self.iter_documents(collection_name):
+                yield [d for d in documents if d.get(key) not in stale]
+            yield fetched
+
+        seconds = time.time() - start
+        stats = {
+            "synced_at": start,
+            "seconds": seconds,
+            "key": key,
+            "change_field": change_field,
+            "keys_listed": len(remote),
+            "added": len(added),
+            "updated": len(updated),
+            "removed": len(removed),
+            "records_fetched": len(fetched),
+        }
+        history = metadata.get("syncs", []) + [stats]
+        self._write(
+            collection_name,
+            merged(),
+            dict(metadata, last_sync=stats, syncs=history[-20:]),
+        )
+        logger.info(
+            "Synced %s: %s added, %s updated, %s removed in %.1fs",
+            collection_name,
+            len(added),
+            len(updated),
+            len(removed),
+            seconds,
+        )
+        return stats
+
+    def load(self, collection_name: str) -> LocalCollection:
+        """
+        Load a snapshot into a query engine. Loaded snapshots are kept in memory until the snapshot changes.
+        """
+        with self._lock:
+            collection = self._loaded.get(collection_name)
+        if collection is None:
+            collection = LocalCollection(self.read_documents(collection_name))
+            with self._lock:
+                self._loaded[collection_name] = collection
+        return collection
@@ -1,9 +1,124 @@
 # -*- coding: utf-8 -*-
+import threading
+import requests
+from nmdc_notebook_tools.transport import Transport
+from nmdc_notebook_tools.cassette import CassetteTransport
+from nmdc_notebook_tools.scheduler import RequestScheduler
+from nmdc_notebook_tools.id_cache import IdCache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class NMDCSearch:
+    """
+    Base class for all NMDC API searches. Owns the HTTP transport and the id lookup cache that are shared by every search instance in the process.
+    """
+
+    # the NMDC API root used by new search instances
+    default_base_url = "https://api.microbiomedata.org"
+    id_cache = IdCache()
+    _transport = None
+    _transport_lock = threading.Lock()
+
     def __init__(self):
-        self.base_url = "https://api.microbiomedata.org"
+        self.base_url = NMDCSearch.default_base_url
+
+    @classmethod
+    def get_transport(cls) -> Transport:
+        """
+        Get the shared transport, creating it with the default settings on first use.
+        """
+        if NMDCSearch._transport is None:
+            with NMDCSearch._transport_lock:
+                if NMDCSearch._transport is None:
+                    NMDCSearch._transport = Transport()
+        return NMDCSearch._transport
+
+    @classmethod
+    def set_transport(cls, transport: Transport):
+        """
+        Replace the shared transport used by all search classes.
+        params:
+            transport: Transport
+                The transport to use for all subsequent requests.
+        """
+        with NMDCSearch._transport_lock:
+            old_transport = NMDCSearch._transport
+            NMDCSearch._transport = transport
+        if old_transport is not None and old_transport is not transport:
+            old_transport.close()
+
+    @classmethod
+    def configure_transport(cls, **kwargs) -> Transport:
+        """
+        Configure the shared transport used by all search classes.
+        params:
+            kwargs:
+                Passed to Transport. Options are pool_size, connect_timeout, read_timeout, retries, backoff_factor, status_forcelist and scheduler.
+        Example:
+            NMDCSearch.configure_transport(pool_size=20, read_timeout=120, retries=3)
+        """
+        transport = Transport(**kwargs)
+        cls.set_transport(transport)
+        return transport
+
+    @classmethod
+    def use_cassette(
+        cls, path: str, mode: str = "replay", match: str = "strict", **kwargs
+    ) -> CassetteTransport:
+        """
+        Record the requests of all search classes to a cassette file, or replay them from it without network access.
+        params:
+            path: str
+                The cassette file, e.g. "analysis.jsonl.gz".
+            mode: str
+                "record", "replay" or "append", see CassetteTransport. Default is "replay".
+            match: str
+                "strict" or "permissive", see CassetteTransport. Default is "strict".
+            kwargs:
+                Passed to Transport, used for the requests sent to the NMDC API.
+        Example:
+            NMDCSearch.use_cassette("analysis.jsonl.gz", mode="record")
+        """
+        transport = CassetteTransport(path, mode, match, **kwargs)
+        cls.set_transport(transport)
+        return transport
+
+    @classmethod
+    def configure_scheduler(cls, **kwargs) -> RequestScheduler:
+        """
+        Replace the request scheduler of the shared transport, which limits the request rate and concurrency of all search classes together.
+        params:
+            kwargs:
+                Passed to RequestScheduler. Options are rate, burst, max_in_flight, reserved_interactive, endpoint_budgets and min_rate.
+        Example:
+            NMDCSearch.configure_scheduler(rate=5, max_in_flight=4, endpoint_budgets={"nmdcschema/ids": (2, 1)})
+        """
+        scheduler = RequestScheduler(**kwargs)
+        cls.get_transport().scheduler = scheduler
+        return scheduler
+
+    @classmethod
+    def configure_id_cache(cls, capacity: int = 10000, ttl: float = None) -> IdCache:
+        """
+        Replace the shared in-memory cache used for id lookups.
+        params:
+            capacity: int
+                The maximum number of cached lookups. Default is 10000.
+            ttl: float
+                Optional number of seconds a cached lookup stays valid. Default is None, meaning lookups do not expire.
+        """
+        NMDCSearch.id_cache = IdCache(capacity, ttl)
+        return NMDCSearch.id_cache
+
+    def _get(self, url: str, stats: dict = None) -> requests.models.Response:
+        """
+        Send a GET request to the NMDC API through the shared transport.
+        params:
+            url: str
+                The full url to request.
+            stats: dict
+                Optional dictionary that receives the status code, response size and retries, see Transport.get.
+        """
+        return self.get_transport().get(url, stats)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from nmdc_notebook_tools import filters
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of NMDC API pages, stored in a SQLite file.
+    Pages are keyed on the normalized collection name, filter, projection, page size and page token.
+    All pages of one query expire and are evicted together, so a cached first page never points at a page token that is no longer cached.
+    params:
+        path: str
+            The SQLite file to store the cache in. Default is ~/.cache/nmdc_notebook_tools/responses.sqlite.
+        max_bytes: int
+            The maximum size of the cached (compressed) pages. Least recently used queries are evicted first. Default is 512 MB.
+        default_ttl: float
+            Seconds a cached page stays valid. Default is one day.
+        ttls: dict
+            Per-collection time to live in seconds, overriding default_ttl.
+            Example: {"study_set": 7 * 86400, "data_object_set": 3600}
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        max_bytes: int = 512 * 1024 * 1024,
+        default_ttl: float = 86400,
+        ttls: dict = None,
+    ):
+        if not path:
+            path = os.path.join(
+                os.path.expanduser("~"),
+                ".cache",
+                "nmdc_notebook_tools",
+                "responses.sqlite",
+            )
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_query ON responses (query)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_collection ON responses (collection)"
+        )
+
+    @staticmethod
+    def normalize_filter(filter: str) -> str:
+        """
+        Normalize a filter so that equivalent filters share a cache key. See filters.normalize_filter.
+        """
+        return filters.normalize_filter(filter)
+
+    @staticmethod
+    def normalize_fields(fields: str) -> str:
+        """
+        Normalize a projection so that the order of the fields does not matter.
+        """
+        return ",".join(sorted({f.strip() for f in fields.split(",") if f.strip()}))
+
+    def _keys(
+        self, collection_name, filter, max_page_size, fields, page_token, base_url
+    ):
+        query = json.dumps(
+            [
+                # pages of different API deployments, e.g. dev and prod, are different responses
+                base_url.rstrip("/"),
+                collection_name,
+                self.normalize_filter(filter),
+                self.normalize_fields(fields),
+                int(max_page_size),
+            ]
+        )
+        return query, json.dumps([query, page_token or ""])
+
+    def get(
+        self,
+        collection_name: str,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        page_token: str = "",
+        base_url: str = "",
+    ):
+        """
+        Get a cached page, or None if the page is not cached or has expired.
+        Pages are cached per base_url, the root of the NMDC API they came from.
+        """
+        query, key = self._keys(
+            collection_name, filter, max_page_size, fields, page_token, base_url
+        )
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE query = ?", (query,)
+                    )
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE query = ?", (now, query)
+            )
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(
+        self,
+        collection_name: str,
+        page: dict,
+        filter: str = "",
+        max_page_size: int = 100,
+        fields: str = "",
+        page_token: str = "",
+        base_url: str = "",
+    ):
+        """
+        Store a page in the cache.
+        """
+        query, key = self._keys(
+            collection_name, filter, max_page_size, fields, page_token, base_url
+        )
+        payload = zlib.compress(json.dumps(page, separators=(",", ":")).encode())
+        now = time.time()
+        ttl = self.ttls.get(collection_name, self.default_ttl)
+        with self._lock:
+            # later pages of a query share the expiry of its first page
+            expires = self._conn.execute(
+                "SELECT MIN(expires) FROM responses WHERE query = ?", (query,)
+            ).fetchone()[0]
+            if expires is None or expires <= now:
+                expires = now + ttl
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, query, collection_name, payload, len(payload), expires, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT SUM(size) FROM responses").fetchone()[0] or 0
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT query, SUM(size) FROM responses GROUP BY query ORDER BY MAX(last_access) LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM responses WHERE query = ?", (row[0],))
+            self.evictions += 1
+            total -= row[1]
+
+    def invalidate(self, collection_name: str = ""):
+        """
+        Remove cached pages.
+        params:
+            collection_name: str
+                The collection to remove pages for. Default is an empty string, which removes every page.
+        """
+        with self._lock:
+            if collection_name:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE collection = ?", (collection_name,)
+                )
+            else:
+                self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        """
+        Get hit/miss statistics and the current size of the cache.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        with self._lock:
+            self._conn.close()
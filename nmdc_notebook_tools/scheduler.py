@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+_local = threading.local()
+
+
+def current_lane() -> str:
+    """
+    The priority lane of requests made by the calling thread.
+    """
+    return getattr(_local, "lane", INTERACTIVE)
+
+
+@contextmanager
+def lane(name: str):
+    """
+    Make every request of the calling thread inside the block use a priority lane.
+    Example:
+        with scheduler.lane(scheduler.BULK):
+            BiosampleSearch().get_records(all_pages=True)
+    """
+    if name not in LANES:
+        raise ValueError(f"lane must be one of the following: {', '.join(LANES)}")
+    previous = current_lane()
+    _local.lane = name
+    try:
+        yield
+    finally:
+        _local.lane = previous
+
+
+def in_lane(name: str, func):
+    """
+    Wrap a function so that it runs in a priority lane, e.g. before submitting it to a worker thread.
+    """
+
+    def run(*args, **kwargs):
+        with lane(name):
+            return func(*args, **kwargs)
+
+    return run
+
+
+def endpoint_of(url: str) -> str:
+    """
+    The NMDC API endpoint a url belongs to, used to look up per endpoint budgets.
+    Example: https://api.microbiomedata.org/nmdcschema/biosample_set?filter=... belongs to "nmdcschema/{collection}".
+    """
+    path = re.sub(r"^[a-z]+://[^/]+", "", url).split("?", 1)[0].strip("/")
+    parts = path.split("/")
+    if parts[:2] == ["nmdcschema", "ids"]:
+        return "nmdcschema/ids"
+    if parts[0] == "nmdcschema" and len(parts) == 2:
+        return "nmdcschema/{collection}"
+    if parts[0] == "nmdcschema" and len(parts) == 3:
+        return "nmdcschema/{collection}/{id}"
+    return parts[0]
+
+
+def retry_after_seconds(value, default: float) -> float:
+    """
+    The number of seconds asked for by a Retry-After header, given either as seconds or as an HTTP date.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class _Budget:
+    """
+    A token bucket plus an in-flight counter.
+    """
+
+    def __init__(self, rate: float, burst: float, max_in_flight: int):
+        self.rate = rate
+        self.current_rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_in_flight = max_in_flight
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        if self.current_rate:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.current_rate
+            )
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """
+        Seconds until a token is available, 0 if one is available now.
+        """
+        if not self.current_rate or self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.current_rate
+
+
+class RequestScheduler:
+    """
+    Process-wide scheduler that every request to the NMDC API goes through, so parallel searches share one request budget.
+    A token bucket limits the request rate and a counter limits the number of requests in flight, overall and per endpoint.
+    Requests are served in two priority lanes: interactive requests go first, and bulk requests (pages after the first of a crawl,
+    chunked $in lookups, mirror downloads) can never take the slots reserved for interactive requests.
+    When the API answers 429 Too Many Requests, all requests pause for the Retry-After period and the rate is halved,
+    then it recovers step by step with every successful request.
+    params:
+        rate: float
+            The maximum number of requests started per second. None for no limit. Default is 20.
+        burst: int
+            The number of requests that can start at once after a quiet period. Default is 20.
+        max_in_flight: int
+            The maximum number of requests in flight. Default is 10.
+        reserved_interactive: int
+            The number of in-flight slots only interactive requests can use. Default is 1.
+        endpoint_budgets: dict
+            Optional (rate, max_in_flight) limits per endpoint, see endpoint_of.
+            Example: {"nmdcschema/ids": (5, 2)}
+        min_rate: float
+            The rate is never lowered below this by 429 responses. Default is 1.
+    Example:
+        NMDCSearch.configure_scheduler(rate=10, max_in_flight=4)
+    """
+
+    def __init__(
+        self,
+        rate: float = 20.0,
+        burst: int = 20,
+        max_in_flight: int = 10,
+        reserved_interactive: int = 1,
+        endpoint_budgets: dict = None,
+        min_rate: float = 1.0,
+    ):
+        self.reserved_interactive = min(reserved_interactive, max_in_flight - 1)
+        self.min_rate = min_rate
+        self._budget = _Budget(rate, burst, max_in_flight)
+        self._endpoints = {
+            endpoint: _Budget(endpoint_rate, endpoint_rate or 1, endpoint_in_flight)
+            for endpoint, (endpoint_rate, endpoint_in_flight) in (
+                endpoint_budgets or {}
+            ).items()
+        }
+        self._paused_until = 0.0
+        self._waiting = {name: 0 for name in LANES}
+        self._condition = threading.Condition()
+        self.stats = {
+            "requests": 0,
+            "throttled": 0,
+            "waited_seconds": 0.0,
+            "max_in_flight": 0,
+        }
+
+    def _budgets(self, endpoint: str) -> list:
+        budget = self._endpoints.get(endpoint)
+        return [self._budget] if budget is None else [self._budget, budget]
+
+    def _wait_time(self, endpoint: str, lane_name: str, now: float):
+        """
+        Seconds to wait before a request can start, 0 if it can start now, None to wait for a request to finish.
+        """
+        if now < self._paused_until:
+            return self._paused_until - now
+        if lane_name == BULK and self._waiting[INTERACTIVE]:
+            return None
+        in_flight_limit = self._budget.max_in_flight
+        if lane_name == BULK:
+            in_flight_limit -= self.reserved_interactive
+        if self._budget.in_flight >= in_flight_limit:
+            return None
+        wait = 0.0
+        for budget in self._budgets(endpoint):
+            if budget is not self._budget and budget.in_flight >= budget.max_in_flight:
+                return None
+            budget.refill(now)
+            wait = max(wait, budget.wait_time())
+        return wait
+
+    def acquire(self, endpoint: str, lane_name: str = None):
+        """
+        Block until a request to an endpoint may start.
+        """
+        lane_name = lane_name or current_lane()
+        start = time.monotonic()
+        with self._condition:
+            self._waiting[lane_name] += 1
+            try:
+                while True:
+                    wait = self._wait_time(endpoint, lane_name, time.monotonic())
+                    if wait == 0.0:
+                        break
+                    self._condition.wait(wait)
+            finally:
+                self._waiting[lane_name] -= 1
+            for budget in self._budgets(endpoint):
+                budget.in_flight += 1
+                if budget.current_rate:
+                    budget.tokens -= 1
+            self.stats["requests"] += 1
+            self.stats["waited_seconds"] += time.monotonic() - start
+            self.stats["max_in_flight"] = max(
+                self.stats["max_in_flight"], self._budget.in_flight
+            )
+            # a bulk request may have been waiting behind this one
+            self._condition.notify_all()
+
+    def release(self, endpoint: str, throttled_for: float = None):
+        """
+        Mark a request to an endpoint as finished.
+        params:
+            throttled_for: float
+                The Retry-After seconds if the API answered 429, None if it did not throttle the request.
+        """
+        with self._condition:
+            for budget in self._budgets(endpoint):
+                budget.in_flight -= 1
+                if throttled_for is not None:
+                    budget.current_rate = budget.current_rate and max(
+                        self.min_rate, budget.current_rate / 2
+                    )
+                elif budget.current_rate and budget.current_rate < budget.rate:
+                    budget.current_rate = min(
+                        budget.rate, budget.current_rate + budget.rate / 20
+                    )
+            if throttled_for is not None:
+                self.stats["throttled"] += 1
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + throttled_for
+                )
+                logger.warning(
+                    "NMDC API throttled %s, pausing requests for %.1fs",
+                    endpoint,
+                    throttled_for,
+                )
+            self._condition.notify_all()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(latitude: float, longitude: float, latitudes, longitudes) -> np.ndarray:
+    """
+    Great circle distance in km from one point to many points, vectorized.
+    params:
+        latitude: float
+            The latitude of the reference point.
+        longitude: float
+            The longitude of the reference point.
+        latitudes: array-like
+            The latitudes of the points.
+        longitudes: array-like
+            The longitudes of the points.
+    """
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(longitudes, dtype=float) - longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def radius_box(latitude: float, longitude: float, radius_km: float) -> tuple:
+    """
+    The smallest latitude/longitude box containing every point within a radius of a point.
+    Returns (min_lat, max_lat, min_lon, max_lon). min_lon is greater than max_lon when the box crosses the antimeridian.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = np.degrees(angle)
+    min_lat, max_lat = latitude - dlat, latitude + dlat
+    if min_lat <= -90.0 or max_lat >= 90.0 or angle >= np.pi / 2:
+        # the circle contains a pole, every longitude is in range
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    dlon = np.degrees(np.arcsin(np.sin(angle) / np.cos(np.radians(latitude))))
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if max_lon - min_lon >= 360.0:
+        return min_lat, max_lat, -180.0, 180.0
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def in_box(latitudes, longitudes, min_lat, max_lat, min_lon, max_lon) -> np.ndarray:
+    """
+    Which points lie in a box, vectorized. The box crosses the antimeridian when min_lon is greater than max_lon.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    inside = (latitudes >= min_lat) & (latitudes <= max_lat)
+    if min_lon <= max_lon:
+        return inside & (longitudes >= min_lon) & (longitudes <= max_lon)
+    return inside & ((longitudes >= min_lon) | (longitudes <= max_lon))
+
+
+def in_polygon(latitudes, longitudes, polygon) -> np.ndarray:
+    """
+    Which points lie in a polygon, vectorized with the even-odd rule on plain latitude/longitude coordinates.
+    params:
+        polygon: list
+            The vertices as (latitude, longitude) pairs. The polygon is closed automatically and must not cross the antimeridian.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    vertices = np.asarray(polygon, dtype=float)
+    inside = np.zeros(len(latitudes), dtype=bool)
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        crosses = (lat1 > latitudes) != (lat2 > latitudes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at = lon1 + (latitudes - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (longitudes < at)
+    return inside
+
+
+def coordinates(records: list) -> tuple:
+    """
+    The latitude and longitude of each record's lat_lon as float arrays, NaN where a record has none.
+    """
+    latitudes = np.full(len(records), np.nan)
+    longitudes = np.full(len(records), np.nan)
+    for i, record in enumerate(records):
+        lat_lon = record.get("lat_lon")
+        if isinstance(lat_lon, dict):
+            latitudes[i] = lat_lon.get("latitude", np.nan)
+            longitudes[i] = lat_lon.get("longitude", np.nan)
+    return latitudes, longitudes
+
+
+class SpatialIndex:
+    """
+    An in-memory grid index over the lat_lon coordinates of records, for repeated geographic queries without the network.
+    Points are bucketed into cells of cell_size degrees and sorted by cell, so a query only looks at the cells overlapping
+    its bounding box and refines them with vectorized great circle distances.
+    params:
+        records: list
+            The records to index. Records without lat_lon are skipped.
+        cell_size: float
+            The size of a grid cell in degrees. Default is 1.0.
+    Example:
+        index = BiosampleSearch().build_spatial_index(fields="id,name,lat_lon")
+        index.radius(46.37, -119.27, 50)
+    """
+
+    def __init__(self, records: list, cell_size: float = 1.0):
+        self.cell_size = cell_size
+        latitudes, longitudes = coordinates(records)
+        valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        self._records = [r for r, v in zip(records, valid) if v]
+        self._columns = int(np.ceil(360.0 / cell_size)) + 1
+        keys = self._cell(latitudes[valid], longitudes[valid])
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._order = order
+        self._latitudes = latitudes[valid][order]
+        self._longitudes = longitudes[valid][order]
+
+    def __len__(self):
+        return len(self._records)
+
+    def _cell(self, latitudes, longitudes) -> np.ndarray:
+        rows = np.floor((np.asarray(latitudes) + 90.0) / self.cell_size).astype(
+            np.int64
+        )
+        columns = np.floor((np.asarray(longitudes) + 180.0) / self.cell_size)
+        return rows * self._columns + columns.astype(np.int64)
+
+    def _candidates(self, min_lat, max_lat, min_lon, max_lon) -> np.ndarray:
+        """
+        Positions, in cell order, of the points in the cells overlapping a box.
+        """
+        if min_lon > max_lon:
+            return np.concatenate(
+                [
+                    self._candidates(min_lat, max_lat, min_lon, 180.0),
+                    self._candidates(min_lat, max_lat, -180.0, max_lon),
+                ]
+            )
+        first = self._cell(min_lat, min_lon)
+        last = self._cell(max_lat, max_lon)
+        width = int(last % self._columns - first % self._columns)
+        starts = np.arange(first, last + 1, self._columns)
+        lefts = np.searchsorted(self._keys, starts, side="left")
+        rights = np.searchsorted(self._keys, starts + width, side="right")
+        spans = [np.arange(left, right) for left, right in zip(lefts, rights)]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(spans)
+
+    def _result(self, positions, distances=None) -> list:
+        if distances is None:
+            return [self._records[self._order[p]] for p in positions]
+        return [
+            dict(self._records[self._order[p]], distance_km=float(d))
+            for p, d in zip(positions, distances)
+        ]
+
+    def box(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float):
+        """
+        The records in a box. The box crosses the antimeridian when min_lon is greater than max_lon.
+        """
+        positions = self._candidates(min_lat, max_lat, min_lon, max_lon)
+        inside = in_box(
+            self._latitudes[positions],
+            self._longitudes[positions],
+            min_lat,
+            max_lat,
+            min_lon,
+            max_lon,
+        )
+        return self._result(positions[inside])
+
+    def polygon(self, polygon: list):
+        """
+        The records in a polygon given as (latitude, longitude) vertices.
+        """
+        vertices = np.asarray(polygon, dtype=float)
+        positions = self._candidates(
+            vertices[:, 0].min(),
+            vertices[:, 0].max(),
+            vertices[:, 1].min(),
+            vertices[:, 1].max(),
+        )
+        inside = in_polygon(
+            self._latitudes[positions], self._longitudes[positions], polygon
+        )
+        return self._result(positions[inside])
+
+    def radius(self, latitude: float, longitude: float, radius_km: float):
+        """
+        The records within a distance of a point, nearest first, each with an added distance_km.
+        """
+        positions = self._candidates(*radius_box(latitude, longitude, radius_km))
+        distances = haversine(
+            latitude,
+            longitude,
+            self._latitudes[positions],
+            self._longitudes[positions],
+        )
+        inside = distances <= radius_km
+        order = np.argsort(distances[inside], kind="stable")
+        return self._result(positions[inside][order], distances[inside][order])
+
+    def nearest(self, latitude: float, longitude: float, k: int = 10):
+        """
+        The k records nearest to a point, nearest first, each with an added distance_km.
+        """
+        distances = haversine(latitude, longitude, self._latitudes, self._longitudes)
+        k = min(k, len(distances))
+        if k == 0:
+            return []
+        positions = np.argpartition(distances, k - 1)[:k]
+        positions = positions[np.argsort(distances[positions], kind="stable")]
+        return self._result(positions, distances[positions])
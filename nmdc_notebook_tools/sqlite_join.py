@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sqlite3
+import tempfile
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJoin:
+    """
+    Join two record sets that do not fit in memory by spilling them to an on-disk SQLite database.
+    Inputs are streamed in chunks, each row is stored as a JSON document next to its join key, and the joined rows are read back lazily in chunks.
+    Like DataProcessing.merge_df, list values in a join key are exploded to one row per element and duplicated output rows are dropped.
+    params:
+        path: str
+            The SQLite file to use. Default is a temporary file that is deleted when the join is closed.
+        chunk_size: int
+            The number of rows inserted or returned at a time. Default is 50000.
+        suffixes: tuple
+            The suffixes added to overlapping column names, as in pandas.merge. Default is ("_x", "_y").
+    """
+
+    def __init__(self, path: str = "", chunk_size: int = 50000, suffixes=("_x", "_y")):
+        self._temporary = not path
+        if self._temporary:
+            handle, path = tempfile.mkstemp(suffix=".sqlite", prefix="nmdc_join_")
+            os.close(handle)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.suffixes = suffixes
+        # the column names of each loaded table, in order of first appearance
+        self._columns = {}
+        self._conn = sqlite3.connect(path)
+        # keep sorting and DISTINCT on disk instead of in memory
+        self._conn.execute("PRAGMA temp_store=FILE")
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+
+    def _iter_records(self, source):
+        """
+        Normalize an input into an iterator of record batches. Accepts a dataframe, an iterable of dataframes,
+        an iterable of pages (lists of records) or an iterable of records, such as CollectionSearch.iter_records.
+        """
+        if isinstance(source, pd.DataFrame):
+            source = [source]
+        batch = []
+        for item in source:
+            if isinstance(item, pd.DataFrame):
+                for start in range(0, len(item), self.chunk_size):
+                    yield item.iloc[start : start + self.chunk_size].to_dict("records")
+            elif isinstance(item, list):
+                yield item
+            else:
+                batch.append(item)
+                if len(batch) >= self.chunk_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _json_default(value):
+        # numpy scalars and arrays, timestamps and other values json does not know
+        if hasattr(value, "tolist"):
+            return value.tolist()
+        if value is pd.NA or value is pd.NaT:
+            return None
+        return str(value)
+
+    def load(self, table: str, source, key: str) -> int:
+        """
+        Stream an input into a table of the database, indexed on the join key.
+        params:
+            table: str
+                The name of the table, "left" or "right".
+            source:
+                A dataframe, an iterable of dataframes, or an iterable of pages or records.
+            key: str
+                The column to join on.
+        returns:
+            int
+                The number of rows stored.
+        """
+        self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        self._conn.execute(f'CREATE TABLE "{table}" (key TEXT, doc TEXT)')
+        columns = {}
+        count = 0
+        for records in self._iter_records(source):
+            rows = []
+            for record in records:
+                columns.update(dict.fromkeys(record))
+                doc = json.dumps(record, default=self._json_default)
+                values = record.get(key)
+                if not isinstance(values, list):
+                    values = [values]
+                elif not values:
+                    # like DataFrame.explode, an empty list becomes a missing key
+                    values = [None]
+                for value in values:
+                    if value is None or (isinstance(value, float) and pd.isna(value)):
+                        rows.append((None, doc))
+                    else:
+                        rows.append(
+                            (json.dumps(value, default=self._json_default), doc)
+                        )
+            self._conn.executemany(f'INSERT INTO "{table}" VALUES (?, ?)', rows)
+            count += len(rows)
+        self._conn.execute(f'CREATE INDEX "{table}_key" ON "{table}" (key)')
+        self._conn.commit()
+        self._columns[table] = list(columns)
+        return count
+
+    def _output_columns(self, key1: str, key2: str):
+        """
+        The overlapping column names of the loaded tables and the columns of the joined result, named and ordered as by pandas.merge.
+        """
+        left = self._columns.get("left", [])
+        right = self._columns.get("right", [])
+        overlap = (set(left) & set(right)) - ({key1} if key1 == key2 else set())
+        columns = [c + self.suffixes[0] if c in overlap else c for c in left]
+        for column in right:
+            if column == key2 and key1 == key2:
+                continue
+            columns.append(column + self.suffixes[1] if column in overlap else column)
+        return overlap, columns
+
+    def _combine(
+        self,
+        left: dict,
+        right: dict,
+        key1: str,
+        key2: str,
+        left_key,
+        right_key,
+        overlap: set,
+    ):
+        """
+        Combine a left and a right row the way pandas.merge names the columns.
+        The overlap is computed from the columns of both tables, so unmatched rows of a left join get the same column names as matched ones.
+        """
+        row = {}
+        for column, value in left.items():
+            row[column + self.suffixes[0] if column in overlap else column] = value
+        for column, value in right.items():
+            if column == key2 and key1 == key2:
+                continue
+            row[column + self.suffixes[1] if column in overlap else column] = value
+        # exploded keys hold the matched element, not the whole list
+        if key1 in left:
+            row[key1 + self.suffixes[0] if key1 in overlap else key1] = left_key
+        if right and key2 in right and key1 != key2:
+            row[key2 + self.suffixes[1] if key2 in overlap else key2] = right_key
+        return row
+
+    def join(self, key1: str, key2: str, how: str = "inner"):
+        """
+        Join the loaded left and right tables and yield the result lazily as dataframe chunks.
+        An empty result is a single empty chunk with the result columns.
+        params:
+            key1: str
+                The join column of the left table.
+            key2: str
+                The join column of the right table.
+            how: str
+                "inner" or "left". Default is "inner".
+        """
+        if how not in ("inner", "left"):
+            raise ValueError("how must be one of the following: inner, left")
+        join = "JOIN" if how == "inner" else "LEFT JOIN"
+        overlap, columns = self._output_columns(key1, key2)
+        cursor = self._conn.execute(
+            f'SELECT DISTINCT l.key, l.doc, r.key, r.doc FROM "left" l {join} "right" r ON l.key = r.key'
+        )
+        empty = True
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            empty = False
+            yield pd.DataFrame(
+                [
+                    self._combine(
+                        json.loads(left_doc),
+                        json.loads(right_doc) if right_doc is not None else {},
+                        key1,
+                        key2,
+                        json.loads(left_key) if left_key is not None else None,
+                        json.loads(right_key) if right_key is not None else None,
+                        overlap,
+                    )
+                    for left_key, left_doc, right_key, right_doc in rows
+                ],
+                columns=columns,
+            )
+        if empty:
+            yield pd.DataFrame(columns=columns)
+
+    def write(self, chunks, output_path: str) -> str:
+        """
+        Write joined chunks to disk. The format is chosen by the extension: .csv or .jsonl.
+        params:
+            chunks: iterable
+                The dataframe chunks returned by join.
+            output_path: str
+                The file to write.
+        """
+        if output_path.endswith(".csv"):
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(
+                    output_path, mode="w" if header else "a", header=header, index=False
+                )
+                header = False
+        elif output_path.endswith(".jsonl"):
+            with open(output_path, "w") as f:
+                for chunk in chunks:
+                    chunk.to_json(f, orient="records", lines=True)
+        else:
+            raise ValueError("output_path must end with .csv or .jsonl")
+        return output_path
+
+    def close(self):
+        """
+        Close the database, deleting it if it was temporary.
+        """
+        self._conn.close()
+        if self._temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import os
+import pytest
+from nmdc_notebook_tools.benchmark.server import MockNMDCServer
+from nmdc_notebook_tools.cassette import CassetteTransport
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "no_cassette: the test runs its own stand-in server and never uses the NMDC_CASSETTE cassette",
+    )
+
+
+@pytest.fixture(scope="session")
+def api_cassette():
+    """
+    The cassette the tests against the live NMDC API use, when NMDC_CASSETTE is set.
+    Record it once with network access, then the tests run offline:
+        NMDC_CASSETTE=tests.jsonl.gz NMDC_CASSETTE_MODE=record pytest
+        NMDC_CASSETTE=tests.jsonl.gz pytest
+    NMDC_CASSETTE_MODE is record, replay (the default) or append, NMDC_CASSETTE_MATCH is strict (the default) or permissive.
+    """
+    path = os.environ.get("NMDC_CASSETTE")
+    if not path:
+        yield None
+        return
+    cassette = CassetteTransport(
+        path,
+        mode=os.environ.get("NMDC_CASSETTE_MODE", "replay"),
+        match=os.environ.get("NMDC_CASSETTE_MATCH", "strict"),
+    )
+    yield cassette
+    cassette.close()
+
+
+@pytest.fixture(autouse=True)
+def use_api_cassette(request, api_cassette):
+    """
+    Send the requests of every test that does not use mock_api or the no_cassette marker through the cassette.
+    """
+    if (
+        api_cassette is None
+        or "mock_api" in request.fixturenames
+        or request.node.get_closest_marker("no_cassette") is not None
+    ):
+        yield
+        return
+    transport = NMDCSearch._transport
+    NMDCSearch._transport = api_cassette
+    yield
+    NMDCSearch._transport = transport
+
+
+@pytest.fixture
+def mock_api():
+    biosamples = [
+        {
+            "id": f"nmdc:bsm-11-{i:08d}",
+            "name": f"sample {i}",
+            "type": "nmdc:Biosample",
+            "lat_lon": {"latitude": -80.0 + i * 0.5, "longitude": -170.0 + i},
+            "associated_studies": ["nmdc:sty-11-00000001"],
+        }
+        for i in range(250)
+    ]
+    data_objects = [
+        {
+            "id": f"nmdc:dobj-11-{i:08d}",
+            "name": f"file {i}.fastq.gz",
+            "type": "nmdc:DataObject",
+            "data_object_type": "Metagenome Raw Reads" if i % 2 else "QC Statistics",
+            "file_size_bytes": 1000 + i,
+        }
+        for i in range(120)
+    ]
+    studies = [{"id": "nmdc:sty-11-00000001", "name": "mock study"}]
+    calibrations = [
+        {"id": f"nmdc:calib-11-{i:08d}", "name": f"calibration {i}"} for i in range(5)
+    ]
+    functions = (
+        [f"KEGG.ORTHOLOGY:K{i:05d}" for i in range(1, 31)]
+        + [f"COG:COG{i:04d}" for i in range(1, 11)]
+        + [f"PFAM:PF{i:05d}" for i in range(1, 11)]
+    )
+    annotations = [
+        {
+            "was_generated_by": f"nmdc:wfmgan-11-{d:08d}.1",
+            "gene_function_id": function,
+            "count": d * 10 + f + 1,
+            "type": "nmdc:FunctionalAnnotationAggMember",
+        }
+        for d in range(8)
+        for f, function in enumerate(functions)
+        if (d + f) % 3
+    ]
+    NMDCSearch.id_cache.clear()
+    CollectionHelpers._learned_typecodes.clear()
+    api = MockNMDCServer(
+        {
+            "biosample_set": biosamples,
+            "data_object_set": data_objects,
+            "study_set": studies,
+            "calibration_set": calibrations,
+            "functional_annotation_agg": annotations,
+        }
+    )
+    default_base_url = NMDCSearch.default_base_url
+    NMDCSearch.default_base_url = api.base_url
+    yield api
+    NMDCSearch.default_base_url = default_base_url
+    api.close()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from nmdc_notebook_tools.abundance_matrix import AbundanceMatrix, AbundanceMatrixBuilder
+from nmdc_notebook_tools.functional_annotation_agg_search import (
+    FunctionalAnnotationAggSearch,
+)
+
+
+def test_builder_sums_and_normalizes(tmp_path):
+    records = [
+        {"was_generated_by": "a", "gene_function_id": "KEGG.ORTHOLOGY:K1", "count": 2},
+        {"was_generated_by": "a", "gene_function_id": "COG:C1", "count": 6},
+        {"was_generated_by": "b", "gene_function_id": "KEGG.ORTHOLOGY:K1", "count": 1},
+        {"was_generated_by": "a", "gene_function_id": "KEGG.ORTHOLOGY:K1", "count": 2},
+    ]
+    matrix = AbundanceMatrixBuilder().add_records(records).build()
+    assert matrix.shape == (2, 2)
+    assert matrix.get("a", "KEGG.ORTHOLOGY:K1") == 4
+    assert matrix.get("b", "COG:C1") == 0
+    assert list(matrix.row_sums()) == [10, 1]
+    relative = matrix.normalize("relative")
+    assert relative.get("a", "COG:C1") == pytest.approx(0.6)
+    kegg = matrix.select_functions("KEGG.ORTHOLOGY:")
+    assert kegg.functions == ["KEGG.ORTHOLOGY:K1"]
+    assert list(kegg.row_sums()) == [4, 1]
+    dense = matrix.to_dataframe(sparse=False)
+    assert matrix.to_dataframe().sparse.to_dense().equals(dense)
+
+    path = str(tmp_path / "matrix.npz")
+    matrix.save(path)
+    loaded = AbundanceMatrix.load(path)
+    assert loaded.samples == matrix.samples
+    assert loaded.to_dataframe(sparse=False).equals(dense)
+
+
+def test_abundance_matrix_from_api(mock_api):
+    search = FunctionalAnnotationAggSearch()
+    records = mock_api.collections["functional_annotation_agg"]
+    matrix = search.get_abundance_matrix(max_page_size=100)
+    assert matrix.shape == (8, 50)
+    assert matrix.nnz == len(records)
+    assert matrix.row_sums().sum() == sum(r["count"] for r in records)
+
+    kegg = search.get_abundance_matrix(annotation_type="KEGG")
+    assert kegg.shape == (8, 30)
+    workflows = ["nmdc:wfmgan-11-00000001.1", "nmdc:wfmgan-11-00000002.1"]
+    subset = search.get_abundance_matrix(
+        was_generated_by=workflows, annotations=["K00001", "PF00001"]
+    )
+    assert set(subset.samples) == set(workflows)
+    assert set(subset.functions) <= {"KEGG.ORTHOLOGY:K00001", "PFAM:PF00001"}
+    dense = matrix.to_dataframe(sparse=False)
+    for sample in subset.samples:
+        for function in subset.functions:
+            assert subset.get(sample, function) == dense.loc[sample, function]
+
+
+def test_to_scipy():
+    pytest.importorskip("scipy")
+    matrix = (
+        AbundanceMatrixBuilder()
+        .add_records([{"was_generated_by": "a", "gene_function_id": "f", "count": 3}])
+        .build()
+    )
+    assert np.array_equal(matrix.to_scipy().toarray(), [[3]])
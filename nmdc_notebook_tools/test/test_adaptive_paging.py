@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import pytest
+from nmdc_notebook_tools.adaptive_paging import AdaptivePaging
+from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.data_object_search import DataObjectSearch
+from nmdc_notebook_tools.response_cache import ResponseCache
+
+
+@pytest.fixture
+def adaptive_paging():
+    adaptive_paging = AdaptivePaging(min_page_size=10, max_page_size=1000)
+    CollectionSearch.set_adaptive_paging(adaptive_paging)
+    yield adaptive_paging
+    CollectionSearch.set_adaptive_paging(None)
+
+
+def test_next_page_size():
+    paging = AdaptivePaging(min_page_size=10, max_page_size=1000, max_page_bytes=0)
+    assert paging.next_page_size(100, 100, 0.1, 1000) == 400
+    assert paging.next_page_size(100, 100, 2.0, 1000) == 50
+    assert paging.next_page_size(100, 40, 0.1, 1000) == 100
+    assert paging.next_page_size(800, 800, 0.01, 1000) == 1000
+    paging.max_page_bytes = 5000
+    assert paging.next_page_size(100, 100, 0.1, 10000) == 50
+
+
+def test_id_crawl_grows_pages(mock_api, adaptive_paging):
+    records = DataObjectSearch().get_records(
+        max_page_size=20, fields="id", all_pages=True
+    )
+    assert len(records) == 120
+    crawl = adaptive_paging.stats()[-1]
+    assert crawl["page_sizes"] == [20, 80, 320]
+    assert crawl["records"] == 120
+    assert crawl["bytes"] > 0
+    assert len(mock_api.requests) == 3
+
+
+def test_large_pages_shrink(mock_api, adaptive_paging):
+    adaptive_paging.max_page_bytes = 2000
+    records = list(DataObjectSearch().iter_records(max_page_size=40))
+    assert len(records) == 120
+    page_sizes = adaptive_paging.stats()[-1]["page_sizes"]
+    assert page_sizes[0] == 40
+    assert max(page_sizes[1:]) < 40
+
+
+def test_throttling_does_not_shrink_pages(mock_api, adaptive_paging):
+    NMDCSearch.configure_scheduler(rate=None)
+    mock_api.throttle = 1
+    mock_api.retry_after = "1"
+    try:
+        records = DataObjectSearch().get_records(
+            max_page_size=20, fields="id", all_pages=True
+        )
+    finally:
+        NMDCSearch.configure_scheduler()
+    assert len(records) == 120
+    # the Retry-After pause before the first page is not part of its latency
+    assert adaptive_paging.stats()[-1]["page_sizes"] == [20, 80, 320]
+    assert len(mock_api.requests) == 4
+
+
+def test_adaptive_crawls_bypass_response_cache(mock_api, adaptive_paging, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    CollectionSearch.set_response_cache(cache)
+    try:
+        for _ in range(2):
+            records = DataObjectSearch().get_records(
+                max_page_size=20, fields="id", all_pages=True
+            )
+            assert len(records) == 120
+        crawls = adaptive_paging.stats()
+        assert [c["page_sizes"] for c in crawls] == [[20, 80, 320], [20, 80, 320]]
+        # the second crawl gets every page, including the first, from the API
+        assert len(mock_api.requests) == 6
+        assert mock_api.requests[3:] == mock_api.requests[:3]
+        assert cache.stats()["entries"] == 0
+    finally:
+        CollectionSearch.set_response_cache(None)
+        cache.close()
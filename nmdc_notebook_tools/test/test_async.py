@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from nmdc_notebook_tools.async_search import (
+    AsyncNMDCSearch,
+    AsyncCollectionSearch,
+    AsyncLatLongFilters,
+    AsyncCollectionHelpers,
+)
+
+
+def test_async_get_records(mock_api):
+    async def run():
+        biosample = AsyncCollectionSearch("biosample_set")
+        biosample.base_url = mock_api.base_url
+        return await biosample.get_records(max_page_size=30, all_pages=True)
+
+    assert len(asyncio.run(run())) == 250
+
+
+def test_async_bounded_concurrency(mock_api):
+    mock_api.delay = 0.05
+    AsyncNMDCSearch.set_max_concurrency(4)
+
+    async def run():
+        biosample = AsyncCollectionSearch("biosample_set")
+        biosample.base_url = mock_api.base_url
+        return await asyncio.gather(
+            *[
+                biosample.get_record_by_attribute(
+                    "id", f"nmdc:bsm-11-{i:08d}", exact_match=True
+                )
+                for i in range(16)
+            ]
+        )
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        AsyncNMDCSearch.set_max_concurrency(10)
+    assert [r[0]["id"] for r in results] == [f"nmdc:bsm-11-{i:08d}" for i in range(16)]
+    assert 1 < mock_api.max_in_flight <= 4
+
+
+def test_async_cancellation(mock_api):
+    mock_api.delay = 0.2
+    AsyncNMDCSearch.set_max_concurrency(2)
+
+    async def run():
+        biosample = AsyncCollectionSearch("biosample_set")
+        biosample.base_url = mock_api.base_url
+        tasks = [
+            asyncio.ensure_future(biosample.get_records(max_page_size=1))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return tasks
+
+    try:
+        tasks = asyncio.run(run())
+    finally:
+        AsyncNMDCSearch.set_max_concurrency(10)
+    assert all(task.cancelled() for task in tasks)
+    # queued requests were never sent
+    assert len(mock_api.requests) <= 2
+
+
+def test_async_iter_records_and_lat_long(mock_api):
+    async def run():
+        biosample = AsyncLatLongFilters("biosample_set")
+        biosample.base_url = mock_api.base_url
+        ids = [r["id"] async for r in biosample.iter_records(max_page_size=100)]
+        north = await biosample.get_record_by_latitude("gt", 0.0, all_pages=True)
+        return ids, north
+
+    ids, north = asyncio.run(run())
+    assert len(ids) == 250
+    assert len(north) == 89
+
+
+def test_async_collection_helpers(mock_api):
+    async def run():
+        helpers = AsyncCollectionHelpers()
+        helpers.base_url = mock_api.base_url
+        return await helpers.get_record_name_from_id("nmdc:dobj-11-00000003")
+
+    assert asyncio.run(run()) == "data_object_set"
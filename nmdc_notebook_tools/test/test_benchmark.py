@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import pytest
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.benchmark import (
+    BENCHMARKS,
+    BenchmarkSuite,
+    check_thresholds,
+    compare_results,
+    load_results,
+    save_results,
+    synthetic_collections,
+)
+
+
+def test_synthetic_collections_are_linked():
+    collections = synthetic_collections(
+        biosamples=20, data_objects_per_workflow=2, annotations_per_workflow=5
+    )
+    assert len(collections["biosample_set"]) == 20
+    assert len(collections["data_object_set"]) == 40
+    assert len(collections["functional_annotation_agg"]) == 100
+    workflow = collections["workflow_execution_set"][3]
+    data_generation = collections["data_generation_set"][3]
+    assert workflow["was_informed_by"] == data_generation["id"]
+    assert data_generation["has_input"] == [collections["biosample_set"][3]["id"]]
+    assert synthetic_collections(biosamples=20) == synthetic_collections(biosamples=20)
+
+
+@pytest.mark.no_cassette
+def test_benchmark_suite(tmp_path):
+    default_base_url = NMDCSearch.default_base_url
+    transport = NMDCSearch.get_transport()
+    results = BenchmarkSuite(
+        biosamples=60, delay=0.0, max_page_size=25, id_lookups=10, filters=20, repeat=2
+    ).run()
+    assert NMDCSearch.default_base_url == default_base_url
+    assert NMDCSearch.get_transport() is transport
+    assert list(results.index) == list(BENCHMARKS)
+    assert results.loc["get_records_all_pages", "items"] == 120
+    assert results.loc["get_record_by_id", "items"] == 20
+    assert (results["throughput"] > 0).all()
+    assert (results["p95_ms"] >= results["p50_ms"]).all()
+    assert (results["peak_memory_mb"] > 0).all()
+
+    path = str(tmp_path / "baseline.json")
+    save_results(results, path)
+    baseline = load_results(path)
+    assert compare_results(results, baseline) == []
+    slower = results.copy()
+    slower.loc["merge_df", "throughput"] /= 2
+    assert compare_results(slower, baseline) == [
+        f"merge_df throughput is {slower.loc['merge_df', 'throughput']:.4g}, "
+        f"limit {baseline.loc['merge_df', 'throughput'] * 0.75:.4g}"
+    ]
+    violations = check_thresholds(results, {"build_filter": {"peak_memory_mb": 0}})
+    assert len(violations) == 1
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import pytest
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+from nmdc_notebook_tools.cassette import CassetteTransport, strict_key
+from nmdc_notebook_tools.instrumentation import Profiler
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    yield str(tmp_path / "run.jsonl.gz")
+    NMDCSearch.configure_transport()
+
+
+def record(path):
+    NMDCSearch.use_cassette(path, mode="record")
+    records = BiosampleSearch().get_records(
+        filter='{"type": "nmdc:Biosample"}',
+        max_page_size=100,
+        fields="id,name,type",
+        all_pages=True,
+    )
+    CollectionHelpers().get_record_name_from_id("nmdc:calib-11-00000001")
+    NMDCSearch.id_cache.clear()
+    return records
+
+
+def test_strict_key():
+    assert strict_key(
+        "https://api.microbiomedata.org/nmdcschema/biosample_set?filter=%7B%22b%22%3A+1%2C+%22a%22%3A+2%7D&max_page_size=10&projection=name,id"
+    ) == strict_key(
+        'http://127.0.0.1:8000/nmdcschema/biosample_set?max_page_size=10&projection=id,name&filter={"a":2,"b":1}'
+    )
+
+
+def test_record_and_replay(mock_api, cassette_path):
+    recorded = record(cassette_path)
+    requests_sent = len(mock_api.requests)
+    NMDCSearch.get_transport().close()
+    with gzip.open(cassette_path, "rt") as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == requests_sent == 4
+
+    cassette = NMDCSearch.use_cassette(cassette_path)
+    with Profiler() as profiler:
+        replayed = BiosampleSearch().get_records(
+            filter='{ "type":"nmdc:Biosample" }',
+            max_page_size=100,
+            fields="type,name,id",
+            all_pages=True,
+        )
+    assert replayed == recorded
+    name = CollectionHelpers().get_record_name_from_id("nmdc:calib-11-00000001")
+    assert name == "calibration_set"
+    assert len(mock_api.requests) == requests_sent
+    assert cassette.stats["replayed"] == 4
+    assert set(profiler.to_df()["source"]) == {"cassette"}
+    with pytest.raises(RuntimeError):
+        BiosampleSearch().get_records(max_page_size=7)
+    assert cassette.stats["missed"] == 1
+
+
+def test_permissive_matching(mock_api, cassette_path):
+    recorded = record(cassette_path)
+    NMDCSearch.use_cassette(cassette_path, match="strict")
+    with pytest.raises(RuntimeError):
+        BiosampleSearch().get_records(
+            filter='{"type": "nmdc:Biosample"}', max_page_size=40, fields="id,name"
+        )
+    NMDCSearch.use_cassette(cassette_path, match="permissive")
+    replayed = BiosampleSearch().get_records(
+        filter='{"type": "nmdc:Biosample"}',
+        max_page_size=40,
+        fields="id,name",
+        all_pages=True,
+    )
+    assert replayed == [{"id": r["id"], "name": r["name"]} for r in recorded]
+
+
+def test_permissive_matching_with_dotted_fields(mock_api, cassette_path):
+    query = {"filter": '{"type": "nmdc:Biosample"}', "max_page_size": 100}
+    live = BiosampleSearch().get_records(fields="lat_lon.latitude", **query)
+    NMDCSearch.use_cassette(cassette_path, mode="record")
+    BiosampleSearch().get_records(fields="id,lat_lon", **query)
+    NMDCSearch.use_cassette(cassette_path, match="permissive")
+    replayed = BiosampleSearch().get_records(fields="lat_lon.latitude", **query)
+    assert replayed == live
+    assert replayed[1] == {"id": "nmdc:bsm-11-00000001", "lat_lon": {"latitude": -79.5}}
+    # a recording of lat_lon.latitude does not cover the whole lat_lon
+    NMDCSearch.use_cassette(cassette_path, mode="record")
+    BiosampleSearch().get_records(fields="lat_lon.latitude", **query)
+    NMDCSearch.use_cassette(cassette_path, match="permissive")
+    with pytest.raises(RuntimeError):
+        BiosampleSearch().get_records(fields="lat_lon", **query)
+
+
+def test_append_records_new_requests(mock_api, cassette_path):
+    record(cassette_path)
+    cassette = NMDCSearch.use_cassette(cassette_path, mode="append")
+    BiosampleSearch().get_record_by_id("nmdc:bsm-11-00000002")
+    BiosampleSearch().get_records(
+        filter='{"type": "nmdc:Biosample"}', max_page_size=100, fields="id,name,type"
+    )
+    assert cassette.stats == {"replayed": 1, "recorded": 1, "missed": 0}
+    NMDCSearch.id_cache.clear()
+    cassette = NMDCSearch.use_cassette(cassette_path)
+    record_by_id = BiosampleSearch().get_record_by_id("nmdc:bsm-11-00000002")
+    assert record_by_id["id"] == "nmdc:bsm-11-00000002"
+    with pytest.raises(FileNotFoundError):
+        CassetteTransport(cassette_path + ".missing")
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+
+
+def test_resolve_collection_name_offline():
+    helpers = CollectionHelpers()
+    assert helpers.resolve_collection_name("nmdc:bsm-11-002vgm56") == "biosample_set"
+    assert helpers.resolve_collection_name("nmdc:dobj-11-abc") == "data_object_set"
+    assert (
+        helpers.resolve_collection_name("nmdc:wfmgan-11-abc.1")
+        == "workflow_execution_set"
+    )
+    assert helpers.resolve_collection_name("nmdc:unknown-11-abc") is None
+    assert helpers.resolve_collection_name("not an id") is None
+
+
+def test_get_record_names_from_ids(mock_api):
+    helpers = CollectionHelpers()
+    helpers.base_url = mock_api.base_url
+    ids = pd.Series(
+        ["nmdc:bsm-11-00000001", "nmdc:dobj-11-00000002"]
+        + [f"nmdc:calib-11-{i:08d}" for i in range(5)],
+        index=list("abcdefg"),
+    )
+    names = helpers.get_record_names_from_ids(ids)
+    assert list(names.index) == list("abcdefg")
+    assert (
+        names.tolist() == ["biosample_set", "data_object_set"] + ["calibration_set"] * 5
+    )
+    # one lookup for the unknown typecode, reused for every calib id
+    assert len(mock_api.requests) == 1
+    assert helpers.get_record_names_from_ids(["nmdc:calib-11-00000004"]) == [
+        "calibration_set"
+    ]
+    assert len(mock_api.requests) == 1
+
+
+def test_get_record_names_from_untyped_ids(mock_api):
+    mock_api.collections["study_set"] += [
+        {"id": "abc", "name": "untyped study"},
+        {"id": "def", "name": "another untyped study"},
+    ]
+    helpers = CollectionHelpers()
+    assert helpers.get_record_names_from_ids(["abc", "def"]) == ["study_set"] * 2
+    names = helpers.get_record_names_from_ids(
+        pd.Series(["nmdc:bsm-11-00000001", "abc", "nmdc:dobj-11-00000002"])
+    )
+    assert names.tolist() == ["biosample_set", "study_set", "data_object_set"]
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+from nmdc_notebook_tools.data_processing import DataProcessing
+from nmdc_notebook_tools.dataframe_builder import DataFrameBuilder
+
+
+def _biosamples(n):
+    return [
+        {
+            "id": f"nmdc:bsm-11-{i:08d}",
+            "type": "nmdc:Biosample",
+            "depth": {"has_numeric_value": i % 7} if i % 3 else {},
+            "lat_lon": {"latitude": 45.123456 + i, "longitude": -120.5},
+            "alternative_identifiers": [f"gold:Gb{i}"],
+        }
+        for i in range(n)
+    ]
+
+
+def test_convert_to_df_default_is_unchanged():
+    records = _biosamples(10)
+    df = DataProcessing().convert_to_df(records)
+    assert list(df.columns) == list(records[0].keys())
+    assert df["lat_lon"][0] == records[0]["lat_lon"]
+
+
+def test_builder_flattens_with_compact_dtypes():
+    builder = DataFrameBuilder(
+        fields="id,type,lat_lon,depth,alternative_identifiers", chunk_size=40
+    )
+    for start in range(0, 200, 25):
+        builder.add_records(_biosamples(200)[start : start + 25])
+    df = builder.build()
+    assert list(df.columns) == [
+        "id",
+        "type",
+        "lat_lon.latitude",
+        "lat_lon.longitude",
+        "depth.has_numeric_value",
+        "alternative_identifiers",
+    ]
+    assert len(df) == 200
+    assert isinstance(df["type"].dtype, pd.CategoricalDtype)
+    assert df["lat_lon.latitude"].dtype == "float64"
+    assert df["lat_lon.longitude"].dtype == "float32"
+    assert df["depth.has_numeric_value"].dtype == "float32"
+    assert df["depth.has_numeric_value"].isna().sum() == 67
+    assert df["alternative_identifiers"][3] == ["gold:Gb3"]
+    plain = pd.json_normalize(_biosamples(200))
+    assert df.memory_usage(deep=True).sum() < plain.memory_usage(deep=True).sum()
+
+
+def test_builder_keeps_float_and_categorical_dtypes_across_chunks():
+    records = [
+        {
+            "id": f"nmdc:bsm-11-{i // 2 if i < 20 else i:08d}",
+            "type": "nmdc:Biosample",
+            "ph": 7.0 if i < 20 else 7.25,
+            "longitude": -120.0,
+        }
+        for i in range(80)
+    ]
+    df = DataFrameBuilder(chunk_size=20).add_records(records).build()
+    # whole numbers in the first chunk do not turn the column into integers
+    assert df["ph"].dtype == "float32"
+    assert df["longitude"].dtype == "float32"
+    assert (df["longitude"] * 2).dtype == "float32"
+    # ids repeat in the first chunk only, over all records they are nearly unique
+    assert not isinstance(df["id"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["type"].dtype, pd.CategoricalDtype)
+
+
+def test_convert_to_df_from_iterator():
+    records = iter(_biosamples(30))
+    df = DataProcessing().convert_to_df(records, flatten=True, optimize_dtypes=True)
+    assert len(df) == 30
+    assert "lat_lon.latitude" in df.columns
+
+
+def test_merge_df_explodes_only_keys():
+    dp = DataProcessing()
+    data_generations = pd.DataFrame(
+        {
+            "id": ["dg1", "dg2"],
+            "has_input": [["bsm1", "bsm2"], ["bsm3"]],
+            "has_output": [["dobj1", "dobj2", "dobj3"], ["dobj4"]],
+        }
+    )
+    biosamples = pd.DataFrame(
+        {"id": ["bsm1", "bsm2", "bsm3", "bsm1"], "name": ["a", "b", "c", "a"]}
+    )
+    merged = dp.merge_df(data_generations, biosamples, "has_input", "id")
+    # one row per input, outputs stay as lists instead of multiplying the rows
+    assert len(merged) == 3
+    assert merged.loc[merged["has_input"] == "bsm1", "has_output"].iloc[0] == [
+        "dobj1",
+        "dobj2",
+        "dobj3",
+    ]
+    assert sorted(merged["name"]) == ["a", "b", "c"]
+
+
+def test_merge_df_join_type():
+    dp = DataProcessing()
+    left = pd.DataFrame({"id": ["a", "b"], "tags": [["x"], ["y", "z"]]})
+    right = pd.DataFrame({"ref": ["a"], "value": [1]})
+    merged = dp.merge_df(left, right, "id", "ref", how="left")
+    assert len(merged) == 2
+    assert merged["value"].isna().sum() == 1
+
+
+def test_drop_duplicate_rows_with_lists():
+    dp = DataProcessing()
+    df = pd.DataFrame({"a": [1, 1, 2], "b": [["x"], ["x"], ["x"]]})
+    assert len(dp.drop_duplicate_rows(df)) == 2
+
+
+def test_merge_df_sqlite_backend(tmp_path):
+    dp = DataProcessing()
+    data_generations = pd.DataFrame(
+        {
+            "id": ["dg1", "dg2", "dg3"],
+            "has_input": [["bsm1", "bsm2"], ["bsm3"], ["bsm9"]],
+            "has_output": [["dobj1", "dobj2"], ["dobj4"], []],
+        }
+    )
+    biosamples = iter(
+        [
+            {"id": "bsm1", "name": "a"},
+            {"id": "bsm2", "name": "b"},
+            {"id": "bsm3", "name": "c"},
+            {"id": "bsm1", "name": "a"},
+        ]
+    )
+    chunks = list(
+        dp.iter_merge_df(data_generations, biosamples, "has_input", "id", chunk_size=2)
+    )
+    merged = pd.concat(chunks, ignore_index=True)
+    expected = dp.merge_df(
+        data_generations,
+        pd.DataFrame(
+            [
+                {"id": "bsm1", "name": "a"},
+                {"id": "bsm2", "name": "b"},
+                {"id": "bsm3", "name": "c"},
+            ]
+        ),
+        "has_input",
+        "id",
+    )
+    assert len(chunks) == 2
+    assert sorted(merged.columns) == sorted(expected.columns)
+    assert sorted(merged["id_y"]) == sorted(expected["id_y"])
+    assert merged.loc[merged["id_y"] == "bsm1", "has_output"].iloc[0] == [
+        "dobj1",
+        "dobj2",
+    ]
+
+    path = dp.merge_df(
+        data_generations,
+        pd.DataFrame({"id": ["bsm3"], "name": ["c"]}),
+        "has_input",
+        "id",
+        how="left",
+        backend="sqlite",
+        output_path=str(tmp_path / "merged.jsonl"),
+    )
+    written = pd.read_json(path, lines=True)
+    assert len(written) == 4
+    assert written["name"].notna().sum() == 1
+
+
+def test_merge_df_sqlite_left_join_matches_pandas():
+    dp = DataProcessing()
+    workflows = pd.DataFrame(
+        {
+            "id": ["wf1", "wf2", "wf3"],
+            "has_output": [["dobj1", "dobj2"], ["dobj3"], ["dobj9"]],
+            "tags": [["a"], ["b"], ["c"]],
+        }
+    )
+    data_objects = pd.DataFrame(
+        {
+            "id": ["dobj1", "dobj2", "dobj3"],
+            "name": ["x", "y", "z"],
+            "was": ["wf1", "wf1", "wf2"],
+        }
+    )
+    expected = dp.merge_df(workflows, data_objects, "has_output", "id", how="left")
+    merged = dp.merge_df(
+        workflows,
+        data_objects,
+        "has_output",
+        "id",
+        how="left",
+        backend="sqlite",
+        chunk_size=2,
+    )
+    assert list(merged.columns) == list(expected.columns)
+    assert list(merged.columns) == ["id_x", "has_output", "tags", "id_y", "name", "was"]
+    # dobj9 has no match and keeps its workflow id in id_x
+    unmatched = merged[merged["has_output"] == "dobj9"]
+    assert unmatched["id_x"].tolist() == ["wf3"]
+    assert unmatched["id_y"].isna().all()
+    pd.testing.assert_frame_equal(
+        merged.sort_values("has_output").reset_index(drop=True),
+        expected.sort_values("has_output").reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_merge_df_sqlite_returns_dataframe():
+    dp = DataProcessing()
+    df1 = pd.DataFrame({"id": ["a", "b"], "x": [1, 2]})
+    df2 = pd.DataFrame({"id": ["b", "c"], "y": [3, 4]})
+    merged = dp.merge_dataframes("id", df1, df2, backend="sqlite")
+    assert isinstance(merged, pd.DataFrame)
+    assert merged.shape == (1, 3)
+    empty = dp.merge_df(df1, df2.iloc[1:], "id", "id", backend="sqlite")
+    assert list(empty.columns) == ["id", "x", "y"] and empty.empty
+    with pytest.raises(ValueError):
+        dp.merge_df(df1, iter(()), "id", "id", how="outer", backend="sqlite")
+    with pytest.raises(ValueError):
+        dp.iter_merge_df(df1, df2, "id", "id", how="right")
+    with pytest.raises(ValueError):
+        dp.merge_dataframes("id", df1, df2, backend="duckdb")
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from nmdc_notebook_tools import filters
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.data_processing import DataProcessing
+from nmdc_notebook_tools.response_cache import ResponseCache
+
+
+def test_compile_escapes_values():
+    filter = DataProcessing().build_filter({"name": 'soil "core" (1.5)'})
+    assert json.loads(filter) == {"name": {"$regex": r'soil\ "core"\ \(1\.5\)'}}
+    assert json.loads(
+        DataProcessing().build_filter({"name": "a'b"}, exact_match=True)
+    ) == {"name": "a'b"}
+    assert filters.compile_condition("G6R2", "prefix") == {"$regex": "^G6R2"}
+    assert filters.compile_condition("g6r2", "exact", case_sensitive=False) == {
+        "$regex": "^g6r2$",
+        "$options": "i",
+    }
+    assert filters.compile_condition(3, "contains") == 3
+    with pytest.raises(ValueError):
+        filters.compile_condition("x", "fuzzy")
+
+
+def test_normalize_filter():
+    assert filters.normalize_filter(
+        '{"b": {"$in": ["y", "x", "y"]}, "a": {"$eq": 1}}'
+    ) == filters.normalize_filter({"a": 1, "b": {"$in": ["x", "y"]}})
+    assert filters.normalize_filter('{"$and": [{"a": 1}]}') == '{"a":1}'
+    assert filters.normalize_filter("  ") == ""
+    assert ResponseCache.normalize_filter('{"a": {"$eq": 1}}') == '{"a":1}'
+    assert (
+        filters.normalize_filter(
+            '{"$or": [{"b": {"$lt": 2, "$gt": 1}}], "a": {"$elemMatch": {"y": 1, "x": 2}}}'
+        )
+        == '{"$or":[{"b":{"$gt":1,"$lt":2}}],"a":{"$elemMatch":{"x":2,"y":1}}}'
+    )
+
+
+def test_normalize_filter_keeps_embedded_documents():
+    # embedded documents are compared in key order, so these are different queries
+    assert filters.normalize_filter(
+        '{"a": {"x": 1, "y": 2}}'
+    ) != filters.normalize_filter('{"a": {"y": 2, "x": 1}}')
+    assert filters.normalize_filter('{"b": 1, "a": {"y": 2, "x": 1}}') == (
+        '{"a":{"y":2,"x":1},"b":1}'
+    )
+    assert (
+        filters.normalize_filter('{"a": {"$in": [{"y": 2, "x": 1}, {"x": 1, "y": 2}]}}')
+        == '{"a":{"$in":[{"x":1,"y":2},{"y":2,"x":1}]}}'
+    )
+
+
+def test_attribute_matching(mock_api):
+    mock_api.collections["biosample_set"].append(
+        {"id": "nmdc:bsm-11-quoted", "name": 'soil "core" (1.5)'}
+    )
+    biosample = BiosampleSearch()
+    records = biosample.get_record_by_attribute("name", '"core" (1.5', all_pages=True)
+    assert [r["id"] for r in records] == ["nmdc:bsm-11-quoted"]
+    assert (
+        len(
+            biosample.get_record_by_attribute(
+                "name", "sample 1", match="prefix", all_pages=True
+            )
+        )
+        == 111
+    )
+    assert (
+        len(
+            biosample.get_record_by_attribute(
+                "name", "SAMPLE 24", match="exact", case_sensitive=False
+            )
+        )
+        == 1
+    )
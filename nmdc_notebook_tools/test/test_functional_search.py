@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import pytest
+from nmdc_notebook_tools.functional_search import FunctionalSearch
+
+
+def test_format_annotation_id():
+    format_id = FunctionalSearch.format_annotation_id
+    assert format_id("K00001") == "KEGG.ORTHOLOGY:K00001"
+    assert format_id("COG0001") == "COG:COG0001"
+    assert format_id("PF00001") == "PFAM:PF00001"
+    assert format_id("KEGG.ORTHOLOGY:K00001") == "KEGG.ORTHOLOGY:K00001"
+    assert format_id("123", "COG") == "COG:123"
+    with pytest.raises(ValueError):
+        format_id("nonsense")
+
+
+def test_bulk_lookup(mock_api):
+    search = FunctionalSearch()
+    kos = [f"K{i:05d}" for i in range(1, 31)]
+    records = search.get_functional_annotations_bulk(
+        kos + ["COG0001", "PFAM:PF00002", "K00001"],
+        fields="was_generated_by,gene_function_id,count",
+        max_url_length=1000,
+    )
+    expected = [
+        r
+        for r in mock_api.collections["functional_annotation_agg"]
+        if r["gene_function_id"]
+        in {f"KEGG.ORTHOLOGY:{k}" for k in kos} | {"COG:COG0001", "PFAM:PF00002"}
+    ]
+    assert len(records) == len(expected)
+    assert set(records[0]) == {"was_generated_by", "gene_function_id", "count"}
+    # a few chunked requests instead of one per id
+    assert 1 < len(mock_api.requests) < 10
+
+
+def test_get_records_returns(mock_api):
+    records = FunctionalSearch().get_records(max_page_size=5)
+    assert len(records) == 5
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import time
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+from nmdc_notebook_tools.id_cache import IdCache
+
+
+def test_record_by_id_is_memoized(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    first = biosample.get_record_by_id("nmdc:bsm-11-00000007")
+    second = BiosampleSearch().get_record_by_id("nmdc:bsm-11-00000007")
+    assert first["id"] == "nmdc:bsm-11-00000007"
+    assert second is first
+    assert len(mock_api.requests) == 1
+
+
+def test_collection_name_is_memoized(mock_api):
+    helpers = CollectionHelpers()
+    helpers.base_url = mock_api.base_url
+    doc_id = "nmdc:calib-11-00000001"
+    assert helpers.get_record_name_from_id(doc_id) == "calibration_set"
+    assert helpers.get_record_name_from_id(doc_id) == "calibration_set"
+    assert len(mock_api.requests) == 1
+
+
+def test_prewarm(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    records = biosample.get_records(max_page_size=10)
+    biosample.id_cache.prewarm(records, "biosample_set", base_url=mock_api.base_url)
+    helpers = CollectionHelpers()
+    helpers.base_url = mock_api.base_url
+    for record in records:
+        assert biosample.get_record_by_id(record["id"]) is record
+        assert helpers.get_record_name_from_id(record["id"]) == "biosample_set"
+    assert len(mock_api.requests) == 1
+
+
+def test_keys_include_base_url(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    record = biosample.get_record_by_id("nmdc:bsm-11-00000007")
+    biosample.id_cache.prewarm(
+        [{"id": "nmdc:bsm-11-00000007", "name": "dev"}],
+        "biosample_set",
+        base_url="https://api-dev.microbiomedata.org",
+    )
+    assert biosample.get_record_by_id("nmdc:bsm-11-00000007") is record
+    assert len(mock_api.requests) == 1
+    assert IdCache.record_key("biosample_set", "x", "", "https://a/") == (
+        IdCache.record_key("biosample_set", "x", "", "https://a")
+    )
+    assert IdCache.collection_name_key("x", "https://a") != (
+        IdCache.collection_name_key("x", "https://b")
+    )
+
+
+def test_capacity_and_ttl():
+    cache = IdCache(capacity=2, ttl=0.05)
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    cache.get(("a",))
+    cache.set(("c",), 3)
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1
+    time.sleep(0.1)
+    assert cache.get(("a",)) is None
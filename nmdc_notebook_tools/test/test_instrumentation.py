@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import pytest
+from nmdc_notebook_tools import instrumentation
+from nmdc_notebook_tools.instrumentation import Profiler
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+
+
+def test_profiler_records_pages(mock_api):
+    with Profiler() as profiler:
+        records = BiosampleSearch().get_records(
+            max_page_size=100, fields="id,name", all_pages=True
+        )
+    assert len(records) == 250
+    df = profiler.to_df()
+    assert list(df["operation"]) == ["page"] * 3
+    assert list(df["records"]) == [100, 100, 50]
+    assert (df["source"] == "api").all()
+    assert (df["status"] == 200).all()
+    assert (df["bytes"] > 0).all()
+    assert (df["fields"] == "id,name").all()
+    summary = profiler.summary()
+    row = summary.loc[("page", "biosample_set")]
+    assert row["requests"] == 3
+    assert row["pages"] == 3
+    assert row["records"] == 250
+    assert row["cache_hits"] == 0
+
+
+def test_cache_hits_retries_and_errors(mock_api):
+    biosample = BiosampleSearch()
+    helpers = CollectionHelpers()
+    mock_api.throttle = 1
+    with Profiler() as profiler:
+        biosample.get_record_by_id("nmdc:bsm-11-00000003")
+        biosample.get_record_by_id("nmdc:bsm-11-00000003")
+        helpers.get_record_name_from_id("nmdc:calib-11-00000001")
+        with pytest.raises(RuntimeError):
+            biosample.get_record_by_id("nmdc:bsm-11-99999999")
+    df = profiler.to_df()
+    assert list(df["source"]) == ["api", "id_cache", "api", "api"]
+    assert list(df["retries"]) == [1, 0, 0, 0]
+    assert df["collection_name"][2] == "calibration_set"
+    assert df["status"][3] == 404
+    assert df["error"][3].startswith("RuntimeError")
+    summary = profiler.summary()
+    assert summary.loc[("record_by_id", "biosample_set"), "cache_hits"] == 1
+    assert summary.loc[("record_by_id", "biosample_set"), "errors"] == 1
+
+
+def test_hooks(mock_api):
+    events = []
+
+    def failing_hook(event):
+        raise ValueError("broken hook")
+
+    instrumentation.add_hook(failing_hook)
+    instrumentation.add_hook(events.append)
+    try:
+        BiosampleSearch().get_records(max_page_size=10)
+    finally:
+        instrumentation.remove_hook(failing_hook)
+        instrumentation.remove_hook(events.append)
+    assert len(events) == 1
+    assert events[0]["lane"] == "interactive"
+    BiosampleSearch().get_records(max_page_size=10)
+    assert len(events) == 1
+
+
+def test_to_prometheus(mock_api, tmp_path):
+    with Profiler() as profiler:
+        BiosampleSearch().get_records(max_page_size=100, all_pages=True)
+    path = tmp_path / "nmdc.prom"
+    text = profiler.to_prometheus(str(path))
+    assert path.read_text() == text
+    assert "# TYPE nmdc_requests_total counter" in text
+    labels = 'operation="page",collection="biosample_set",source="api"'
+    assert f"nmdc_requests_total{{{labels}}} 3.0" in text
+    assert f"nmdc_records_total{{{labels}}} 250.0" in text
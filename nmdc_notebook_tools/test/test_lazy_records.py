@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import json
+import urllib.parse
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+
+
+def projections(mock_api):
+    return [
+        dict(urllib.parse.parse_qsl(urllib.parse.urlparse(path).query)).get(
+            "projection", ""
+        )
+        for path in mock_api.requests
+    ]
+
+
+def test_lazy_fields_are_batched(mock_api):
+    samples = BiosampleSearch().get_lazy_records(max_page_size=100, all_pages=True)
+    assert len(samples) == 250
+    assert projections(mock_api) == ["id"] * 3
+    mock_api.requests.clear()
+
+    names = [sample["name"] for sample in samples]
+    assert names[3] == "sample 3"
+    # one set of chunked requests for the whole result set, projected to id and name
+    assert set(projections(mock_api)) == {"id,name"}
+    assert len(mock_api.requests) < 10
+    assert samples.loaded_fields == {"id", "name"}
+
+    requests = len(mock_api.requests)
+    assert samples[10]["name"] == "sample 10"
+    assert len(mock_api.requests) == requests
+    assert samples[0].get("not_a_field") is None
+
+    samples.prefetch("lat_lon", "associated_studies")
+    assert set(projections(mock_api)[requests:]) == {
+        "id,not_a_field",
+        "id,lat_lon,associated_studies",
+    }
+    df = samples.to_df()
+    assert list(df.columns) == [
+        "id",
+        "name",
+        "lat_lon",
+        "associated_studies",
+    ]
+    assert json.dumps(samples[1].to_dict())
+
+
+def test_dotted_projection_fetches_the_whole_field(mock_api):
+    samples = BiosampleSearch().get_lazy_records(fields="lat_lon.latitude")
+    assert samples[1].to_dict()["lat_lon"] == {"latitude": -79.5}
+    assert samples.loaded_fields == {"id"}
+    assert samples[1]["lat_lon"] == {"latitude": -79.5, "longitude": -169.0}
+    assert projections(mock_api) == ["id,lat_lon.latitude", "id,lat_lon"]
+    assert samples.loaded_fields == {"id", "lat_lon"}
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from nmdc_notebook_tools.lineage import LineageIndex, LineageTraversal
+
+
+def add_lineage(mock_api):
+    # biosample i -> extraction -> processed sample -> data generation -> raw reads -> workflow -> output
+    processing, processed, data_generations, workflows, data_objects = (
+        [],
+        [],
+        [],
+        [],
+        [],
+    )
+    for i in range(60):
+        sample = f"nmdc:bsm-11-{i:08d}"
+        extract = f"nmdc:procsm-11-{i:08d}"
+        dgen = f"nmdc:dgns-11-{i:08d}"
+        processing.append(
+            {
+                "id": f"nmdc:extrp-11-{i:08d}",
+                "has_input": [sample],
+                "has_output": [extract],
+            }
+        )
+        processed.append({"id": extract})
+        data_generations.append(
+            {"id": dgen, "has_input": [extract], "has_output": [f"nmdc:dobj-11-r{i}"]}
+        )
+        workflows.append(
+            {
+                "id": f"nmdc:wfrqc-11-{i:08d}.1",
+                "was_informed_by": dgen,
+                "has_input": [f"nmdc:dobj-11-r{i}"],
+                "has_output": [f"nmdc:dobj-11-w{i}"],
+            }
+        )
+        data_objects += [
+            {"id": f"nmdc:dobj-11-r{i}", "data_object_type": "Metagenome Raw Reads"},
+            {
+                "id": f"nmdc:dobj-11-w{i}",
+                "data_object_type": "Filtered Sequencing Reads",
+            },
+        ]
+    # a second processing step for the first sample
+    processing.append(
+        {
+            "id": "nmdc:poolp-11-00000000",
+            "has_input": ["nmdc:procsm-11-00000000"],
+            "has_output": ["nmdc:procsm-11-99999999"],
+        }
+    )
+    mock_api.collections["material_processing_set"] = processing
+    mock_api.collections["processed_sample_set"] = processed
+    mock_api.collections["data_generation_set"] = data_generations
+    mock_api.collections["workflow_execution_set"] = workflows
+    mock_api.collections["data_object_set"] = data_objects
+
+
+def test_from_studies(mock_api):
+    add_lineage(mock_api)
+    result = LineageTraversal().from_studies(["nmdc:sty-11-00000001"])
+    assert len(result.nodes["study_set"]) == 1
+    assert len(result.nodes["biosample_set"]) == 250
+    assert len(result.nodes["material_processing_set"]) == 61
+    assert len(result.nodes["data_generation_set"]) == 60
+    assert len(result.nodes["workflow_execution_set"]) == 60
+    assert len(result.data_objects()) == 120
+    edges = result.edges
+    assert len(edges[edges["relation"] == "associated_studies"]) == 250
+    assert (
+        (edges["source"] == "nmdc:wfrqc-11-00000000.1")
+        & (edges["relation"] == "was_informed_by")
+        & (edges["target"] == "nmdc:dgns-11-00000000")
+    ).any()
+    # every hop is a few batched queries instead of one request per record
+    assert len(mock_api.requests) < 40
+    # the 250 biosamples of the study come in one page
+    assert len([r for r in mock_api.requests if "biosample_set" in r]) == 1
+
+
+def test_from_biosamples(mock_api):
+    add_lineage(mock_api)
+    result = LineageTraversal().from_biosamples(
+        ["nmdc:bsm-11-00000001", "nmdc:bsm-11-00000200"]
+    )
+    assert set(result.nodes["biosample_set"]["id"]) == {
+        "nmdc:bsm-11-00000001",
+        "nmdc:bsm-11-00000200",
+    }
+    assert list(result.nodes["data_generation_set"]["id"]) == ["nmdc:dgns-11-00000001"]
+    assert set(result.data_objects()["id"]) == {
+        "nmdc:dobj-11-r1",
+        "nmdc:dobj-11-w1",
+    }
+
+
+def test_lineage_index(mock_api, tmp_path):
+    add_lineage(mock_api)
+    index = LineageIndex().build(max_page_size=100)
+    requests = len(mock_api.requests)
+    assert set(index.downstream("nmdc:bsm-11-00000000", "data_object_set")) == {
+        "nmdc:dobj-11-r0",
+        "nmdc:dobj-11-w0",
+    }
+    assert index.upstream("nmdc:dobj-11-w5", "biosample_set") == [
+        "nmdc:bsm-11-00000005"
+    ]
+    assert index.upstream("nmdc:bsm-11-00000005", "study_set") == [
+        "nmdc:sty-11-00000001"
+    ]
+    assert ("nmdc:procsm-11-00000000", "has_output") in index.neighbors(
+        "nmdc:extrp-11-00000000"
+    )
+    assert index.collection_name("nmdc:procsm-11-99999999") == "processed_sample_set"
+    # lookups never touch the network
+    assert len(mock_api.requests) == requests
+
+    path = str(tmp_path / "lineage.npz")
+    index.save(path)
+    loaded = LineageIndex.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.edges().equals(index.edges())
+
+
+def test_lineage_index_refresh(mock_api):
+    add_lineage(mock_api)
+    index = LineageIndex().build(max_page_size=100)
+    mock_api.collections["data_object_set"].append(
+        {"id": "nmdc:dobj-11-extra", "was_generated_by": "nmdc:dgns-11-00000003"}
+    )
+    mock_api.collections["workflow_execution_set"].pop(0)
+    stats = index.refresh()
+    assert stats["data_object_set"] == {"added": 1, "removed": 0}
+    assert stats["workflow_execution_set"] == {"added": 0, "removed": 1}
+    assert "nmdc:dobj-11-extra" in index.downstream("nmdc:bsm-11-00000003")
+    assert "nmdc:wfrqc-11-00000000.1" not in index.downstream("nmdc:bsm-11-00000000")
+    assert index.collection_name("nmdc:wfrqc-11-00000000.1") is None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools.mirror import CollectionMirror, LocalCollection
+from nmdc_notebook_tools.response_cache import ResponseCache
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def offline_mirror(mock_api, tmp_path):
+    mirror = CollectionMirror(str(tmp_path))
+    for collection_name in ("biosample_set", "data_object_set"):
+        mirror.download(collection_name, max_page_size=40)
+    mock_api.requests.clear()
+    CollectionSearch.set_mirror(mirror, offline=True)
+    yield mirror
+    CollectionSearch.set_mirror(None)
+
+
+def test_download(offline_mirror):
+    assert offline_mirror.collections() == ["biosample_set", "data_object_set"]
+    assert offline_mirror.metadata("biosample_set")["records"] == 250
+
+
+def test_offline_queries(mock_api, offline_mirror):
+    biosample = BiosampleSearch()
+    assert len(biosample.get_records(max_page_size=20, all_pages=True)) == 250
+    assert len(biosample.get_record_by_latitude("gt", 0.0, all_pages=True)) == 89
+    assert len(biosample.get_record_by_lat_long("lt", "gte", 0.0, -40.0)) == 25
+    assert biosample.get_record_by_attribute("name", "sample 12", exact_match=True)[0][
+        "id"
+    ] == ("nmdc:bsm-11-00000012")
+    assert (
+        len(biosample.get_record_by_attribute("name", "sample 1[0-9]$", match="regex"))
+        == 10
+    )
+    record = biosample.get_record_by_id("nmdc:bsm-11-00000003", fields="id,name")
+    assert record == {"id": "nmdc:bsm-11-00000003", "name": "sample 3"}
+    assert mock_api.requests == []
+
+
+def test_offline_unmirrored_collection(offline_mirror):
+    with pytest.raises(RuntimeError):
+        CollectionSearch("study_set").get_records()
+
+
+def test_local_collection_operators():
+    documents = [
+        {"id": "a", "n": 1, "tags": ["x", "y"], "sub": {"v": "alpha"}},
+        {"id": "b", "n": 5, "tags": ["z"], "sub": {"v": "beta"}},
+        {"id": "c", "n": 10, "parts": [{"v": 1}, {"v": 2}]},
+    ]
+    collection = LocalCollection(documents)
+
+    def ids(filter):
+        page = collection.page(json.dumps(filter), fields="id")
+        return [r["id"] for r in page["resources"]]
+
+    assert ids({"n": {"$gte": 5}}) == ["b", "c"]
+    assert ids({"n": {"$gt": 1, "$lt": 10}}) == ["b"]
+    assert ids({"tags": "y"}) == ["a"]
+    assert ids({"tags": {"$in": ["z", "q"]}}) == ["b"]
+    assert ids({"sub.v": {"$regex": "^AL", "$options": "i"}}) == ["a"]
+    assert ids({"parts.v": 2}) == ["c"]
+    assert ids({"sub": {"$exists": False}}) == ["c"]
+    assert ids({"$or": [{"id": "a"}, {"n": 10}]}) == ["a", "c"]
+    assert ids({"id": {"$nin": ["a", "b"]}}) == ["c"]
+
+
+def test_sync(mock_api, tmp_path):
+    mirror = CollectionMirror(str(tmp_path))
+    mirror.download("data_object_set")
+    data_objects = mock_api.collections["data_object_set"]
+    del data_objects[:5]
+    data_objects[0]["file_size_bytes"] = 1
+    data_objects.append({"id": "nmdc:dobj-11-new", "file_size_bytes": 5})
+    mock_api.requests.clear()
+    stats = mirror.sync("data_object_set", change_field="file_size_bytes")
+    assert (stats["added"], stats["updated"], stats["removed"]) == (1, 1, 5)
+    assert stats["records_fetched"] == 2
+    documents = {d["id"]: d for d in mirror.read_documents("data_object_set")}
+    assert len(documents) == 116
+    assert documents[data_objects[0]["id"]]["file_size_bytes"] == 1
+    assert mirror.metadata("data_object_set")["last_sync"]["added"] == 1
+    # listing ids plus one chunk of records
+    assert len(mock_api.requests) == 2
+
+
+def test_sync_bypasses_response_cache(mock_api, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    CollectionSearch.set_response_cache(cache)
+    try:
+        mirror = CollectionMirror(str(tmp_path / "mirror"))
+        mirror.download("data_object_set")
+        # the listing of the sync would be a cache hit if the download had filled the cache
+        CollectionSearch("data_object_set").get_records(
+            max_page_size=2000, fields="id", all_pages=True
+        )
+        mock_api.collections["data_object_set"].append({"id": "nmdc:dobj-11-new"})
+        stats = mirror.sync("data_object_set")
+        assert stats["added"] == 1
+        assert cache.stats()["entries"] == 1
+    finally:
+        CollectionSearch.set_response_cache(None)
+        cache.close()
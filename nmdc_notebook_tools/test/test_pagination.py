@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.collection_search import CollectionSearch
+
+
+def test_get_all_pages(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    results = biosample.get_records(max_page_size=20, all_pages=True)
+    assert len(results) == 250
+    assert [r["id"] for r in results] == [f"nmdc:bsm-11-{i:08d}" for i in range(250)]
+
+
+def test_get_first_page(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    results = biosample.get_records(max_page_size=20)
+    assert len(results) == 20
+
+
+def test_get_all_pages_with_filter(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    results = biosample.get_record_by_filter(
+        '{"lat_lon.latitude": {"$gt": 0}}', max_page_size=7, all_pages=True
+    )
+    assert len(results) == 89
+    assert all(r["lat_lon"]["latitude"] > 0 for r in results)
+
+
+def test_data_object_by_type_all_pages(mock_api):
+    collection = CollectionSearch("study_set")
+    collection.base_url = mock_api.base_url
+    results = collection.get_record_data_object_by_type(
+        "Raw Reads", max_page_size=10, all_pages=True
+    )
+    assert len(results) == 60
+
+
+def test_iter_records(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    progress = []
+    ids = [
+        r["id"]
+        for r in biosample.iter_records(
+            max_page_size=50,
+            fields="id",
+            progress=lambda pages, records: progress.append((pages, records)),
+        )
+    ]
+    assert len(ids) == 250
+    assert progress[-1] == (5, 250)
+
+
+def test_iter_records_early_break(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    for i, page in enumerate(biosample.iter_pages(max_page_size=10)):
+        assert len(page) == 10
+        if i == 1:
+            break
+    # the two pages read plus at most one prefetched page
+    assert len(mock_api.requests) <= 3
+
+
+def test_get_records_by_ids(mock_api):
+    biosample = BiosampleSearch()
+    biosample.base_url = mock_api.base_url
+    ids = [f"nmdc:bsm-11-{i:08d}" for i in range(0, 250, 2)]
+    ids = ids + ids[:10] + ["nmdc:bsm-11-missing"]
+    records, missing = biosample.get_records_by_ids(
+        ids, fields="name", max_url_length=2000
+    )
+    assert list(records) == ids[:125]
+    assert records["nmdc:bsm-11-00000004"]["name"] == "sample 4"
+    assert missing == ["nmdc:bsm-11-missing"]
+    # chunked into a handful of requests that stay under the url limit
+    assert 1 < len(mock_api.requests) < 10
+    assert all(len(path) < 2000 for path in mock_api.requests)
+    # a second lookup is answered from the id cache
+    mock_api.requests.clear()
+    records, missing = biosample.get_records_by_ids(ids[:50], fields="name")
+    assert len(records) == 50
+    assert mock_api.requests == []
+
+
+def test_chunked_urls_stay_under_limit():
+    biosample = BiosampleSearch()
+    ids = [f"nmdc:bsm-11-{i:08d}" for i in range(5000)]
+    chunks = list(biosample._chunk_in_filters("id", ids, "id,name", 8000))
+    assert sum(size for _, size in chunks) == 5000
+    urls = [
+        biosample._page_url(
+            filter, 10000, "id,name", "x" * biosample.max_page_token_length
+        )
+        for filter, _ in chunks
+    ]
+    assert all(len(url) <= 8000 for url in urls)
+    # chunks are filled, not split early
+    assert all(len(url) > 8000 - 50 for url in urls[:-1])
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from nmdc_notebook_tools.collection_search import CollectionSearch
+from nmdc_notebook_tools.response_cache import ResponseCache
+
+
+def test_cached_crawl(mock_api, tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    CollectionSearch.set_response_cache(cache)
+    try:
+        biosample = CollectionSearch("biosample_set")
+        biosample.base_url = mock_api.base_url
+        first = biosample.get_records(max_page_size=50, all_pages=True)
+        requests_sent = len(mock_api.requests)
+        second = biosample.get_records(max_page_size=50, all_pages=True)
+    finally:
+        CollectionSearch.set_response_cache(None)
+    assert first == second
+    assert len(mock_api.requests) == requests_sent == 5
+    assert cache.stats()["hits"] == 5
+    assert cache.stats()["entries"] == 5
+
+
+def test_equivalent_filters_share_key(tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    cache.set("study_set", {"resources": [1]}, '{"a": 1, "b": 2}', 25, "name,id")
+    assert cache.get("study_set", '{"b":2,"a":1}', 25, "id,name") == {"resources": [1]}
+    assert cache.get("study_set", '{"b":2,"a":1}', 25, "id") is None
+
+
+def test_ttl_and_invalidate(tmp_path):
+    cache = ResponseCache(
+        os.path.join(tmp_path, "cache.sqlite"), ttls={"study_set": 0.05}
+    )
+    cache.set("study_set", {"resources": [1]})
+    cache.set("biosample_set", {"resources": [2]})
+    time.sleep(0.1)
+    assert cache.get("study_set") is None
+    assert cache.get("biosample_set") == {"resources": [2]}
+    cache.invalidate("biosample_set")
+    assert cache.get("biosample_set") is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    payload = {"resources": [os.urandom(400).hex()]}
+    cache.set("study_set", payload, '{"q": 1}')
+    cache.max_bytes = int(cache.stats()["bytes"] * 2.5)
+    cache.set("study_set", payload, '{"q": 2}')
+    time.sleep(0.01)
+    cache.get("study_set", '{"q": 1}')
+    cache.set("study_set", payload, '{"q": 3}')
+    assert cache.get("study_set", '{"q": 1}') is not None
+    assert cache.get("study_set", '{"q": 2}') is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_pages_are_cached_per_base_url(tmp_path):
+    cache = ResponseCache(os.path.join(tmp_path, "cache.sqlite"))
+    prod = "https://api.microbiomedata.org"
+    cache.set("study_set", {"resources": ["prod"]}, base_url=prod)
+    cache.set("study_set", {"resources": ["dev"]}, base_url="http://127.0.0.1:8000/")
+    assert cache.get("study_set", base_url=prod + "/") == {"resources": ["prod"]}
+    assert cache.get("study_set", base_url="http://127.0.0.1:8000") == {
+        "resources": ["dev"]
+    }
+    assert cache.get("study_set", base_url="https://api-dev.microbiomedata.org") is None
+    cache.close()
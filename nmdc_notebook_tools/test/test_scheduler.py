@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from nmdc_notebook_tools import scheduler
+from nmdc_notebook_tools.scheduler import RequestScheduler
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+
+
+@pytest.fixture
+def restore_scheduler():
+    yield
+    NMDCSearch.configure_scheduler()
+
+
+def test_endpoint_of():
+    base = "https://api.microbiomedata.org"
+    assert scheduler.endpoint_of(f"{base}/nmdcschema/ids/nmdc:bsm-1") == (
+        "nmdcschema/ids"
+    )
+    assert scheduler.endpoint_of(f"{base}/nmdcschema/biosample_set?filter={{}}") == (
+        "nmdcschema/{collection}"
+    )
+    assert scheduler.endpoint_of(f"{base}/nmdcschema/biosample_set/nmdc:bsm-1") == (
+        "nmdcschema/{collection}/{id}"
+    )
+    assert scheduler.retry_after_seconds("3", 1.0) == 3.0
+    assert scheduler.retry_after_seconds(None, 1.0) == 1.0
+    assert scheduler.retry_after_seconds("not a date", 1.0) == 1.0
+
+
+def test_rate_limit():
+    requests = RequestScheduler(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        requests.acquire("nmdcschema/ids")
+        requests.release("nmdcschema/ids")
+    assert time.monotonic() - start >= 0.2
+    assert requests.stats["requests"] == 6
+
+
+def test_max_in_flight(mock_api, restore_scheduler):
+    mock_api.delay = 0.05
+    NMDCSearch.configure_scheduler(rate=None, max_in_flight=2)
+    search = BiosampleSearch()
+    ids = [f"nmdc:bsm-11-{i:08d}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        records = list(executor.map(search.get_record_by_id, ids))
+    assert [r["id"] for r in records] == ids
+    assert mock_api.max_in_flight <= 2
+
+
+def test_throttled_requests_pause_and_retry(mock_api, restore_scheduler):
+    requests = NMDCSearch.configure_scheduler(rate=10)
+    mock_api.throttle = 1
+    mock_api.retry_after = "1"
+    start = time.monotonic()
+    record = BiosampleSearch().get_record_by_id("nmdc:bsm-11-00000001")
+    assert record["id"] == "nmdc:bsm-11-00000001"
+    assert time.monotonic() - start >= 1.0
+    assert requests.stats["throttled"] == 1
+    assert requests.stats["requests"] == 2
+    # halved, then recovered by one step
+    assert requests._budget.current_rate == pytest.approx(10 / 2 + 10 / 20)
+
+
+def test_interactive_requests_go_first():
+    requests = RequestScheduler(rate=None, max_in_flight=1)
+    order = []
+
+    def request(lane_name):
+        requests.acquire("nmdcschema/{collection}", lane_name)
+        order.append(lane_name)
+        requests.release("nmdcschema/{collection}")
+
+    requests.acquire("nmdcschema/{collection}")
+    bulk = threading.Thread(target=request, args=(scheduler.BULK,))
+    bulk.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(
+        target=scheduler.in_lane(scheduler.INTERACTIVE, request),
+        args=(scheduler.INTERACTIVE,),
+    )
+    interactive.start()
+    time.sleep(0.05)
+    requests.release("nmdcschema/{collection}")
+    bulk.join()
+    interactive.join()
+    assert order == [scheduler.INTERACTIVE, scheduler.BULK]
+
+
+def test_bulk_lane_is_thread_local():
+    assert scheduler.current_lane() == scheduler.INTERACTIVE
+    with scheduler.lane(scheduler.BULK):
+        assert scheduler.current_lane() == scheduler.BULK
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert (
+                executor.submit(scheduler.current_lane).result()
+                == scheduler.INTERACTIVE
+            )
+    assert scheduler.current_lane() == scheduler.INTERACTIVE
+    with pytest.raises(ValueError):
+        with scheduler.lane("urgent"):
+            pass
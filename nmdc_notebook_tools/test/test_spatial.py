@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.field_research_site_search import FieldResearchSiteSearch
+from nmdc_notebook_tools import spatial
+
+
+def test_haversine():
+    # one degree of latitude is about 111 km
+    distances = spatial.haversine(0.0, 0.0, [1.0, 0.0], [0.0, 180.0])
+    assert np.allclose(distances, [111.195, np.pi * spatial.EARTH_RADIUS_KM], rtol=1e-4)
+    # the box around a point near the antimeridian wraps around
+    min_lat, max_lat, min_lon, max_lon = spatial.radius_box(0.0, 179.9, 100)
+    assert min_lon > max_lon
+
+
+def test_radius_and_nearest(mock_api):
+    biosample = BiosampleSearch()
+    # neighbouring mock samples are about 110 km apart
+    records = biosample.get_records_in_radius(-30.0, -70.0, 150, fields="id")
+    assert [r["id"] for r in records][0] == "nmdc:bsm-11-00000100"
+    assert {r["id"] for r in records[1:]} == {
+        "nmdc:bsm-11-00000099",
+        "nmdc:bsm-11-00000101",
+    }
+    assert records[0]["distance_km"] == 0.0
+    assert set(records[0]) == {"id", "lat_lon", "distance_km"}
+    nearest = biosample.get_nearest_records(-30.0, -70.0, k=5, initial_radius_km=10)
+    assert [r["id"] for r in nearest][0] == "nmdc:bsm-11-00000100"
+    assert len(nearest) == 5
+    assert all(
+        a["distance_km"] <= b["distance_km"] for a, b in zip(nearest, nearest[1:])
+    )
+
+
+def test_polygon_and_index(mock_api):
+    biosample = BiosampleSearch()
+    triangle = [(-31.0, -72.0), (-31.0, -60.0), (-20.0, -72.0)]
+    records = biosample.get_records_in_polygon(triangle, fields="id")
+    index = biosample.build_spatial_index(fields="id")
+    assert len(index) == 250
+    requests = len(mock_api.requests)
+    assert {r["id"] for r in index.polygon(triangle)} == {r["id"] for r in records}
+    assert [r["id"] for r in index.radius(-30.0, -70.0, 150)] == [
+        r["id"] for r in biosample.get_records_in_radius(-30.0, -70.0, 150, "id")
+    ]
+    assert index.nearest(-30.0, -70.0, k=1)[0]["id"] == "nmdc:bsm-11-00000100"
+    assert len(index.box(-80.0, 44.5, -170.0, 79.0)) == 250
+    assert len(mock_api.requests) == requests + 1
+
+
+def test_antimeridian(mock_api):
+    mock_api.collections["field_research_site_set"] = [
+        {
+            "id": "nmdc:frsite-11-east",
+            "lat_lon": {"latitude": 10.0, "longitude": 179.8},
+        },
+        {
+            "id": "nmdc:frsite-11-west",
+            "lat_lon": {"latitude": 10.0, "longitude": -179.8},
+        },
+        {"id": "nmdc:frsite-11-far", "lat_lon": {"latitude": 10.0, "longitude": 0.0}},
+    ]
+    sites = FieldResearchSiteSearch()
+    records = sites.get_records_in_radius(10.0, 180.0, 100)
+    assert {r["id"] for r in records} == {"nmdc:frsite-11-east", "nmdc:frsite-11-west"}
+    index = sites.build_spatial_index()
+    assert {r["id"] for r in index.radius(10.0, 180.0, 100)} == {
+        "nmdc:frsite-11-east",
+        "nmdc:frsite-11-west",
+    }
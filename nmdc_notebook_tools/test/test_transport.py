@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from nmdc_notebook_tools.nmdc_search import NMDCSearch
+from nmdc_notebook_tools.biosample_search import BiosampleSearch
+from nmdc_notebook_tools.study_search import StudySearch
+from nmdc_notebook_tools.collection_helpers import CollectionHelpers
+
+
+def test_transport_is_shared():
+    biosample = BiosampleSearch()
+    study = StudySearch()
+    helpers = CollectionHelpers()
+    assert biosample.get_transport() is study.get_transport()
+    assert study.get_transport() is helpers.get_transport()
+
+
+def test_configure_transport():
+    transport = NMDCSearch.configure_transport(
+        pool_size=4, connect_timeout=1, read_timeout=2, retries=1
+    )
+    assert BiosampleSearch().get_transport() is transport
+    assert transport.timeout == (1, 2)
+    assert transport.session is transport.session
+    NMDCSearch.configure_transport()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from nmdc_notebook_tools.scheduler import (
+    RequestScheduler,
+    endpoint_of,
+    retry_after_seconds,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Retry(Retry):
+    """
+    urllib3 retry that leaves 429 responses to Transport.get, so that the whole process backs off instead of one thread.
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset([413, 503])
+
+
+class Transport:
+    """
+    Pooled HTTP transport used by every search class to talk to the NMDC API.
+    A single connection pool is shared between all threads, so repeated requests reuse
+    open TCP/TLS connections instead of paying a fresh handshake per page.
+    Every request waits for a slot from the request scheduler, and 429 responses are retried here after the
+    Retry-After period, which also pauses every other request through the scheduler.
+    params:
+        pool_size: int
+            The maximum number of connections kept open to the NMDC API. Default is 10.
+        connect_timeout: float
+            Seconds to wait for a connection to be established. Default is 10.
+        read_timeout: float
+            Seconds to wait for the server to send a response. Default is 60.
+        retries: int
+            The number of times a failed request is retried. Default is 5.
+        backoff_factor: float
+            The base of the exponential backoff between retries, in seconds. Default is 0.5.
+        status_forcelist: tuple
+            The HTTP status codes that trigger a retry with exponential backoff. Default is the common 5xx codes.
+        scheduler: RequestScheduler
+            The scheduler limiting request rate and concurrency. Default is a RequestScheduler with max_in_flight equal to pool_size.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        retries: int = 5,
+        backoff_factor: float = 0.5,
+        status_forcelist: tuple = (500, 502, 503, 504),
+        scheduler: RequestScheduler = None,
+    ):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.scheduler = scheduler or RequestScheduler(max_in_flight=pool_size)
+        retry = _Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            allowed_methods=frozenset(["GET"]),
+            status_forcelist=[c for c in status_forcelist if c != 429],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # the adapter owns the connection pool and is safe to share between threads,
+        # the session (cookies, headers) is not, so each thread gets its own session
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        The requests session for the calling thread, mounted on the shared connection pool.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, stats: dict = None) -> requests.models.Response:
+        """
+        Send a GET request through the shared connection pool.
+        params:
+            url: str
+                The full url to request.
+            stats: dict
+                Optional dictionary that receives the status code, the response size in bytes, the number of retries
+                and round_trip_seconds, the latency of the last attempt without the time spent waiting for the scheduler.
+        """
+        endpoint = endpoint_of(url)
+        retries = 0
+        for attempt in range(self.retries + 1):
+            self.scheduler.acquire(endpoint)
+            throttled_for = None
+            try:
+                start = time.perf_counter()
+                response = self.session.get(url, timeout=self.timeout)
+                round_trip_seconds = time.perf_counter() - start
+                if response.status_code == 429 and attempt < self.retries:
+                    throttled_for = retry_after_seconds(
+                        response.headers.get("Retry-After"),
+                        self.backoff_factor * 2**attempt,
+                    )
+            finally:
+                self.scheduler.release(endpoint, throttled_for)
+            # retries of connection errors and 5xx responses done by urllib3
+            retries += len(
+                getattr(getattr(response.raw, "retries", None), "history", ())
+            )
+            if throttled_for is None:
+                break
+            retries += 1
+            response.close()
+        if stats is not None:
+            stats["status"] = response.status_code
+            stats["bytes"] = len(response.content)
+            stats["retries"] = retries
+            stats["round_trip_seconds"] = round_trip_seconds
+        return response
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self._adapter.close()